@@ -0,0 +1,36 @@
+"""Per-write cost of the journaled Database against rewriting the whole snapshot (user-001).
+
+    python benchmarks/bench_journal.py
+"""
+import os
+import sys
+import time
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from database import Database
+
+SIZES = (1000, 10000, 100000)
+WRITES = 50
+
+
+def per_write_ms(db_file: str, journal: bool, existing: int) -> float:
+    db = Database(db_file, journal=journal, checkpoint_interval=10 ** 9)
+    db.data["fitness"]["workouts"] = [{"id": i, "date": "2025-01-01", "exercise": "bench", "reps": 5, "weight": 60.0}
+                                      for i in range(existing)]
+    db.checkpoint()
+    started = time.perf_counter()
+    for _ in range(WRITES):
+        db.add_workout("bench", 5, 60.0)
+    elapsed = time.perf_counter() - started
+    db.close()
+    return elapsed / WRITES * 1000
+
+
+if __name__ == '__main__':
+    print(f"{'N':>8} {'rewrite':>10} {'journal':>10}   (ms per add_workout)")
+    for existing in SIZES:
+        with tempfile.TemporaryDirectory() as directory:
+            rewrite = per_write_ms(os.path.join(directory, "rewrite.json"), False, existing)
+            journal = per_write_ms(os.path.join(directory, "journal.json"), True, existing)
+        print(f"{existing:>8} {rewrite:>10.3f} {journal:>10.3f}")
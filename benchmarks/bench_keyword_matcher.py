@@ -0,0 +1,51 @@
+"""Key point extraction on long responses: the old per-sentence keyword scan against the compiled matcher (user-010).
+
+    python benchmarks/bench_keyword_matcher.py
+"""
+import os
+import sys
+import random
+import timeit
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from database import Database, MEMORY_KEYWORDS
+
+WORDS = "the quick brown fox jumps over lazy dog while system processes your request with care and precision".split()
+
+
+def old_extract_key_points(query: str, response: str) -> list:
+    """_extract_key_points as it was before the compiled matcher."""
+    key_points = []
+    for sentence in (query + " " + response).split("."):
+        sentence = sentence.strip()
+        if any(keyword in sentence.lower() for keyword in MEMORY_KEYWORDS) and len(sentence) > 10:
+            key_points.append(sentence)
+    return key_points
+
+
+def synthetic_response(sentences: int) -> str:
+    """Plain sentences, about 5% of them containing a memory keyword."""
+    text = []
+    for _ in range(sentences):
+        words = random.choices(WORDS, k=14)
+        if random.random() < 0.05:
+            words.insert(5, random.choice(["remember", "meeting", "birthday"]))
+        text.append(" ".join(words).capitalize())
+    return ". ".join(text) + "."
+
+
+if __name__ == '__main__':
+    random.seed(1)
+    query = "What should I do today"
+    with tempfile.TemporaryDirectory() as directory:
+        db = Database(os.path.join(directory, "bench.json"))
+        for sentences in (20, 200, 2000):
+            response = synthetic_response(sentences)
+            assert old_extract_key_points(query, response) == db._extract_key_points(query, response)
+            number = 20 if sentences >= 2000 else 200
+            old = min(timeit.repeat(lambda: old_extract_key_points(query, response), number=number, repeat=5)) / number
+            new = min(timeit.repeat(lambda: db._extract_key_points(query, response), number=number, repeat=5)) / number
+            print(f"{sentences:5d} sentences ({len(response) // 1024}KB): old {old * 1e6:8.1f}us  "
+                  f"new {new * 1e6:8.1f}us  x{old / new:.1f}")
+        db.close()
@@ -0,0 +1,54 @@
+"""Snapshot save/load time and size per codec on a synthetic ~50 MB store (user-014).
+
+    python benchmarks/bench_snapshot.py [target MB]
+"""
+import os
+import sys
+import json
+import time
+import random
+import datetime
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from database import Database
+from snapshot import CODECS
+
+
+def fill(db: Database, target_bytes: int) -> int:
+    """Add workouts and food logs until the indented JSON snapshot would exceed target_bytes."""
+    start = datetime.date(2015, 1, 1)
+    workouts = db.data["fitness"]["workouts"]
+    logs = db.data["fitness"]["nutrition"]["logs"]
+    n = 0
+    while True:
+        day = (start + datetime.timedelta(days=n // 40)).isoformat()
+        workouts.append({"id": n, "date": day, "exercise": random.choice(["bench", "squat", "deadlift", "row"]),
+                         "reps": random.randint(1, 12), "weight": round(random.uniform(20, 200), 1)})
+        logs.append({"id": n, "timestamp": day + "T12:00:00.123456",
+                     "food_name": random.choice(["oats with berries", "chicken breast", "rice", "protein shake"]),
+                     "calories": random.randint(100, 900), "protein": 25.5, "carbs": 40.0, "fats": 12.25})
+        n += 1
+        if n % 20000 == 0 and len(json.dumps(db.data, indent=2)) > target_bytes:
+            return n
+
+
+if __name__ == '__main__':
+    random.seed(7)
+    target_mb = float(sys.argv[1]) if len(sys.argv) > 1 else 50
+    with tempfile.TemporaryDirectory() as directory:
+        db = Database(os.path.join(directory, "seed.json"))
+        with db._lock.write():
+            records = fill(db, int(target_mb * 1024 * 1024))
+        print(f"{records} workouts + {records} food logs")
+        for codec in [None] + sorted(CODECS):
+            db.db_file = os.path.join(directory, f"{codec}.snap")
+            db.snapshot_codec = codec
+            started = time.perf_counter()
+            db._save_data()
+            save = time.perf_counter() - started
+            started = time.perf_counter()
+            db._load_data()
+            load = time.perf_counter() - started
+            print(f"{codec or 'plain (indent=2)':18s} {os.path.getsize(db.db_file) / 1e6:6.1f} MB   "
+                  f"save {save * 1000:7.0f} ms   load {load * 1000:7.0f} ms")
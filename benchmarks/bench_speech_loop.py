@@ -0,0 +1,47 @@
+"""Loop overhead of 100 sequential syntheses: asyncio.run per reply against the persistent SpeechLoop (user-022).
+
+The synthesis itself is replaced by a coroutine that returns at once, so the
+numbers measure event loop setup and hand-off only, without edge-tts or the
+network.
+
+    python benchmarks/bench_speech_loop.py
+"""
+import os
+import sys
+import time
+import types
+import asyncio
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+try:
+    import edge_tts  # noqa: F401
+except ImportError:
+    # speech imports edge_tts at module level; it is never called here
+    sys.modules['edge_tts'] = types.ModuleType('edge_tts')
+import speech
+
+REPLIES = 100
+
+
+async def instant_synthesize(text: str, voice: str) -> bytes:
+    await asyncio.sleep(0)
+    return text.encode()
+
+
+if __name__ == '__main__':
+    speech.synthesize = instant_synthesize
+    for _ in range(3):
+        started = time.perf_counter()
+        for i in range(REPLIES):
+            speech.synthesize_blocking(f"reply {i}", "voice")
+        per_reply = time.perf_counter() - started
+
+        loop = speech.SpeechLoop(max_concurrent=4, timeout=5)
+        started = time.perf_counter()
+        for i in range(REPLIES):
+            loop.synthesize(f"reply {i}", "voice")
+        persistent = time.perf_counter() - started
+        loop.close()
+
+        print(f"asyncio.run per reply: {per_reply * 1000:6.1f}ms ({per_reply * 1000 / REPLIES:.3f}/reply)   "
+              f"persistent loop: {persistent * 1000:6.1f}ms ({persistent * 1000 / REPLIES:.3f}/reply)")
@@ -0,0 +1,79 @@
+"""Query and write latency of the JSON and SQLite backends at 10k/100k/1M rows (user-002).
+
+    python benchmarks/bench_sqlite_backend.py [N ...]
+"""
+import os
+import sys
+import time
+import datetime
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from database import Database
+from sqlite_database import SQLiteDatabase
+
+DEFAULT_SIZES = (10_000, 100_000, 1_000_000)
+EXERCISES = ["bench", "squat", "deadlift", "row", "press"] + [f"ex{i}" for i in range(45)]
+QUERY_DATE = "2021-06-01"
+
+
+def ms_per_call(fn, calls: int = 20) -> float:
+    started = time.perf_counter()
+    for _ in range(calls):
+        fn()
+    return (time.perf_counter() - started) / calls * 1000
+
+
+def rows(total: int):
+    """N rows split evenly across workouts, food logs and schedule items, spread over 2000 days."""
+    count = total // 3
+    base = datetime.date(2020, 1, 1)
+    days = [(base + datetime.timedelta(days=i % 2000)).isoformat() for i in range(count)]
+    workouts = [{"id": i + 1, "date": days[i], "exercise": EXERCISES[i % 50], "reps": 5, "weight": 60.0}
+                for i in range(count)]
+    logs = [{"id": i + 1, "timestamp": days[i] + "T12:00:00", "food_name": "oats", "calories": 100,
+             "protein": 1.0, "carbs": 1.0, "fats": 1.0} for i in range(count)]
+    schedule = [{"id": i + 1, "title": "check-in", "date": days[i], "time": "10:00", "description": "",
+                 "completed": False} for i in range(count)]
+    return workouts, logs, schedule
+
+
+def load_json(db_file: str, workouts, logs, schedule) -> Database:
+    db = Database(db_file)
+    db.data["fitness"]["workouts"] = workouts
+    db.data["fitness"]["nutrition"]["logs"] = logs
+    db.data["schedule"] = schedule
+    db.checkpoint()
+    db.close()
+    return Database(db_file)  # reopened so the indexes are built from the data
+
+
+def load_sqlite(db_file: str, workouts, logs, schedule) -> SQLiteDatabase:
+    db = SQLiteDatabase(db_file)
+    with db._conn:
+        db._conn.executemany("INSERT INTO workouts (id, date, exercise, exercise_key, reps, weight) VALUES (?, ?, ?, ?, ?, ?)",
+                             [(w["id"], w["date"], w["exercise"], w["exercise"], 5, 60.0) for w in workouts])
+        db._conn.executemany("INSERT INTO nutrition_logs (id, timestamp, food_name, calories, protein, carbs, fats) "
+                             "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                             [(l["id"], l["timestamp"], "oats", 100, 1.0, 1.0, 1.0) for l in logs])
+        db._conn.executemany("INSERT INTO schedule (id, title, date, time, description, completed) VALUES (?, ?, ?, ?, ?, ?)",
+                             [(s["id"], "check-in", s["date"], "10:00", "", 0) for s in schedule])
+    db.close()
+    return SQLiteDatabase(db_file)  # reopened so the daily totals are rebuilt from the logs
+
+
+if __name__ == '__main__':
+    sizes = [int(arg) for arg in sys.argv[1:]] or DEFAULT_SIZES
+    print(f"{'N':>9} {'backend':7} {'progress':>9} {'schedule':>9} {'summary':>9} {'write':>10}   (ms per call)")
+    for total in sizes:
+        data = rows(total)
+        with tempfile.TemporaryDirectory() as directory:
+            for name, load, write_calls in (("json", load_json, 3), ("sqlite", load_sqlite, 50)):
+                db = load(os.path.join(directory, f"bench.{name}"), *data)
+                results = (ms_per_call(lambda: db.get_exercise_progress("bench")),
+                           ms_per_call(lambda: db.get_schedule_for_date(QUERY_DATE)),
+                           ms_per_call(lambda: db.get_nutrition_summary(QUERY_DATE)),
+                           ms_per_call(lambda: db.add_workout("bench", 5, 60.0), calls=write_calls))
+                db.close()
+                print(f"{total:>9} {name:7} {results[0]:>9.3f} {results[1]:>9.3f} {results[2]:>9.3f} {results[3]:>10.3f}",
+                      flush=True)
@@ -0,0 +1,128 @@
+import io
+import sys
+import csv
+import json
+import itertools
+from typing import Dict, Iterable, Iterator
+from database import Database, TRANSFER_COLLECTIONS, create_database
+
+# Columns written for each collection in CSV exports, in order
+CSV_FIELDS = {
+    "schedule": ("id", "title", "date", "time", "description", "completed"),
+    "workouts": ("id", "date", "exercise", "reps", "weight"),
+    "nutrition_logs": ("id", "timestamp", "food_name", "calories", "protein", "carbs", "fats"),
+    "weight_logs": ("id", "date", "weight"),
+    "conversations": ("timestamp", "query", "response", "key_points"),
+}
+
+DEFAULT_BATCH_SIZE = 500
+
+
+def export_ndjson(db: Database, collection: str, batch_size: int = DEFAULT_BATCH_SIZE) -> Iterator[str]:
+    """Stream a collection as newline-delimited JSON, one batch of lines per chunk."""
+    for batch in db.iter_records(collection, batch_size):
+        yield "".join(json.dumps(record, separators=(',', ':')) + "\n" for record in batch)
+
+
+def export_csv(db: Database, collection: str, batch_size: int = DEFAULT_BATCH_SIZE) -> Iterator[str]:
+    """Stream a collection as CSV with a header row, one batch of rows per chunk."""
+    fields = CSV_FIELDS[collection]
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=fields, extrasaction='ignore', lineterminator="\n")
+    writer.writeheader()
+    for batch in db.iter_records(collection, batch_size):
+        for record in batch:
+            if "key_points" in record:
+                record["key_points"] = json.dumps(record["key_points"])
+            if "completed" in record:
+                record["completed"] = "true" if record["completed"] else "false"
+            writer.writerow(record)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()  # header of an empty export
+
+
+def read_ndjson(lines: Iterable[str], collection: str = None) -> Iterator[Dict]:
+    """Parse newline-delimited JSON records, skipping blank lines."""
+    for number, line in enumerate(lines, 1):
+        if line.strip():
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError as e:
+                raise ValueError(f"Line {number} is not valid JSON: {e}") from e
+
+
+def read_csv(lines: Iterable[str], collection: str) -> Iterator[Dict]:
+    """Parse CSV records written by export_csv (header row first)."""
+    for row in csv.DictReader(lines):
+        if row.get("key_points"):
+            row["key_points"] = json.loads(row["key_points"])
+        if "completed" in row:
+            row["completed"] = (row["completed"] or "").strip().lower() in ("true", "1", "yes")
+        yield row
+
+
+# format -> (exporter, reader, content type)
+FORMATS = {
+    "ndjson": (export_ndjson, read_ndjson, "application/x-ndjson"),
+    "csv": (export_csv, read_csv, "text/csv"),
+}
+
+
+def import_records(db: Database, collection: str, records: Iterable[Dict],
+                   batch_size: int = DEFAULT_BATCH_SIZE) -> int:
+    """Apply a stream of records in batches, one commit per batch. Returns the number imported.
+
+    Only one batch is held in memory at a time. Batches committed before an
+    invalid record stay imported; the error names the batch that failed.
+    """
+    if collection not in TRANSFER_COLLECTIONS:
+        raise ValueError(f"Unknown collection: {collection}")
+    records = iter(records)
+    imported = 0
+    for number in itertools.count(1):
+        batch = list(itertools.islice(records, batch_size))
+        if not batch:
+            return imported
+        try:
+            imported += db.import_records(collection, batch)
+        except ValueError as e:
+            raise ValueError(f"Batch {number} (records {imported + 1}-{imported + len(batch)}): {e}") from e
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Export or import a collection of a user data file.")
+    parser.add_argument("action", choices=("export", "import"))
+    parser.add_argument("collection", choices=sorted(TRANSFER_COLLECTIONS))
+    parser.add_argument("--format", choices=sorted(FORMATS), default="ndjson")
+    parser.add_argument("--db", default="user_data.json", help="database file")
+    parser.add_argument("--backend", choices=("json", "sqlite"), default="json")
+    parser.add_argument("--file", help="file to write to or read from (default: stdout/stdin)")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    args = parser.parse_args()
+
+    exporter, reader, _ = FORMATS[args.format]
+    database = create_database(args.backend, db_file=args.db)
+    try:
+        if args.action == "export":
+            out = open(args.file, 'w', newline='') if args.file else sys.stdout
+            try:
+                for chunk in exporter(database, args.collection, args.batch_size):
+                    out.write(chunk)
+            finally:
+                if args.file:
+                    out.close()
+        else:
+            source = open(args.file, 'r', newline='') if args.file else sys.stdin
+            try:
+                count = import_records(database, args.collection, reader(source, args.collection), args.batch_size)
+            finally:
+                if args.file:
+                    source.close()
+            print(f"Imported {count} {args.collection} records", file=sys.stderr)
+    finally:
+        database.close()
@@ -1,17 +1,337 @@
 import os
 import json
+import atexit
+import bisect
+import contextlib
 import datetime
-from typing import Dict, List, Any, Optional
+import functools
+import hashlib
+import heapq
+import logging
+import re
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Dict, List, Any, Iterable, Optional
+from snapshot import CODECS, decode_snapshot, encode_snapshot
+
+logger = logging.getLogger('jaws')
+
+# When to fsync: after every commit, once per group commit (and snapshot), or never
+FSYNC_POLICIES = ("always", "batched", "os")
+
+# Fields tracked by the per-day nutrition aggregates
+NUTRIENTS = ("calories", "protein", "carbs", "fats")
+
+# Collections whose records get IDs from a persisted, never reused sequence
+ID_COLLECTIONS = {
+    "schedule": ("schedule",),
+    "workouts": ("fitness", "workouts"),
+    "food_logs": ("fitness", "nutrition", "logs"),
+    "weight_logs": ("fitness", "nutrition", "weight_logs"),
+}
+
+# ID_COLLECTIONS entries also kept sorted by (date, id), for range queries and cursor pagination
+DATE_ORDERED = ("schedule", "weight_logs")
+
+# Collections handled by bulk export/import, and the ID_COLLECTIONS entry behind each (None: no IDs)
+TRANSFER_COLLECTIONS = {
+    "schedule": "schedule",
+    "workouts": "workouts",
+    "nutrition_logs": "food_logs",
+    "weight_logs": "weight_logs",
+    "conversations": None,
+}
+
+# Cold data moved to archive segments, and the day each record belongs to
+ARCHIVE_KINDS = {
+    "workouts": lambda workout: workout["date"],
+    "food_logs": lambda log: log["timestamp"][:10],
+    "nutrition_history": lambda item: item[0],  # (day, entry) pairs
+}
+
+# Parsed archive segments kept in memory at once
+ARCHIVE_CACHE_SEGMENTS = 8
+
+# Keywords that mark a sentence as worth keeping in long-term memory
+MEMORY_KEYWORDS = (
+    "remember", "don't forget", "important", "schedule", "appointment",
+    "meeting", "event", "reminder", "preference", "like", "dislike",
+    "favorite", "birthday", "anniversary", "deadline"
+)
+
+# Sentence ends: terminal punctuation followed by whitespace or end of text (so "3.5" stays whole), or a line break
+SENTENCE_BOUNDARY = re.compile(r"[.!?]+(?=\s|$)|\n+")
+
+
+def compile_keyword_matcher(keywords: Iterable[str]) -> re.Pattern:
+    """Compile keywords into a single regex to run over lowercased text.
+    
+    The keywords are merged into a trie, so shared prefixes are only tried
+    once per position ("rem(?:ember|inder)"). The pattern is case-sensitive
+    on purpose: lowercasing the text once is much cheaper than an IGNORECASE
+    scan in the re engine.
+    """
+    trie = {}
+    for keyword in keywords:
+        if keyword:
+            node = trie
+            for ch in keyword.lower():
+                node = node.setdefault(ch, {})
+            node[""] = {}  # end of a keyword
+    if not trie:
+        return re.compile(r"(?!)")  # matches nothing
+    
+    def to_regex(node: Dict) -> str:
+        branches = [re.escape(ch) + to_regex(child) for ch, child in sorted(node.items()) if ch]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        # A keyword ending here makes the longer continuations optional
+        return "(?:" + body + ")?" if "" in node else body
+    
+    return re.compile(to_regex(trie))
+
+
+def encode_cursor(date: str, item_id: int) -> str:
+    """Opaque pagination cursor pointing just past a (date, id) position."""
+    return f"{date}~{item_id}"
+
+
+def decode_cursor(cursor: str) -> tuple:
+    """The (date, id) position of a cursor from encode_cursor. Raises ValueError if malformed."""
+    date, separator, item_id = cursor.rpartition("~")
+    if not separator:
+        raise ValueError(f"Invalid cursor: {cursor!r}")
+    return datetime.date.fromisoformat(date).isoformat(), int(item_id)
+
+
+def check_page_limit(limit: Optional[int]) -> None:
+    """Raise ValueError unless `limit` is None (no paging) or a positive page size."""
+    if limit is not None and limit < 1:
+        raise ValueError(f"Page limit must be at least 1, got {limit}")
+
+
+def _iso_date(value: Any) -> str:
+    """An imported date as YYYY-MM-DD. Raises ValueError if it is not a valid date."""
+    return datetime.date.fromisoformat(str(value)).isoformat()
+
+
+def _iso_timestamp(value: Any) -> str:
+    """An imported timestamp in isoformat. Raises ValueError unless it is a valid local time without an offset.
+
+    Stored timestamps are naive local times, ordered as strings and compared
+    with datetime.now().
+    """
+    timestamp = datetime.datetime.fromisoformat(str(value))
+    if timestamp.tzinfo is not None:
+        raise ValueError(f"timestamp must be local time without an offset: {value!r}")
+    return timestamp.isoformat()
+
+
+def _sentence_start(text: str, pos: int, floor: int) -> int:
+    """Offset where the sentence containing `pos` starts, searching back no further than `floor`."""
+    while True:
+        i = max(text.rfind(".", floor, pos), text.rfind("!", floor, pos), text.rfind("?", floor, pos),
+                text.rfind("\n", floor, pos))
+        if i < 0:
+            return floor
+        if text[i] == "\n" or text[i + 1].isspace():
+            return i + 1
+        pos = i  # punctuation inside a sentence, like "3.5"
+
+
+def memory_hash(point: str) -> str:
+    """Content hash identifying a long-term memory point (case and whitespace insensitive)."""
+    normalized = " ".join(point.lower().split())
+    return hashlib.sha1(normalized.encode("utf-8")).hexdigest()[:16]
+
+
+class ReadWriteLock:
+    """Lock allowing many concurrent readers or a single writer.
+    
+    Re-entrant for the thread holding the write lock (which may also take
+    read locks) and for threads already holding a read lock. Waiting
+    writers block new readers so a steady stream of reads cannot starve
+    them. Upgrading a read lock to a write lock is not supported.
+    """
+    
+    def __init__(self):
+        self._cond = threading.Condition(threading.Lock())
+        self._readers = 0
+        self._writer = None
+        self._writer_depth = 0
+        self._writers_waiting = 0
+        self._local = threading.local()
+    
+    def acquire_read(self) -> None:
+        me = threading.get_ident()
+        depth = getattr(self._local, "read_depth", 0)
+        with self._cond:
+            if self._writer == me:
+                self._writer_depth += 1
+                return
+            # A nested read must not queue behind waiting writers: they wait for us
+            if depth == 0:
+                while self._writer is not None or self._writers_waiting:
+                    self._cond.wait()
+            self._readers += 1
+        self._local.read_depth = depth + 1
+    
+    def release_read(self) -> None:
+        with self._cond:
+            if self._writer == threading.get_ident():
+                self._writer_depth -= 1
+                return
+            self._readers -= 1
+            if not self._readers:
+                self._cond.notify_all()
+        self._local.read_depth -= 1
+    
+    def acquire_write(self) -> None:
+        me = threading.get_ident()
+        with self._cond:
+            if self._writer == me:
+                self._writer_depth += 1
+                return
+            if getattr(self._local, "read_depth", 0):
+                raise RuntimeError("Cannot upgrade a read lock to a write lock")
+            self._writers_waiting += 1
+            try:
+                while self._writer is not None or self._readers:
+                    self._cond.wait()
+            finally:
+                self._writers_waiting -= 1
+            self._writer = me
+            self._writer_depth = 1
+    
+    def release_write(self) -> None:
+        with self._cond:
+            self._writer_depth -= 1
+            if not self._writer_depth:
+                self._writer = None
+                self._cond.notify_all()
+    
+    @contextlib.contextmanager
+    def read(self):
+        self.acquire_read()
+        try:
+            yield
+        finally:
+            self.release_read()
+    
+    @contextlib.contextmanager
+    def write(self):
+        self.acquire_write()
+        try:
+            yield
+        finally:
+            self.release_write()
+
+
+def _reader(method):
+    """Run a Database method under the shared (read) lock."""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self._lock.read():
+            return method(self, *args, **kwargs)
+    return wrapper
+
+
+def _writer(method):
+    """Run a Database method under the exclusive (write) lock."""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self._lock.write():
+            return method(self, *args, **kwargs)
+    return wrapper
+
+
+def _memoized(*tags):
+    """Cache a derived query's result until its TTL expires or a mutation touches one of `tags`.
+    
+    Callers get a copy so they cannot corrupt the cached value.
+    """
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            key = (method.__name__, args, tuple(sorted(kwargs.items())))
+            hit, value = self._cache_get(key)
+            if not hit:
+                generation = self._cache_generation(tags)
+                value = method(self, *args, **kwargs)
+                self._cache_put(key, tags, value, generation)
+            return _copy_result(value)
+        return wrapper
+    return decorator
+
+
+def _copy_result(value: Any) -> Any:
+    """Copy a query result one level deep (records are flat dicts)."""
+    if isinstance(value, list):
+        return [dict(item) if isinstance(item, dict) else item for item in value]
+    if isinstance(value, dict):
+        return dict(value)
+    return value
+
 
 class Database:
     """Database class for storing user data, conversation history, schedules, and fitness tracking."""
     
-    def __init__(self, db_file="user_data.json", cache_timeout=300):
+    def __init__(self, db_file="user_data.json", cache_timeout=300, journal=False, checkpoint_interval=1000,
+                 write_behind=False, flush_interval_ms=200, flush_max_pending=100, fsync="batched",
+                 cache_size=128, memory_capacity=500, conversation_retention_hours=24, conversation_max_recent=5,
+                 memory_keywords=MEMORY_KEYWORDS, archive_after_days=None, snapshot_codec=None, read_only=False):
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f"fsync must be one of {FSYNC_POLICIES}, got {fsync!r}")
+        if snapshot_codec is not None and snapshot_codec not in CODECS:
+            raise ValueError(f"Unknown or unavailable snapshot codec: {snapshot_codec!r} (available: {sorted(CODECS)})")
         self.db_file = db_file
+        # A read-only instance loads the snapshot and journal (e.g. to migrate
+        # them) without ever writing to the files; mutating it raises.
+        self.read_only = read_only
+        # Snapshots are written as plain JSON, or framed (magic, version,
+        # checksum) with the named codec. Either kind is read back regardless.
+        self.snapshot_codec = snapshot_codec
+        # Journaled mode appends one compact record per mutation instead of
+        # rewriting the whole snapshot; the snapshot is refreshed every
+        # `checkpoint_interval` records.
+        self.journal = journal
+        self.journal_file = db_file + ".journal"
+        self.checkpoint_interval = checkpoint_interval
+        self._journal_seq = 0
+        self._journal_pending = 0
+        self._journal_handle = None
+        # Long-term memory keeps at most this many key points, evicting the
+        # least referenced (then least recently referenced) ones first.
+        self.memory_capacity = memory_capacity
+        self._keyword_pattern = compile_keyword_matcher(memory_keywords)
+        # Conversations stay in the short-term history until they are older
+        # than the retention window or pushed out by newer ones.
+        self.conversation_retention = datetime.timedelta(hours=conversation_retention_hours)
+        self.conversation_max_recent = conversation_max_recent
+        # Workouts, food logs and nutrition history older than this many days
+        # move out of the snapshot into immutable per-month segment files,
+        # which are only read when a query reaches back that far.
+        self.archive_after_days = archive_after_days
+        self.archive_dir = db_file + ".archive"
+        self._segment_cache = OrderedDict()  # segment file -> parsed records, least recently used first
+        self._segment_cache_lock = threading.Lock()
+        # Write-behind mode only marks the store dirty on mutation; a background
+        # flusher group-commits every `flush_interval_ms` or `flush_max_pending`
+        # mutations, whichever comes first.
+        self.write_behind = write_behind
+        self.flush_interval_ms = flush_interval_ms
+        self.flush_max_pending = flush_max_pending
+        self.fsync = fsync
+        self._lock = ReadWriteLock()
+        self._flush_wakeup = threading.Event()
+        self._pending_lines = []
+        self._pending_mutations = 0
+        self._flusher = None
+        self._closed = False
         self.data = self._load_data()
-        self.cache = {}
-        self.cache_timestamps = {}
-        self.cache_timeout = cache_timeout  # Cache timeout in seconds
+        self._init_cache(cache_timeout, cache_size)
         
         # Initialize default data structure if it doesn't exist
         if not self.data:
@@ -37,27 +357,746 @@ class Database:
                         "weight_logs": []
                     }
                 },
-                "movie_preferences": []
+                "movie_preferences": [],
+                "long_term_memory": {
+                    "entries": {}
+                }
             }
-            self._save_data()
+            if not self.read_only:
+                self._save_data()
+        
+        self._build_indexes()
+        if self.archive_after_days is not None and not self.read_only:
+            self.archive_cold_data()
+        
+        if self.write_behind:
+            self._flusher = threading.Thread(target=self._flush_loop, name="database-flusher", daemon=True)
+            self._flusher.start()
+            # Clean interpreter exit flushes whatever is still pending
+            atexit.register(self.close)
     
     def _load_data(self) -> Dict:
-        """Load data from the JSON file."""
+        """Load data from the snapshot file and replay any journaled mutations on top of it.
+        
+        A framed snapshot that fails its checksum raises SnapshotError rather
+        than starting over with empty data.
+        """
+        data = {}
         if os.path.exists(self.db_file):
             try:
-                with open(self.db_file, 'r') as f:
-                    return json.load(f)
+                with open(self.db_file, 'rb') as f:
+                    data = decode_snapshot(f.read())
             except (json.JSONDecodeError, IOError):
-                return {}
-        return {}
+                data = {}
+        
+        self._journal_seq = data.pop("_journal_seq", 0)
+        self._journal_pending = self._replay_journal(data)
+        
+        # A journal left behind by a journaled run is folded into the snapshot
+        # right away when this instance is not journaling itself.
+        if self._journal_pending and not self.journal and not self.read_only:
+            self.data = data
+            self._save_data()
+            os.remove(self.journal_file)
+            self._journal_pending = 0
+        return data
+    
+    def _replay_journal(self, data: Dict) -> int:
+        """Apply journal records newer than the snapshot. Returns the number of records replayed."""
+        if not os.path.exists(self.journal_file):
+            return 0
+        
+        replayed = 0
+        valid_bytes = 0
+        with open(self.journal_file, 'rb') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # Torn write from a crash mid-append: everything after it is garbage
+                    break
+                if not line.endswith(b"\n"):
+                    break
+                valid_bytes += len(line)
+                if record["seq"] <= self._journal_seq:
+                    continue
+                self._apply_record(data, record)
+                self._journal_seq = record["seq"]
+                replayed += 1
+        
+        # Drop the torn tail so new records are not appended after garbage
+        if valid_bytes != os.path.getsize(self.journal_file) and not self.read_only:
+            with open(self.journal_file, 'r+b') as f:
+                f.truncate(valid_bytes)
+        return replayed
+    
+    @staticmethod
+    def _apply_record(data: Dict, record: Dict) -> None:
+        """Apply a single journal record to the data tree."""
+        *parents, key = record["path"]
+        node = data
+        for part in parents:
+            node = node.setdefault(part, {})
+        
+        op = record["op"]
+        if op == "set":
+            node[key] = record["value"]
+        elif op == "append":
+            node.setdefault(key, []).append(record["value"])
+        elif op == "extend":
+            node.setdefault(key, []).extend(record["value"])
+        elif op == "update":
+            for item in node.get(key, []):
+                if item["id"] == record["id"]:
+                    item.update(record["value"])
+                    break
+        elif op == "remove":
+            items = node.get(key, [])
+            for i, item in enumerate(items):
+                if item["id"] == record["id"]:
+                    items.pop(i)
+                    break
+        elif op == "swap_remove":
+            items = node.get(key, [])
+            for i, item in enumerate(items):
+                if item["id"] == record["id"]:
+                    items[i] = items[-1]
+                    items.pop()
+                    break
+        elif op == "delete":
+            node.pop(key, None)
+        else:
+            raise ValueError(f"Unknown journal operation: {op}")
     
     def _save_data(self) -> None:
-        """Save data to the JSON file."""
-        with open(self.db_file, 'w') as f:
-            json.dump(self.data, f, indent=2)
+        """Save data to the snapshot file.
+        
+        The snapshot is written next to the live file and swapped in
+        atomically, so a crash mid-write never leaves a truncated file. In
+        journaled mode this is a checkpoint: the journal starts over, and the
+        sequence number stored in the snapshot lets replay skip records if we
+        crash before truncating it.
+        """
+        self._check_writable()
+        data = dict(self.data, _journal_seq=self._journal_seq) if self.journal else self.data
+        if self.snapshot_codec is not None:
+            payload = encode_snapshot(data, self.snapshot_codec)
+        elif self.journal:
+            payload = json.dumps(data, separators=(',', ':')).encode("utf-8")
+        else:
+            payload = json.dumps(data, indent=2).encode("utf-8")
+        
+        tmp_file = self.db_file + ".tmp"
+        with open(tmp_file, 'wb') as f:
+            f.write(payload)
+            f.flush()
+            if self.fsync != "os":
+                os.fsync(f.fileno())
+        os.replace(tmp_file, self.db_file)
+        
+        # Anything still buffered is covered by the snapshot we just wrote
+        self._pending_lines = []
+        self._pending_mutations = 0
+        if self.journal:
+            if self._journal_handle is not None:
+                self._journal_handle.close()
+            self._journal_handle = open(self.journal_file, 'w')
+            self._journal_pending = 0
+    
+    def _commit(self, *records: Dict) -> None:
+        """Persist a mutation: append it to the journal, or rewrite the snapshot when not journaling.
+        
+        In write-behind mode the mutation is only buffered; the flusher thread
+        writes it out together with its neighbours.
+        """
+        self._check_writable()
+        with self._lock.write():
+            if self.journal:
+                # Serialize now: the records reference live objects that may change before the flush
+                for record in records:
+                    self._journal_seq += 1
+                    self._pending_lines.append(json.dumps(dict(record, seq=self._journal_seq), separators=(',', ':')))
+            self._pending_mutations += 1
+            
+            if not self.write_behind:
+                self._flush_pending(group=False)
+            elif self._pending_mutations >= self.flush_max_pending:
+                self._flush_wakeup.set()
+    
+    def _check_writable(self) -> None:
+        if self.read_only:
+            raise RuntimeError(f"Database opened read-only: {self.db_file}")
+    
+    def _flush_pending(self, group: bool) -> None:
+        """Write out buffered mutations. Must be called with the write lock held."""
+        if not self._pending_mutations:
+            return
+        
+        if not self.journal:
+            self._save_data()
+            return
+        
+        if self._journal_handle is None:
+            self._journal_handle = open(self.journal_file, 'a')
+        self._journal_handle.write("\n".join(self._pending_lines) + "\n")
+        self._journal_handle.flush()
+        if self.fsync == "always" or (group and self.fsync == "batched"):
+            os.fsync(self._journal_handle.fileno())
+        
+        self._journal_pending += len(self._pending_lines)
+        self._pending_lines = []
+        self._pending_mutations = 0
+        if self._journal_pending >= self.checkpoint_interval:
+            self._save_data()
+    
+    def _flush_loop(self) -> None:
+        """Background flusher for write-behind mode."""
+        while not self._closed:
+            # Woken early by _commit once flush_max_pending mutations pile up
+            self._flush_wakeup.wait(self.flush_interval_ms / 1000)
+            self._flush_wakeup.clear()
+            with self._lock.write():
+                if self._closed:
+                    break
+                try:
+                    self._flush_pending(group=True)
+                except (IOError, OSError) as e:
+                    # Leave the buffer in place so the next cycle retries
+                    logger.error(f"Error flushing database: {str(e)}")
+    
+    @_writer
+    def flush(self) -> None:
+        """Write out any mutations still buffered by write-behind mode."""
+        self._flush_pending(group=True)
+    
+    def close(self) -> None:
+        """Flush pending mutations and stop the background flusher."""
+        with self._lock.write():
+            if self._closed:
+                return
+            self._flush_pending(group=True)
+            self._closed = True
+            self._flush_wakeup.set()
+            if self._journal_handle is not None:
+                self._journal_handle.close()
+                self._journal_handle = None
+        
+        if self._flusher is not None:
+            self._flusher.join()
+            atexit.unregister(self.close)
     
-    def add_conversation(self, query: str, response: str) -> None:
-        """Add a conversation entry to the history."""
+    @_writer
+    def checkpoint(self) -> None:
+        """Fold the journal into the snapshot file."""
+        self._save_data()
+    
+    def memory_footprint(self) -> int:
+        """Rough size in bytes of the data held in memory, going by its on-disk size."""
+        return sum(os.path.getsize(path) for path in (self.db_file, self.journal_file) if os.path.exists(path))
+    
+    def _init_cache(self, cache_timeout: int, cache_size: int) -> None:
+        """Set up the TTL + LRU cache for derived query results."""
+        self.cache = OrderedDict()  # key -> result, least recently used first
+        self.cache_timestamps = {}  # key -> time.monotonic() when cached
+        self.cache_timeout = cache_timeout  # Cache timeout in seconds
+        self.cache_size = cache_size
+        self._cache_tags = {}  # tag -> keys to drop when that data changes
+        self._tag_generations = {}  # tag -> number of invalidations so far
+        self._cache_lock = threading.Lock()  # readers fill the cache concurrently
+        self._cache_stats = {"hits": 0, "misses": 0, "evictions": 0, "expirations": 0, "invalidations": 0}
+    
+    def _cache_get(self, key: tuple) -> tuple:
+        """Return (hit, value) for a cache key, expiring stale entries."""
+        with self._cache_lock:
+            if key in self.cache:
+                if time.monotonic() - self.cache_timestamps[key] < self.cache_timeout:
+                    self.cache.move_to_end(key)
+                    self._cache_stats["hits"] += 1
+                    return True, self.cache[key]
+                self._cache_drop(key)
+                self._cache_stats["expirations"] += 1
+            self._cache_stats["misses"] += 1
+            return False, None
+    
+    def _cache_generation(self, tags: tuple) -> tuple:
+        """Invalidation counts of `tags`, taken before computing a value to cache."""
+        with self._cache_lock:
+            return tuple(self._tag_generations.get(tag, 0) for tag in tags)
+    
+    def _cache_put(self, key: tuple, tags: tuple, value: Any, generation: tuple = None) -> None:
+        """Cache a value, unless one of its tags was invalidated since `generation` was taken."""
+        with self._cache_lock:
+            if generation is not None and generation != tuple(self._tag_generations.get(tag, 0) for tag in tags):
+                return  # Computed from data that has changed since
+            self.cache[key] = value
+            self.cache.move_to_end(key)
+            self.cache_timestamps[key] = time.monotonic()
+            for tag in tags:
+                self._cache_tags.setdefault(tag, set()).add(key)
+            while len(self.cache) > self.cache_size:
+                self._cache_drop(next(iter(self.cache)))
+                self._cache_stats["evictions"] += 1
+    
+    def _cache_drop(self, key: tuple) -> None:
+        """Remove one entry. Must be called with the cache lock held."""
+        del self.cache[key]
+        del self.cache_timestamps[key]
+        for keys in self._cache_tags.values():
+            keys.discard(key)
+    
+    def _invalidate(self, *tags: str) -> None:
+        """Drop cached results derived from the given data."""
+        with self._cache_lock:
+            for tag in tags:
+                self._tag_generations[tag] = self._tag_generations.get(tag, 0) + 1
+                for key in self._cache_tags.pop(tag, ()):
+                    if key in self.cache:
+                        self._cache_drop(key)
+                        self._cache_stats["invalidations"] += 1
+    
+    def cached(self, key: tuple, tags: tuple, compute) -> Any:
+        """Cache a value derived from this database's data (e.g. a prompt section built by the server).
+        
+        `compute()` runs on a miss; the result is kept until its TTL expires
+        or a mutation touches one of `tags` ("conversations",
+        "long_term_memory", "workouts", "movie_preferences").
+        """
+        key = ("cached",) + key
+        hit, value = self._cache_get(key)
+        if not hit:
+            # compute() runs without the database lock; a mutation meanwhile keeps the result out of the cache
+            generation = self._cache_generation(tags)
+            value = compute()
+            self._cache_put(key, tags, value, generation)
+        return _copy_result(value)
+    
+    def cache_stats(self) -> Dict[str, Any]:
+        """Hit/miss counters for the derived query cache."""
+        with self._cache_lock:
+            stats = dict(self._cache_stats, size=len(self.cache), capacity=self.cache_size)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        return stats
+    
+    def _build_indexes(self) -> None:
+        """Build the in-memory secondary indexes from the loaded data.
+        
+        - exercise (lowercased) -> workouts sorted by date, with a parallel list of dates for bisect
+        - date -> food logs for that day
+        - days with nutrition totals, sorted, for range lookups
+        - date -> conversations for that day, plus the parsed conversation times in order
+        - id -> list position, per ID_COLLECTIONS entry
+        - (date, id) keys in order with the matching records, per DATE_ORDERED entry
+        """
+        self._index_workouts()
+        self._index_food_logs()
+        
+        nutrition = self.data.get("fitness", {}).get("nutrition")
+        if nutrition is not None and self._daily_totals_outdated():
+            self._rebuild_daily_totals()
+        self._total_days = sorted(nutrition.get("daily_totals", {})) if nutrition is not None else []
+        
+        self._index_conversations()
+        self._upgrade_long_term_memory()
+        
+        self._positions = {}
+        self._date_order = {}
+        sequences = self.data.setdefault("sequences", {})
+        for name in ID_COLLECTIONS:
+            self._index_positions(name)
+            if name in DATE_ORDERED:
+                self._index_date_order(name)
+            # Data written before sequences existed only has the IDs themselves to go by
+            used = [item["id"] for item in self._collection(name)]
+            if name == "food_logs":
+                for entry in self.data.get("fitness", {}).get("nutrition_history", {}).values():
+                    used.extend(log.get("id", 0) for log in entry["logs"])
+            sequences[name] = max([sequences.get(name, 0)] + used)
+    
+    def _index_workouts(self) -> None:
+        self._workouts_by_exercise = {}
+        self._workout_dates_by_exercise = {}
+        # In ID order, so workouts sharing a date keep the order they were added in
+        for workout in sorted(self.data.get("fitness", {}).get("workouts", []), key=lambda w: w["id"]):
+            self._index_workout(workout)
+    
+    def _index_food_logs(self) -> None:
+        self._food_logs_by_date = {}
+        for log in self.data.get("fitness", {}).get("nutrition", {}).get("logs", []):
+            self._food_logs_by_date.setdefault(log["timestamp"][:10], []).append(log)
+    
+    def _collection(self, name: str) -> List[Dict]:
+        """The list holding an ID_COLLECTIONS collection (empty if the data has no such list)."""
+        node = self.data
+        for part in ID_COLLECTIONS[name]:
+            node = node.get(part)
+            if node is None:
+                return []
+        return node
+    
+    def _index_positions(self, name: str) -> None:
+        self._positions[name] = {item["id"]: i for i, item in enumerate(self._collection(name))}
+    
+    def _index_date_order(self, name: str) -> None:
+        items = sorted(self._collection(name), key=lambda item: (item["date"], item["id"]))
+        self._date_order[name] = ([(item["date"], item["id"]) for item in items], items)
+    
+    def _next_id(self, name: str) -> tuple:
+        """Allocate the next ID of a collection. Returns the ID and the journal record persisting the sequence."""
+        self.data["sequences"][name] += 1
+        value = self.data["sequences"][name]
+        return value, {"op": "set", "path": ["sequences", name], "value": value}
+    
+    def _append_record(self, name: str, item: Dict) -> None:
+        items = self._collection(name)
+        self._positions[name][item["id"]] = len(items)
+        items.append(item)
+        if name in DATE_ORDERED:
+            keys, ordered = self._date_order[name]
+            i = bisect.bisect_right(keys, (item["date"], item["id"]))
+            keys.insert(i, (item["date"], item["id"]))
+            ordered.insert(i, item)
+    
+    def _find_record(self, name: str, item_id: int) -> Optional[Dict]:
+        position = self._positions[name].get(item_id)
+        return None if position is None else self._collection(name)[position]
+    
+    def _swap_remove_record(self, name: str, item_id: int) -> Optional[Dict]:
+        """Remove a record by ID in O(1) by moving the last record into its slot.
+        
+        This does not keep list order, so readers order by ID (or date) themselves.
+        """
+        positions = self._positions[name]
+        position = positions.pop(item_id, None)
+        if position is None:
+            return None
+        items = self._collection(name)
+        removed = items[position]
+        last = items.pop()
+        if last is not removed:
+            items[position] = last
+            positions[last["id"]] = position
+        if name in DATE_ORDERED:
+            keys, ordered = self._date_order[name]
+            i = bisect.bisect_left(keys, (removed["date"], removed["id"]))
+            del keys[i]
+            del ordered[i]
+        return removed
+    
+    def _date_page(self, name: str, start: Optional[str], end: Optional[str],
+                   cursor: Optional[str], limit: Optional[int]) -> Dict:
+        """Copies of the records dated within [start, end] after the cursor, in (date, id) order.
+        
+        Both ends of the window are found by binary search, so the cost
+        depends on the page size rather than on the size of the collection.
+        """
+        check_page_limit(limit)
+        keys, items = self._date_order[name]
+        lo = bisect.bisect_left(keys, (start,)) if start else 0
+        if cursor:
+            lo = max(lo, bisect.bisect_right(keys, decode_cursor(cursor)))
+        hi = bisect.bisect_right(keys, (end, float("inf"))) if end else len(keys)
+        stop = hi if limit is None else min(hi, lo + limit)
+        page = [dict(item) for item in items[lo:stop]]
+        return {"items": page, "next_cursor": encode_cursor(*keys[stop - 1]) if stop < hi else None}
+    
+    def _upgrade_long_term_memory(self) -> None:
+        """Convert the old key_points list into hashed memory entries."""
+        memory = self.data.setdefault("long_term_memory", {})
+        entries = memory.setdefault("entries", {})
+        legacy_points = memory.pop("key_points", None)
+        if legacy_points:
+            now = datetime.datetime.now().isoformat()
+            for point in legacy_points:
+                entries.setdefault(memory_hash(point), {"text": point, "count": 1, "added": now, "last_referenced": now})
+            self._evict_long_term_memory()
+    
+    def _remember(self, points: List[str]) -> List[Dict]:
+        """Add key points to long-term memory, or bump the count of ones already known.
+        
+        Returns the journal records describing the change.
+        """
+        entries = self.data["long_term_memory"]["entries"]
+        now = datetime.datetime.now().isoformat()
+        records = []
+        for point in points:
+            key = memory_hash(point)
+            entry = entries.get(key)
+            if entry is None:
+                entry = entries[key] = {"text": point, "count": 1, "added": now, "last_referenced": now}
+            else:
+                entry["count"] += 1
+                entry["last_referenced"] = now
+            records.append({"op": "set", "path": ["long_term_memory", "entries", key], "value": entry})
+        return records + self._evict_long_term_memory()
+    
+    def _evict_long_term_memory(self) -> List[Dict]:
+        """Drop the least referenced, then least recently referenced, points beyond capacity."""
+        entries = self.data["long_term_memory"]["entries"]
+        overflow = len(entries) - self.memory_capacity
+        if overflow <= 0:
+            return []
+        victims = heapq.nsmallest(overflow, entries, key=lambda k: (entries[k]["count"], entries[k]["last_referenced"]))
+        for key in victims:
+            del entries[key]
+        return [{"op": "delete", "path": ["long_term_memory", "entries", key]} for key in victims]
+    
+    def _daily_totals_outdated(self) -> bool:
+        """Whether stored daily totals are missing a day of food logs, or count a different number of logs for it.
+
+        Only days with logs in the snapshot are checked, and archive segments
+        are only read for a day whose count is off.
+        """
+        totals = self.data["fitness"]["nutrition"].get("daily_totals")
+        if totals is None:
+            return True
+        for day, logs in self._food_logs_by_date.items():
+            count = totals.get(day, {}).get("count")
+            if count != len(logs) and count != len(logs) + sum(1 for _ in self._archived("food_logs", day)):
+                return True
+        return False
+    
+    def _rebuild_daily_totals(self) -> None:
+        """Recompute the per-day nutrition aggregates from the logs and the archived history."""
+        totals = {}
+        history = list(self._archived("nutrition_history"))
+        history.extend(self.data["fitness"].get("nutrition_history", {}).items())
+        for day, entry in history:
+            summary = entry["summary"]
+            totals[day] = {field: summary[f"total_{field}"] for field in NUTRIENTS}
+            totals[day]["count"] = len(entry["logs"])
+        
+        self.data["fitness"]["nutrition"]["daily_totals"] = totals
+        self._total_days = []
+        logs_by_date = {}
+        for log in self._archived("food_logs"):
+            logs_by_date.setdefault(log["timestamp"][:10], []).append(log)
+        for day, logs in self._food_logs_by_date.items():
+            logs_by_date.setdefault(day, []).extend(logs)
+        for day, logs in logs_by_date.items():
+            totals.pop(day, None)
+            for log in logs:
+                self._add_to_daily_totals(log)
+        self._total_days = sorted(totals)
+    
+    # --- Archive ---
+    
+    @_writer
+    def archive_cold_data(self, before: Optional[datetime.date] = None) -> Dict[str, int]:
+        """Move workouts, food logs and nutrition history dated before `before` into archive segments.
+        
+        `before` defaults to `archive_after_days` ago. Archived records stay
+        readable through the usual getters and their daily totals stay in the
+        snapshot. They can no longer be changed, only deleted (see
+        _delete_archived). Returns the number of records moved per kind.
+        """
+        if before is None:
+            before = datetime.date.today() - datetime.timedelta(days=self.archive_after_days or 0)
+        cutoff = before.isoformat()
+        fitness = self.data.get("fitness")
+        if fitness is None:
+            return {}
+        nutrition = fitness["nutrition"]
+        moved = {}
+        records = []
+        
+        cold = [workout for workout in fitness["workouts"] if workout["date"] < cutoff]
+        if cold:
+            fitness["workouts"] = [workout for workout in fitness["workouts"] if workout["date"] >= cutoff]
+            records.append({"op": "set", "path": ["fitness", "workouts"], "value": fitness["workouts"]})
+            records.extend(self._write_segments("workouts", cold))
+            self._index_workouts()
+            self._index_positions("workouts")
+            self._invalidate("workouts")
+            moved["workouts"] = len(cold)
+        
+        cold = [log for log in nutrition["logs"] if log["timestamp"][:10] < cutoff]
+        if cold:
+            nutrition["logs"] = [log for log in nutrition["logs"] if log["timestamp"][:10] >= cutoff]
+            records.append({"op": "set", "path": ["fitness", "nutrition", "logs"], "value": nutrition["logs"]})
+            records.extend(self._write_segments("food_logs", cold))
+            self._index_food_logs()
+            self._index_positions("food_logs")
+            moved["food_logs"] = len(cold)
+        
+        history = fitness.get("nutrition_history", {})
+        cold = sorted(item for item in history.items() if item[0] < cutoff)
+        if cold:
+            for day, _ in cold:
+                del history[day]
+                records.append({"op": "delete", "path": ["fitness", "nutrition_history", day]})
+            records.extend(self._write_segments("nutrition_history", cold))
+            moved["nutrition_history"] = len(cold)
+        
+        if records:
+            self._commit(*records)
+        return moved
+    
+    def _write_segments(self, kind: str, items: List) -> List[Dict]:
+        """Write cold records to new segment files, one per month. Returns the journal records listing them.
+        
+        Segments are never rewritten: records archived later for the same
+        month go to a new segment. A segment only counts once it is listed in
+        the snapshot, so a crash before the commit leaves an ignored file.
+        """
+        day_of = ARCHIVE_KINDS[kind]
+        by_month = {}
+        for item in items:
+            by_month.setdefault(day_of(item)[:7], []).append(item)
+        
+        os.makedirs(self.archive_dir, exist_ok=True)
+        segments = self.data.setdefault("archive", {}).setdefault("segments", [])
+        records = []
+        for month, month_items in sorted(by_month.items()):
+            number = 1
+            while os.path.exists(os.path.join(self.archive_dir, f"{kind}-{month}-{number}.json")):
+                number += 1
+            name = f"{kind}-{month}-{number}.json"
+            tmp_file = os.path.join(self.archive_dir, name + ".tmp")
+            with open(tmp_file, 'w') as f:
+                json.dump(month_items, f, separators=(',', ':'))
+                f.flush()
+                if self.fsync != "os":
+                    os.fsync(f.fileno())
+            os.replace(tmp_file, os.path.join(self.archive_dir, name))
+            
+            days = [day_of(item) for item in month_items]
+            segment = {"kind": kind, "file": name, "start": min(days), "end": max(days), "count": len(month_items)}
+            if kind != "nutrition_history":
+                ids = [item["id"] for item in month_items]
+                segment["first_id"], segment["last_id"] = min(ids), max(ids)
+            if kind == "workouts":
+                segment["exercises"] = sorted({workout["exercise"].lower() for workout in month_items})
+            segments.append(segment)
+            records.append({"op": "append", "path": ["archive", "segments"], "value": segment})
+        return records
+    
+    def _read_segment(self, name: str) -> List:
+        with self._segment_cache_lock:
+            if name in self._segment_cache:
+                self._segment_cache.move_to_end(name)
+                return self._segment_cache[name]
+        with open(os.path.join(self.archive_dir, name), 'r') as f:
+            items = json.load(f)
+        with self._segment_cache_lock:
+            self._segment_cache[name] = items
+            while len(self._segment_cache) > ARCHIVE_CACHE_SEGMENTS:
+                self._segment_cache.popitem(last=False)
+        return items
+    
+    def _archived(self, kind: str, date: str = None, exercise: str = None):
+        """Archived records of a kind, oldest segment first, optionally limited to a date prefix or exercise.
+        
+        Only segments that can contain matching records are loaded. Deleted
+        records are left out.
+        """
+        day_of = ARCHIVE_KINDS[kind]
+        deleted = self._archive_deleted(kind)
+        for segment in self._segments(kind):
+            if date is not None and not segment["start"][:len(date)] <= date <= segment["end"][:len(date)]:
+                continue
+            if exercise is not None and exercise not in segment.get("exercises", ()):
+                continue
+            for item in self._read_segment(segment["file"]):
+                if kind == "nutrition_history":
+                    item = tuple(item)
+                elif item["id"] in deleted:
+                    continue
+                if date is None or day_of(item).startswith(date):
+                    yield item
+    
+    def _segments(self, kind: str) -> List[Dict]:
+        """The listed archive segments of a kind, in the order they were written."""
+        return [segment for segment in self.data.get("archive", {}).get("segments", []) if segment["kind"] == kind]
+    
+    def _archive_deleted(self, kind: str) -> set:
+        """IDs of archived records of a kind that were deleted after archiving."""
+        return set(self.data.get("archive", {}).get("deleted", {}).get(kind, ()))
+    
+    def _delete_archived(self, kind: str, record_id: int) -> bool:
+        """Delete an archived record. Must hold the write lock; the caller invalidates caches.
+        
+        Segments are never rewritten, so the ID is added to a tombstone list
+        in the snapshot that _archived filters by. Only segments whose ID range
+        covers the record are read (segments written before ID ranges were
+        recorded have to be read regardless).
+        """
+        if record_id in self._archive_deleted(kind):
+            return False
+        candidates = [segment for segment in self._segments(kind)
+                      if segment.get("first_id", record_id) <= record_id <= segment.get("last_id", record_id)]
+        if not any(item["id"] == record_id for segment in candidates for item in self._read_segment(segment["file"])):
+            return False
+        self.data.setdefault("archive", {}).setdefault("deleted", {}).setdefault(kind, []).append(record_id)
+        self._commit({"op": "append", "path": ["archive", "deleted", kind], "value": record_id})
+        return True
+    
+    def _add_to_daily_totals(self, log: Dict) -> Dict:
+        """Fold one food log into its day's running totals. Returns the updated totals."""
+        totals = self.data["fitness"]["nutrition"]["daily_totals"]
+        if log["timestamp"][:10] not in totals:
+            bisect.insort(self._total_days, log["timestamp"][:10])
+        day = totals.setdefault(log["timestamp"][:10], {"calories": 0, "protein": 0, "carbs": 0, "fats": 0, "count": 0})
+        for field in NUTRIENTS:
+            day[field] += log[field]
+        day["count"] += 1
+        return day
+    
+    def _index_workout(self, workout: Dict) -> None:
+        key = workout["exercise"].lower()
+        dates = self._workout_dates_by_exercise.setdefault(key, [])
+        i = bisect.bisect_right(dates, workout["date"])
+        dates.insert(i, workout["date"])
+        self._workouts_by_exercise.setdefault(key, []).insert(i, workout)
+    
+    def _unindex_workout(self, workout: Dict) -> None:
+        key = workout["exercise"].lower()
+        dates = self._workout_dates_by_exercise[key]
+        workouts = self._workouts_by_exercise[key]
+        # Only entries sharing the workout's date need to be checked
+        for i in range(bisect.bisect_left(dates, workout["date"]), bisect.bisect_right(dates, workout["date"])):
+            if workouts[i] is workout:
+                del dates[i]
+                del workouts[i]
+                break
+        if not workouts:
+            del self._workouts_by_exercise[key]
+            del self._workout_dates_by_exercise[key]
+    
+    def _index_conversations(self) -> None:
+        self._conversations_by_date = {}
+        self._conversation_times = deque()
+        loaded_at = datetime.datetime.now()
+        for conv in self.data.get("conversations", []):
+            self._conversations_by_date.setdefault(conv["timestamp"][:10], []).append(conv)
+            try:
+                self._conversation_times.append(datetime.datetime.fromisoformat(conv["timestamp"]))
+            except (ValueError, TypeError):
+                # Keep conversations with unreadable timestamps for a full window to be safe
+                self._conversation_times.append(loaded_at)
+    
+    def _drop_oldest_conversations(self, count: int) -> List[Dict]:
+        """Remove the `count` oldest conversations from the history and its indexes."""
+        conversations = self.data["conversations"]
+        dropped = conversations[:count]
+        del conversations[:count]
+        for conv in dropped:
+            self._conversation_times.popleft()
+            date_str = conv["timestamp"][:10]
+            same_day = self._conversations_by_date[date_str]
+            same_day.pop(0)
+            if not same_day:
+                del self._conversations_by_date[date_str]
+        return dropped
+    
+    @_writer
+    def add_conversation(self, query: str, response: str, referenced: Iterable[str] = ()) -> None:
+        """Add a conversation entry to the history.
+        
+        `referenced` are long-term memory points the reply drew on; they are
+        counted as used in the same write, so frequently relevant ones survive
+        eviction.
+        """
         conversation = {
             "timestamp": datetime.datetime.now().isoformat(),
             "query": query,
@@ -65,164 +1104,196 @@ class Database:
             "key_points": self._extract_key_points(query, response)
         }
         self.data["conversations"].append(conversation)
+        self._conversations_by_date.setdefault(conversation["timestamp"][:10], []).append(conversation)
+        self._conversation_times.append(datetime.datetime.fromisoformat(conversation["timestamp"]))
         
-        # Keep only the last 5 conversations within 24 hours for efficiency
-        self._prune_conversations()
-            
-        self._save_data()
+        # Keep only the most recent conversations within the retention window
+        memory_records = self._prune_conversations()
+        memory_records.extend(self._mark_referenced(referenced))
         
-    def _extract_key_points(self, query: str, response: str) -> list:
-        """Extract key points from a conversation for long-term memory."""
-        # Simple extraction of potential key information based on keywords
-        key_points = []
+        self._invalidate("conversations", "long_term_memory")
+        self._commit({"op": "set", "path": ["conversations"], "value": self.data["conversations"]}, *memory_records)
         
-        # Keywords that might indicate important information
-        important_keywords = [
-            "remember", "don't forget", "important", "schedule", "appointment", 
-            "meeting", "event", "reminder", "preference", "like", "dislike",
-            "favorite", "birthday", "anniversary", "deadline"
-        ]
+    def _extract_key_points(self, query: str, response: str) -> list:
+        """Extract key points from a conversation for long-term memory.
         
-        # Check for sentences containing important keywords
-        combined_text = query + " " + response
-        sentences = combined_text.split(".")
+        A key point is a sentence containing one of the memory keywords. The
+        text is scanned once with the compiled keyword pattern, and sentence
+        boundaries are only located around hits; after a hit the scan resumes
+        at the next sentence.
+        """
+        text = query + "\n" + response
+        haystack, pattern = text.lower(), self._keyword_pattern
+        if len(haystack) != len(text):
+            # Some characters change length when lowercased; match the original text instead
+            haystack, pattern = text, re.compile(pattern.pattern, re.IGNORECASE)
         
-        for sentence in sentences:
-            sentence = sentence.strip()
-            if any(keyword in sentence.lower() for keyword in important_keywords) and len(sentence) > 10:
+        key_points = []
+        floor = 0
+        match = pattern.search(haystack)
+        while match:
+            start = _sentence_start(text, match.start(), floor)
+            boundary = SENTENCE_BOUNDARY.search(text, match.end())
+            end, floor = (boundary.start(), boundary.end()) if boundary else (len(text), len(text))
+            sentence = text[start:end].strip()
+            if len(sentence) > 10:
                 key_points.append(sentence)
-                
+            match = pattern.search(haystack, floor)
+        
         return key_points
     
-    def _prune_conversations(self) -> None:
-        """Prune conversations to keep only the last 5 within 24 hours."""
-        now = datetime.datetime.now()
+    def _prune_conversations(self) -> List[Dict]:
+        """Prune conversations to keep only the most recent ones within the retention window.
         
-        # First, extract key points from older conversations to preserve important information
+        Conversations are kept in time order, so this only looks at the ones
+        that actually fall out. Returns the journal records for the resulting
+        long-term memory changes.
+        """
+        cutoff = datetime.datetime.now() - self.conversation_retention
+        times = self._conversation_times
+        
+        # Conversations older than the window hand their key points over to long-term memory
+        expired = 0
+        while expired < len(times) and times[expired] <= cutoff:
+            expired += 1
         preserved_key_points = []
-        conversations_to_keep = []
+        for conv in self._drop_oldest_conversations(expired):
+            preserved_key_points.extend(conv.get("key_points", []))
         
-        for conv in self.data["conversations"]:
-            try:
-                conv_time = datetime.datetime.fromisoformat(conv["timestamp"])
-                time_diff = now - conv_time
-                
-                # If conversation is within 24 hours, keep it for context
-                if time_diff.total_seconds() < 24 * 60 * 60:
-                    conversations_to_keep.append(conv)
-                # Otherwise, preserve any key points
-                elif "key_points" in conv and conv["key_points"]:
-                    preserved_key_points.extend(conv["key_points"])
-            except (ValueError, TypeError):
-                # If timestamp parsing fails, keep the conversation to be safe
-                conversations_to_keep.append(conv)
+        # Keep only the most recent conversations
+        overflow = len(self.data["conversations"]) - self.conversation_max_recent
+        if overflow > 0:
+            self._drop_oldest_conversations(overflow)
         
-        # Keep only the 5 most recent conversations
-        if len(conversations_to_keep) > 5:
-            conversations_to_keep = conversations_to_keep[-5:]
-            
-        # Store the preserved key points in a special memory section if not already there
-        if "long_term_memory" not in self.data:
-            self.data["long_term_memory"] = {}
-            
-        if "key_points" not in self.data["long_term_memory"]:
-            self.data["long_term_memory"]["key_points"] = []
-            
-        # Add unique key points to long-term memory
-        for point in preserved_key_points:
-            if point not in self.data["long_term_memory"]["key_points"]:
-                self.data["long_term_memory"]["key_points"].append(point)
-                
-        # Replace conversations with pruned list
-        self.data["conversations"] = conversations_to_keep
+        # Preserve key points in long-term memory (hashed, so no list scans)
+        return self._remember(preserved_key_points)
     
+    @_reader
     def get_recent_conversations(self, limit: int = 5) -> List[Dict]:
         """Get the most recent conversations (default: last 5)."""
-        return self.data["conversations"][-limit:]
+        return [dict(conv) for conv in self.data["conversations"][-limit:]]
         
+    @_reader
     def get_long_term_memory(self) -> List[str]:
-        """Get the preserved key points from long-term memory."""
-        if "long_term_memory" in self.data and "key_points" in self.data["long_term_memory"]:
-            return self.data["long_term_memory"]["key_points"]
-        return []
+        """Get the preserved key points from long-term memory, oldest first."""
+        return [entry["text"] for entry in self.data["long_term_memory"]["entries"].values()]
     
+    def _mark_referenced(self, points: Iterable[str]) -> List[Dict]:
+        """Count long-term memory points as used. Returns the journal records for the changed entries."""
+        entries = self.data["long_term_memory"]["entries"]
+        now = datetime.datetime.now().isoformat()
+        records = []
+        for point in points:
+            key = memory_hash(point)
+            if key in entries:
+                entries[key]["count"] += 1
+                entries[key]["last_referenced"] = now
+                records.append({"op": "set", "path": ["long_term_memory", "entries", key], "value": entries[key]})
+        return records
+    
+    @_reader
     def get_conversations_for_date(self, date: datetime.date) -> List[Dict]:
         """Get conversations for a specific date."""
         date_str = date.isoformat().split('T')[0]  # Get just the date part
-        return [conv for conv in self.data["conversations"] 
-                if conv["timestamp"].startswith(date_str)]
+        return [dict(conv) for conv in self._conversations_by_date.get(date_str, [])]
     
+    @_writer
     def add_schedule_item(self, title: str, date: str, time: str, description: str = "") -> Dict:
         """Add a scheduled item to the calendar."""
+        item_id, sequence_record = self._next_id("schedule")
         schedule_item = {
-            "id": len(self.data["schedule"]) + 1,
+            "id": item_id,
             "title": title,
             "date": date,
             "time": time,
             "description": description,
             "completed": False
         }
-        self.data["schedule"].append(schedule_item)
-        self._save_data()
+        self._append_record("schedule", schedule_item)
+        self._commit({"op": "append", "path": ["schedule"], "value": schedule_item}, sequence_record)
         return schedule_item
     
+    @_reader
     def get_schedule_for_date(self, date: str) -> List[Dict]:
         """Get all scheduled items for a specific date."""
-        return [item for item in self.data["schedule"] if item["date"] == date]
+        return self._date_page("schedule", date, date, None, None)["items"]
     
+    @_reader
     def get_upcoming_schedule(self, days: int = 7) -> List[Dict]:
         """Get upcoming scheduled items for the next X days."""
+        if days <= 0:
+            return []
         today = datetime.date.today()
-        upcoming_dates = [(today + datetime.timedelta(days=i)).isoformat() for i in range(days)]
-        return [item for item in self.data["schedule"] if item["date"] in upcoming_dates]
+        last_day = (today + datetime.timedelta(days=days - 1)).isoformat()
+        items = self._date_page("schedule", today.isoformat(), last_day, None, None)["items"]
+        return sorted(items, key=lambda item: item["id"])
     
+    @_reader
+    def get_schedule_page(self, start: str = None, end: str = None, cursor: str = None, limit: int = None) -> Dict:
+        """Get scheduled items dated from `start` to `end` (inclusive), one page at a time.
+        
+        Items come in (date, id) order. Pass the returned `next_cursor` back
+        to get the following page; it is None after the last one.
+        """
+        return self._date_page("schedule", start, end, cursor, limit)
+    
+    @_writer
     def mark_schedule_completed(self, schedule_id: int, completed: bool = True) -> bool:
         """Mark a scheduled item as completed or not completed."""
-        for item in self.data["schedule"]:
-            if item["id"] == schedule_id:
-                item["completed"] = completed
-                self._save_data()
-                return True
-        return False
-        
-    def delete_schedule_item(self, schedule_id: int) -> bool:
-        """Delete a scheduled item by its ID."""
-        for i, item in enumerate(self.data["schedule"]):
-            if item["id"] == schedule_id:
-                self.data["schedule"].pop(i)
-                self._save_data()
-                return True
-        return False
+        item = self._find_record("schedule", schedule_id)
+        if item is None:
+            return False
+        item["completed"] = completed
+        self._commit({"op": "update", "path": ["schedule"], "id": schedule_id, "value": {"completed": completed}})
+        return True
         
-    def delete_workout(self, workout_id: int) -> bool:
-        """Delete a workout entry by its ID."""
-        for i, workout in enumerate(self.data["fitness"]["workouts"]):
-            if workout["id"] == workout_id:
-                self.data["fitness"]["workouts"].pop(i)
-                self._save_data()
-                return True
-        return False
-    
+    @_writer
     def add_workout(self, exercise: str, reps: int, weight: float, date: str = None) -> Dict:
         """Add a workout entry to fitness tracking."""
         if date is None:
             date = datetime.date.today().isoformat()
             
+        workout_id, sequence_record = self._next_id("workouts")
         workout = {
-            "id": len(self.data["fitness"]["workouts"]) + 1,
+            "id": workout_id,
             "date": date,
             "exercise": exercise,
             "reps": reps,
             "weight": weight
         }
-        self.data["fitness"]["workouts"].append(workout)
-        self._save_data()
+        self._append_record("workouts", workout)
+        self._index_workout(workout)
+        self._invalidate("workouts")
+        self._commit({"op": "append", "path": ["fitness", "workouts"], "value": workout}, sequence_record)
         return workout
     
+    def add_workouts(self, workouts: List[Dict]) -> List[Dict]:
+        """Add several workout entries with a single commit.
+        
+        Each entry takes the arguments of add_workout as keys and is expected
+        to be validated by the caller. Returns the stored workouts in order.
+        """
+        today = datetime.date.today().isoformat()
+        return self._add_records("workouts", [{
+            "date": workout.get("date") or today,
+            "exercise": workout["exercise"],
+            "reps": workout["reps"],
+            "weight": workout["weight"]
+        } for workout in workouts])
+    
+    @_reader
     def get_exercise_progress(self, exercise: str) -> List[Dict]:
-        """Get progress history for a specific exercise."""
-        return [w for w in self.data["fitness"]["workouts"] if w["exercise"].lower() == exercise.lower()]
+        """Get progress history for a specific exercise, oldest first."""
+        key = exercise.lower()
+        workouts = self._workouts_by_exercise.get(key, [])
+        archived = [workout for workout in self._archived("workouts", exercise=key)
+                    if workout["exercise"].lower() == key]
+        if archived:
+            workouts = sorted(archived + workouts, key=lambda w: (w["date"], w["id"]))
+        return [dict(workout) for workout in workouts]
     
+    @_reader
+    @_memoized("workouts")
     def calculate_fitness_progress(self, exercise: str) -> Dict:
         """Calculate progress for a specific exercise."""
         exercise_data = self.get_exercise_progress(exercise)
@@ -230,9 +1301,7 @@ class Database:
         if not exercise_data or len(exercise_data) < 2:
             return {"status": "insufficient_data", "message": "Need more workout data to calculate progress"}
         
-        # Sort by date
-        exercise_data.sort(key=lambda x: x["date"])
-        
+        # get_exercise_progress already returns workouts oldest first
         first_workout = exercise_data[0]
         latest_workout = exercise_data[-1]
         
@@ -261,6 +1330,7 @@ class Database:
             "on_track": volume_change_percent > 0
         }
     
+    @_writer
     def add_movie_preference(self, genre: str, title: str = None, rating: int = None) -> None:
         """Add a movie preference to help with recommendations."""
         preference = {
@@ -275,8 +1345,11 @@ class Database:
             preference["rating"] = rating
             
         self.data["movie_preferences"].append(preference)
-        self._save_data()
+        self._invalidate("movie_preferences")
+        self._commit({"op": "append", "path": ["movie_preferences"], "value": preference})
     
+    @_reader
+    @_memoized("movie_preferences")
     def get_movie_preferences(self) -> List[str]:
         """Get list of preferred movie genres based on history."""
         genres = {}
@@ -292,42 +1365,68 @@ class Database:
         sorted_genres = sorted(genres.items(), key=lambda x: x[1], reverse=True)
         return [genre for genre, _ in sorted_genres]
     
+    @_writer
     def delete_schedule_item(self, item_id: int) -> bool:
         """Delete a schedule item by its ID."""
-        for i, item in enumerate(self.data["schedule"]):
-            if item["id"] == item_id:
-                self.data["schedule"].pop(i)
-                self._save_data()
-                return True
-        return False
+        if self._swap_remove_record("schedule", item_id) is None:
+            return False
+        self._commit({"op": "swap_remove", "path": ["schedule"], "id": item_id})
+        return True
 
+    @_writer
     def delete_workout(self, workout_id: int) -> bool:
         """Delete a workout by its ID."""
-        for i, workout in enumerate(self.data["fitness"]["workouts"]):
-            if workout["id"] == workout_id:
-                self.data["fitness"]["workouts"].pop(i)
-                self._save_data()
-                return True
-        return False
+        workout = self._swap_remove_record("workouts", workout_id)
+        if workout is None:
+            if not self._delete_archived("workouts", workout_id):
+                return False
+            self._invalidate("workouts")
+            return True
+        self._unindex_workout(workout)
+        self._invalidate("workouts")
+        self._commit({"op": "swap_remove", "path": ["fitness", "workouts"], "id": workout_id})
+        return True
 
+    @_reader
+    @_memoized("workouts")
     def get_recent_workouts(self, limit: int = 10) -> List[Dict]:
-        """Get the most recent workouts."""
-        workouts = sorted(self.data["fitness"]["workouts"], key=lambda x: x["date"], reverse=True)
-        return workouts[:limit]
+        """Get the most recent workouts.
+        
+        Archive segments are read newest first, and only until no older
+        segment can hold a workout that would make the cut.
+        """
+        def newest(workouts):
+            # Newest date first, lowest ID first within a day (deletes do not keep list order)
+            workouts = sorted(workouts, key=lambda x: x["id"])
+            workouts.sort(key=lambda x: x["date"], reverse=True)
+            return workouts[:limit]
+        
+        workouts = newest(self.data["fitness"]["workouts"])
+        deleted = self._archive_deleted("workouts")
+        for segment in sorted(self._segments("workouts"), key=lambda s: s["end"], reverse=True):
+            if len(workouts) >= limit and (not workouts or segment["end"] < workouts[-1]["date"]):
+                break
+            workouts = newest(workouts + [workout for workout in self._read_segment(segment["file"])
+                                          if workout["id"] not in deleted])
+        return [dict(workout) for workout in workouts]
 
+    @_reader
     def get_user_name(self) -> str:
         """Get the user's name."""
         return self.data["user"]["name"]
     
+    @_writer
     def set_user_preference(self, key: str, value: Any) -> None:
         """Set a user preference."""
         self.data["user"]["preferences"][key] = value
-        self._save_data()
+        self._commit({"op": "set", "path": ["user", "preferences", key], "value": value})
     
+    @_reader
     def get_user_preference(self, key: str, default: Any = None) -> Any:
         """Get a user preference."""
         return self.data["user"]["preferences"].get(key, default)
 
+    @_writer
     def set_nutrition_goals(self, calories: int, protein: int, carbs: int, fats: int, goal_type: str) -> Dict:
         """Set nutrition goals for the user."""
         nutrition_goals = {
@@ -338,13 +1437,15 @@ class Database:
             "goal_type": goal_type  # 'cut', 'bulk', or 'maintain'
         }
         self.data["fitness"]["nutrition"]["goals"] = nutrition_goals
-        self._save_data()
+        self._commit({"op": "set", "path": ["fitness", "nutrition", "goals"], "value": nutrition_goals})
         return nutrition_goals
 
+    @_writer
     def log_food_intake(self, food_name: str, calories: int, protein: float = 0, carbs: float = 0, fats: float = 0) -> Dict:
         """Log food intake with nutritional information."""
+        log_id, sequence_record = self._next_id("food_logs")
         log_entry = {
-            "id": len(self.data["fitness"]["nutrition"]["logs"]) + 1,
+            "id": log_id,
             "timestamp": datetime.datetime.now().isoformat(),
             "food_name": food_name,
             "calories": calories,
@@ -352,38 +1453,79 @@ class Database:
             "carbs": carbs,
             "fats": fats
         }
-        self.data["fitness"]["nutrition"]["logs"].append(log_entry)
-        self._save_data()
+        self._append_record("food_logs", log_entry)
+        self._food_logs_by_date.setdefault(log_entry["timestamp"][:10], []).append(log_entry)
+        day_totals = self._add_to_daily_totals(log_entry)
+        self._commit({"op": "append", "path": ["fitness", "nutrition", "logs"], "value": log_entry},
+                     {"op": "set", "path": ["fitness", "nutrition", "daily_totals", log_entry["timestamp"][:10]],
+                      "value": day_totals}, sequence_record)
         return log_entry
 
+    @_writer
     def log_weight(self, weight: float, date: str = None) -> Dict:
         """Log user's weight measurement."""
         if date is None:
             date = datetime.date.today().isoformat()
 
+        log_id, sequence_record = self._next_id("weight_logs")
         log_entry = {
-            "id": len(self.data["fitness"]["nutrition"]["weight_logs"]) + 1,
+            "id": log_id,
             "date": date,
             "weight": weight
         }
-        self.data["fitness"]["nutrition"]["weight_logs"].append(log_entry)
-        self._save_data()
+        self._append_record("weight_logs", log_entry)
+        self._commit({"op": "append", "path": ["fitness", "nutrition", "weight_logs"], "value": log_entry},
+                     sequence_record)
         return log_entry
 
-    def get_nutrition_summary(self, date: str = None) -> Dict:
-        """Get nutrition summary for a specific date."""
+    def log_food_intakes(self, logs: List[Dict]) -> List[Dict]:
+        """Log several foods with a single commit (keys as the arguments of log_food_intake)."""
+        return self._add_records("nutrition_logs", [{
+            "timestamp": datetime.datetime.now().isoformat(),
+            "food_name": log["food_name"],
+            "calories": log["calories"],
+            "protein": log.get("protein", 0),
+            "carbs": log.get("carbs", 0),
+            "fats": log.get("fats", 0)
+        } for log in logs])
+
+    def log_weights(self, logs: List[Dict]) -> List[Dict]:
+        """Log several weight measurements with a single commit (keys as the arguments of log_weight)."""
+        today = datetime.date.today().isoformat()
+        return self._add_records("weight_logs", [{
+            "date": log.get("date") or today,
+            "weight": log["weight"]
+        } for log in logs])
+
+    @_reader
+    def get_nutrition_summary(self, date: str = None, cursor: str = None, limit: int = None) -> Dict:
+        """Get nutrition summary for a specific date.
+        
+        The totals always cover the whole date; `limit` and `cursor` page
+        through its logs in ID order, with `next_cursor` pointing at the rest.
+        """
+        check_page_limit(limit)
         if date is None:
             date = datetime.date.today().isoformat()
 
-        # Filter logs for the specified date
-        daily_logs = [log for log in self.data["fitness"]["nutrition"]["logs"]
-                     if log["timestamp"].startswith(date)]
+        logs = self._food_logs_for(date)
+        if cursor or limit is not None:
+            logs = sorted(logs, key=lambda log: log["id"])
+        if cursor:
+            after = int(cursor)
+            logs = [log for log in logs if log["id"] > after]
+        next_cursor = None
+        if limit is not None and len(logs) > limit:
+            logs = logs[:limit]
+            next_cursor = str(logs[-1]["id"])
+        daily_logs = [dict(log) for log in logs]
 
-        # Calculate totals
-        total_calories = sum(log["calories"] for log in daily_logs)
-        total_protein = sum(log["protein"] for log in daily_logs)
-        total_carbs = sum(log["carbs"] for log in daily_logs)
-        total_fats = sum(log["fats"] for log in daily_logs)
+        # Totals come from the running aggregates, not from re-summing the logs
+        day_totals = self._daily_totals_matching(date)
+        total_calories = sum(day["calories"] for day in day_totals)
+        total_protein = sum(day["protein"] for day in day_totals)
+        total_carbs = sum(day["carbs"] for day in day_totals)
+        total_fats = sum(day["fats"] for day in day_totals)
 
         goals = self.data["fitness"]["nutrition"]["goals"]
         
@@ -396,23 +1538,197 @@ class Database:
             "remaining_calories": goals["calories"] - total_calories if goals["calories"] > 0 else 0,
             "remaining_protein": goals["protein"] - total_protein if goals["protein"] > 0 else 0,
             "goal_type": goals["goal_type"],
-            "logs": daily_logs
+            "logs": daily_logs,
+            "next_cursor": next_cursor
+        }
+
+    def _daily_totals_matching(self, date: str) -> List[Dict]:
+        """Per-day aggregates for a full YYYY-MM-DD day, or for every day starting with a partial date."""
+        totals = self.data["fitness"]["nutrition"].get("daily_totals", {})
+        if len(date) >= 10:
+            return [totals[date]] if date in totals else []
+        return [day_totals for day, day_totals in totals.items() if day.startswith(date)]
+    
+    def _daily_totals_between(self, start_date: datetime.date, end_date: datetime.date) -> List[tuple]:
+        """(day, totals) pairs for logged days in the inclusive range, oldest first."""
+        totals = self.data["fitness"]["nutrition"].get("daily_totals", {})
+        days = self._total_days
+        lo = bisect.bisect_left(days, start_date.isoformat())
+        hi = bisect.bisect_right(days, end_date.isoformat())
+        return [(day, dict(totals[day])) for day in days[lo:hi]]
+    
+    @_reader
+    def get_nutrition_range_summary(self, start_date: str, end_date: str) -> Dict:
+        """Get nutrition totals and per-day averages for an inclusive date range (e.g. a week or month).
+        
+        Averages are taken over the days that have at least one log.
+        """
+        start = datetime.date.fromisoformat(start_date)
+        end = datetime.date.fromisoformat(end_date)
+        if end < start:
+            raise ValueError("end_date must not be before start_date")
+        
+        daily = self._daily_totals_between(start, end)
+        logged_days = len(daily)
+        summary = {
+            "start_date": start.isoformat(),
+            "end_date": end.isoformat(),
+            "days": (end - start).days + 1,
+            "logged_days": logged_days
         }
+        for field in NUTRIENTS:
+            total = sum(totals[field] for _, totals in daily)
+            summary[f"total_{field}"] = total
+            summary[f"average_{field}"] = total / logged_days if logged_days else 0
+        summary["daily"] = [dict(totals, date=day) for day, totals in daily]
+        return summary
+    
+    def _food_logs_for(self, date: str) -> List[Dict]:
+        """Food logs whose timestamp starts with `date` (usually a full YYYY-MM-DD day)."""
+        archived = [log for log in self._archived("food_logs", date[:10]) if log["timestamp"].startswith(date)]
+        if len(date) >= 10:
+            return archived + [log for log in self._food_logs_by_date.get(date[:10], [])
+                               if log["timestamp"].startswith(date)]
+        # Partial dates (e.g. a month) still match by prefix, one bucket per day
+        return archived + [log for day in sorted(self._food_logs_by_date) if day.startswith(date)
+                           for log in self._food_logs_by_date[day]]
+
+    @_reader
+    def get_nutrition_history(self, date: str) -> Optional[Dict]:
+        """Get the archived logs and summary of a day that was closed by reset_daily_nutrition."""
+        entry = self.data["fitness"].get("nutrition_history", {}).get(date)
+        if entry is None:
+            entry = next((entry for day, entry in self._archived("nutrition_history", date) if day == date), None)
+        return _copy_result(entry)
 
+    @_reader
     def get_weight_history(self, days: int = 30) -> List[Dict]:
         """Get weight history for the specified number of days."""
-        weight_logs = sorted(self.data["fitness"]["nutrition"]["weight_logs"],
-                           key=lambda x: x["date"])
-        return weight_logs[-days:] if days > 0 else weight_logs
+        _, weight_logs = self._date_order["weight_logs"]
+        weight_logs = weight_logs[-days:] if days > 0 else weight_logs
+        return [dict(log) for log in weight_logs]
 
+    @_reader
+    def get_weight_page(self, start: str = None, end: str = None, cursor: str = None, limit: int = None) -> Dict:
+        """Get weight logs dated from `start` to `end` (inclusive), one page at a time (see get_schedule_page)."""
+        return self._date_page("weight_logs", start, end, cursor, limit)
+
+    # --- Export / import ---
+    
+    def iter_records(self, collection: str, batch_size: int = 500):
+        """Yield copies of a collection's records in batches, archived ones first.
+        
+        The read lock is only held while a batch is copied, so a long export
+        does not hold up writers.
+        """
+        if collection not in TRANSFER_COLLECTIONS:
+            raise ValueError(f"Unknown collection: {collection}")
+        name = TRANSFER_COLLECTIONS[collection]
+        if name in ARCHIVE_KINDS:
+            with self._lock.read():
+                segments = [segment["file"] for segment in self.data.get("archive", {}).get("segments", [])
+                            if segment["kind"] == name]
+                deleted = self._archive_deleted(name)
+            for segment in segments:
+                items = [item for item in self._read_segment(segment) if item["id"] not in deleted]
+                for start in range(0, len(items), batch_size):
+                    yield [dict(item) for item in items[start:start + batch_size]]
+        
+        position = 0
+        while True:
+            with self._lock.read():
+                items = self._collection(name) if name else self.data["conversations"]
+                batch = [dict(item) for item in items[position:position + batch_size]]
+            if not batch:
+                return
+            position += len(batch)
+            yield batch
+    
+    def import_records(self, collection: str, items: List[Dict]) -> int:
+        """Add a batch of records to a collection with a single commit. Returns the number added.
+        
+        Records get fresh IDs. The whole batch is validated before anything
+        is applied, so a bad record rejects the batch with ValueError.
+        Imported conversations are pruned like new ones, so those outside
+        the retention window only leave their key points behind.
+        """
+        if collection not in TRANSFER_COLLECTIONS:
+            raise ValueError(f"Unknown collection: {collection}")
+        records = []
+        for row, item in enumerate(items, 1):
+            try:
+                records.append(self._transfer_record(collection, item))
+            except (KeyError, TypeError, ValueError) as e:
+                raise ValueError(f"Invalid {collection} record {row} of {len(items)}: {e}") from e
+        return len(self._add_records(collection, records))
+    
+    @_writer
+    def _add_records(self, collection: str, records: List[Dict]) -> List[Dict]:
+        """Store already validated records with a single commit and return them with their IDs."""
+        if not records:
+            return []
+        
+        name = TRANSFER_COLLECTIONS[collection]
+        if name is None:
+            self.data["conversations"].extend(records)
+            self.data["conversations"].sort(key=lambda conv: conv["timestamp"])
+            self._index_conversations()
+            memory_records = self._prune_conversations()
+            self._invalidate("conversations", "long_term_memory")
+            self._commit({"op": "set", "path": ["conversations"], "value": self.data["conversations"]},
+                         *memory_records)
+            return records
+        
+        stored = []
+        for record in records:
+            self.data["sequences"][name] += 1
+            record = dict(id=self.data["sequences"][name], **record)
+            self._append_record(name, record)
+            stored.append(record)
+        records = stored
+        journal_records = [{"op": "extend", "path": list(ID_COLLECTIONS[name]), "value": records},
+                           {"op": "set", "path": ["sequences", name], "value": self.data["sequences"][name]}]
+        if name == "workouts":
+            for record in records:
+                self._index_workout(record)
+            self._invalidate("workouts")
+        elif name == "food_logs":
+            days = {}
+            for record in records:
+                self._food_logs_by_date.setdefault(record["timestamp"][:10], []).append(record)
+                days[record["timestamp"][:10]] = self._add_to_daily_totals(record)
+            journal_records.extend({"op": "set", "path": ["fitness", "nutrition", "daily_totals", day], "value": totals}
+                                   for day, totals in days.items())
+        self._commit(*journal_records)
+        return records
+    
+    @staticmethod
+    def _transfer_record(collection: str, item: Dict) -> Dict:
+        """Build a stored record from an imported one, keeping only known fields."""
+        if collection == "schedule":
+            return {"title": str(item["title"]), "date": _iso_date(item["date"]), "time": str(item["time"]),
+                    "description": str(item.get("description") or ""), "completed": bool(item.get("completed", False))}
+        if collection == "workouts":
+            return {"date": _iso_date(item["date"]), "exercise": str(item["exercise"]), "reps": int(item["reps"]),
+                    "weight": float(item["weight"])}
+        if collection == "nutrition_logs":
+            record = {"timestamp": _iso_timestamp(item["timestamp"]), "food_name": str(item["food_name"]),
+                      "calories": int(item["calories"])}
+            record.update((field, float(item.get(field) or 0)) for field in ("protein", "carbs", "fats"))
+            return record
+        if collection == "weight_logs":
+            return {"date": _iso_date(item["date"]), "weight": float(item["weight"])}
+        return {"timestamp": _iso_timestamp(item["timestamp"]), "query": str(item["query"]), "response": str(item["response"]),
+                "key_points": [str(point) for point in item.get("key_points") or []]}
+    
+    @_writer
     def reset_daily_nutrition(self) -> None:
         """Reset daily nutrition logs and archive them."""
         today = datetime.date.today()
         yesterday = (today - datetime.timedelta(days=1)).isoformat()
         
         # Get yesterday's logs
-        yesterday_logs = [log for log in self.data["fitness"]["nutrition"]["logs"]
-                         if log["timestamp"].startswith(yesterday)]
+        yesterday_logs = self._food_logs_for(yesterday)
         
         # Archive yesterday's logs if any exist
         if yesterday_logs:
@@ -425,12 +1741,19 @@ class Database:
             }
         
         # Clear current logs that are older than today
-        self.data["fitness"]["nutrition"]["logs"] = [
-            log for log in self.data["fitness"]["nutrition"]["logs"]
-            if log["timestamp"].startswith(today.isoformat())
-        ]
+        today_logs = self._food_logs_by_date.get(today.isoformat(), [])
+        self.data["fitness"]["nutrition"]["logs"] = list(today_logs)
+        self._food_logs_by_date = {today.isoformat(): today_logs} if today_logs else {}
+        self._index_positions("food_logs")
         
-        self._save_data()
+        records = [{"op": "set", "path": ["fitness", "nutrition", "logs"], "value": self.data["fitness"]["nutrition"]["logs"]}]
+        if yesterday_logs:
+            records.append({"op": "set", "path": ["fitness", "nutrition_history", yesterday],
+                            "value": self.data["fitness"]["nutrition_history"][yesterday]})
+        self._commit(*records)
+        
+        if self.archive_after_days is not None:
+            self.archive_cold_data()
         def add_notification(self, time: str, message: str, date: str = None) -> Dict:
             """Add a notification reminder."""
             if date is None:
@@ -512,124 +1835,12 @@ class Database:
                     return True
             return False
 
-    def get_recent_workouts(self, limit: int = 10) -> List[Dict]:
-        """Get the most recent workouts."""
-        workouts = sorted(self.data["fitness"]["workouts"], key=lambda x: x["date"], reverse=True)
-        return workouts[:limit]
-
-    def get_user_name(self) -> str:
-        """Get the user's name."""
-        return self.data["user"]["name"]
-    
-    def set_user_preference(self, key: str, value: Any) -> None:
-        """Set a user preference."""
-        self.data["user"]["preferences"][key] = value
-        self._save_data()
-    
-    def get_user_preference(self, key: str, default: Any = None) -> Any:
-        """Get a user preference."""
-        return self.data["user"]["preferences"].get(key, default)
-
-    def set_nutrition_goals(self, calories: int, protein: int, carbs: int, fats: int, goal_type: str) -> Dict:
-        """Set nutrition goals for the user."""
-        nutrition_goals = {
-            "calories": calories,
-            "protein": protein,
-            "carbs": carbs,
-            "fats": fats,
-            "goal_type": goal_type  # 'cut', 'bulk', or 'maintain'
-        }
-        self.data["fitness"]["nutrition"]["goals"] = nutrition_goals
-        self._save_data()
-        return nutrition_goals
 
-    def log_food_intake(self, food_name: str, calories: int, protein: float = 0, carbs: float = 0, fats: float = 0) -> Dict:
-        """Log food intake with nutritional information."""
-        log_entry = {
-            "id": len(self.data["fitness"]["nutrition"]["logs"]) + 1,
-            "timestamp": datetime.datetime.now().isoformat(),
-            "food_name": food_name,
-            "calories": calories,
-            "protein": protein,
-            "carbs": carbs,
-            "fats": fats
-        }
-        self.data["fitness"]["nutrition"]["logs"].append(log_entry)
-        self._save_data()
-        return log_entry
-
-    def log_weight(self, weight: float, date: str = None) -> Dict:
-        """Log user's weight measurement."""
-        if date is None:
-            date = datetime.date.today().isoformat()
-
-        log_entry = {
-            "id": len(self.data["fitness"]["nutrition"]["weight_logs"]) + 1,
-            "date": date,
-            "weight": weight
-        }
-        self.data["fitness"]["nutrition"]["weight_logs"].append(log_entry)
-        self._save_data()
-        return log_entry
-
-    def get_nutrition_summary(self, date: str = None) -> Dict:
-        """Get nutrition summary for a specific date."""
-        if date is None:
-            date = datetime.date.today().isoformat()
-
-        # Filter logs for the specified date
-        daily_logs = [log for log in self.data["fitness"]["nutrition"]["logs"]
-                     if log["timestamp"].startswith(date)]
-
-        # Calculate totals
-        total_calories = sum(log["calories"] for log in daily_logs)
-        total_protein = sum(log["protein"] for log in daily_logs)
-        total_carbs = sum(log["carbs"] for log in daily_logs)
-        total_fats = sum(log["fats"] for log in daily_logs)
-
-        goals = self.data["fitness"]["nutrition"]["goals"]
-        
-        return {
-            "date": date,
-            "total_calories": total_calories,
-            "total_protein": total_protein,
-            "total_carbs": total_carbs,
-            "total_fats": total_fats,
-            "remaining_calories": goals["calories"] - total_calories if goals["calories"] > 0 else 0,
-            "remaining_protein": goals["protein"] - total_protein if goals["protein"] > 0 else 0,
-            "goal_type": goals["goal_type"],
-            "logs": daily_logs
-        }
-
-    def get_weight_history(self, days: int = 30) -> List[Dict]:
-        """Get weight history for the specified number of days."""
-        weight_logs = sorted(self.data["fitness"]["nutrition"]["weight_logs"],
-                           key=lambda x: x["date"])
-        return weight_logs[-days:] if days > 0 else weight_logs
-
-    def reset_daily_nutrition(self) -> None:
-        """Reset daily nutrition logs and archive them."""
-        today = datetime.date.today()
-        yesterday = (today - datetime.timedelta(days=1)).isoformat()
-        
-        # Get yesterday's logs
-        yesterday_logs = [log for log in self.data["fitness"]["nutrition"]["logs"]
-                         if log["timestamp"].startswith(yesterday)]
-        
-        # Archive yesterday's logs if any exist
-        if yesterday_logs:
-            if "nutrition_history" not in self.data["fitness"]:
-                self.data["fitness"]["nutrition_history"] = {}
-            
-            self.data["fitness"]["nutrition_history"][yesterday] = {
-                "logs": yesterday_logs,
-                "summary": self.get_nutrition_summary(yesterday)
-            }
-        
-        # Clear current logs that are older than today
-        self.data["fitness"]["nutrition"]["logs"] = [
-            log for log in self.data["fitness"]["nutrition"]["logs"]
-            if log["timestamp"].startswith(today.isoformat())
-        ]
-        
-        self._save_data()
+def create_database(backend: str = "json", **kwargs) -> Database:
+    """Create a database with the requested storage backend ('json' or 'sqlite')."""
+    if backend == "json":
+        return Database(**kwargs)
+    if backend == "sqlite":
+        from sqlite_database import SQLiteDatabase
+        return SQLiteDatabase(**kwargs)
+    raise ValueError(f"Unknown database backend: {backend}")
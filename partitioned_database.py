@@ -0,0 +1,216 @@
+import os
+import re
+import json
+import hmac
+import hashlib
+import threading
+import contextlib
+import datetime
+import time
+from collections import OrderedDict
+from typing import Dict, Optional
+from database import Database, create_database
+
+# The single user of pre-partitioning deployments, authenticated with ADMIN_PASSWORD
+DEFAULT_USER_ID = "default"
+
+# User IDs become file names, so keep them to a safe character set
+USER_ID_PATTERN = re.compile(r"^[A-Za-z0-9_.-]{1,64}$")
+
+PARTITION_EXTENSIONS = {"json": ".json", "sqlite": ".db"}
+
+# Successful password checks remembered so PBKDF2 runs once per session rather than per request
+AUTH_CACHE_SIZE = 1024
+
+
+class PartitionedDatabase:
+    """Per-user databases, one partition file each, opened lazily.
+
+    Only recently used partitions stay open. When more than `max_open` are
+    open, or their combined memory footprint exceeds `memory_budget_mb`, the
+    least recently used ones are closed. Partitions in use by a request are
+    pinned (see `acquire`/`release`) and never evicted, so the limits can be
+    exceeded while every open partition is busy. Partitions are opened
+    outside the global lock, so a slow load only delays requests for that
+    user.
+
+    Successful password checks are remembered for `auth_cache_ttl` seconds,
+    keyed by an HMAC of the credentials under a per-process key, so the
+    password itself is never kept.
+    """
+
+    def __init__(self, data_dir="users", backend="json", max_open=64, memory_budget_mb=256,
+                 default_user_file=None, auth_cache_ttl=300, **db_kwargs):
+        if backend not in PARTITION_EXTENSIONS:
+            raise ValueError(f"Unknown database backend: {backend}")
+        self.data_dir = data_dir
+        self.backend = backend
+        self.max_open = max_open
+        self.memory_budget = memory_budget_mb * 1024 * 1024
+        # Lets the default user keep the file it used before partitioning
+        self.default_user_file = default_user_file
+        self.db_kwargs = db_kwargs
+        os.makedirs(data_dir, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._open = OrderedDict()  # user_id -> Database, least recently used first
+        self._pins = {}  # user_id -> number of requests using the partition
+        self._opening = {}  # user_id -> lock held while that partition is being opened
+        self._footprints = {}  # user_id -> memory footprint when last measured
+        self._footprint = 0  # sum of _footprints
+        self.stats = {"opens": 0, "evictions": 0}
+
+        self.auth_cache_ttl = auth_cache_ttl
+        self._auth_key = os.urandom(32)
+        self._auth_cache = OrderedDict()  # HMAC of the credentials -> time.monotonic() expiry
+
+        self.users_file = os.path.join(data_dir, "users.json")
+        self._users = {}
+        if os.path.exists(self.users_file):
+            with open(self.users_file, 'r') as f:
+                self._users = json.load(f)
+
+    # --- Users ---
+
+    @staticmethod
+    def _hash_password(password: str, salt: bytes) -> str:
+        return hashlib.pbkdf2_hmac('sha256', password.encode(), salt, 100000).hex()
+
+    def add_user(self, user_id: str, password: str) -> None:
+        """Register a user with their own partition and password."""
+        if not USER_ID_PATTERN.match(user_id) or user_id == DEFAULT_USER_ID:
+            raise ValueError(f"Invalid user ID: {user_id!r}")
+        if not password:
+            raise ValueError("Password must not be empty")
+        salt = os.urandom(16)
+        with self._lock:
+            if user_id in self._users:
+                raise ValueError(f"User already exists: {user_id}")
+            self._users[user_id] = {
+                "salt": salt.hex(),
+                "password_hash": self._hash_password(password, salt),
+                "created": datetime.datetime.now().isoformat()
+            }
+            tmp_file = self.users_file + ".tmp"
+            with open(tmp_file, 'w') as f:
+                json.dump(self._users, f, indent=4)
+            os.replace(tmp_file, self.users_file)
+
+    def verify_user(self, user_id: str, password: Optional[str]) -> bool:
+        """Check a registered user's password (the default user is checked by the caller)."""
+        user = self._users.get(user_id)
+        if user is None or not password:
+            return False
+        # The stored hash is part of the key, so a changed password never matches an old entry
+        key = hmac.new(self._auth_key, "\0".join((user_id, user["password_hash"], password)).encode(),
+                       hashlib.sha256).digest()
+        now = time.monotonic()
+        with self._lock:
+            expiry = self._auth_cache.get(key)
+            if expiry is not None and expiry > now:
+                self._auth_cache.move_to_end(key)
+                return True
+        expected = self._hash_password(password, bytes.fromhex(user["salt"]))
+        if not hmac.compare_digest(expected, user["password_hash"]):
+            return False
+        with self._lock:
+            self._auth_cache[key] = now + self.auth_cache_ttl
+            self._auth_cache.move_to_end(key)
+            while len(self._auth_cache) > AUTH_CACHE_SIZE:
+                self._auth_cache.popitem(last=False)
+        return True
+
+    # --- Partitions ---
+
+    def _path(self, user_id: str) -> str:
+        if user_id == DEFAULT_USER_ID and self.default_user_file:
+            return self.default_user_file
+        if not USER_ID_PATTERN.match(user_id):
+            raise ValueError(f"Invalid user ID: {user_id!r}")
+        return os.path.join(self.data_dir, user_id + PARTITION_EXTENSIONS[self.backend])
+
+    def acquire(self, user_id: str) -> Database:
+        """Get a user's database, opening it if needed, and pin it until `release`."""
+        with self._lock:
+            # Pinned first, so the partition cannot be evicted between opening and use
+            self._pins[user_id] = self._pins.get(user_id, 0) + 1
+            db = self._open.get(user_id)
+            if db is not None:
+                self._open.move_to_end(user_id)
+                return db
+            opening = self._opening.setdefault(user_id, threading.Lock())
+        try:
+            # Only one thread opens a given partition; the others wait for it here
+            with opening:
+                with self._lock:
+                    db = self._open.get(user_id)
+                if db is None:
+                    db = create_database(self.backend, db_file=self._path(user_id), **self.db_kwargs)
+                    footprint = db.memory_footprint()
+                    with self._lock:
+                        self._open[user_id] = db
+                        self._footprints[user_id] = footprint
+                        self._footprint += footprint
+                        self._opening.pop(user_id, None)
+                        self.stats["opens"] += 1
+        except Exception:
+            with self._lock:
+                self._opening.pop(user_id, None)
+                self._unpin(user_id)
+            raise
+        with self._lock:
+            self._open.move_to_end(user_id)
+            self._evict()
+            return db
+
+    def release(self, user_id: str) -> None:
+        """Unpin a partition taken with `acquire`."""
+        # Still pinned, so still open: measure it without holding the lock
+        footprint = self._open[user_id].memory_footprint()
+        with self._lock:
+            self._footprint += footprint - self._footprints[user_id]
+            self._footprints[user_id] = footprint
+            self._unpin(user_id)
+            self._evict()
+
+    def _unpin(self, user_id: str) -> None:
+        """Must hold the lock."""
+        self._pins[user_id] -= 1
+        if not self._pins[user_id]:
+            del self._pins[user_id]
+
+    @contextlib.contextmanager
+    def partition(self, user_id: str):
+        """Use a user's database for the duration of a `with` block."""
+        db = self.acquire(user_id)
+        try:
+            yield db
+        finally:
+            self.release(user_id)
+
+    def _evict(self) -> None:
+        """Close least recently used, unpinned partitions until within limits. Must hold the lock."""
+        for user_id in list(self._open):
+            if len(self._open) <= self.max_open and self._footprint <= self.memory_budget:
+                return
+            if user_id in self._pins:
+                continue
+            self._open.pop(user_id).close()
+            self._footprint -= self._footprints.pop(user_id)
+            self.stats["evictions"] += 1
+
+    def partition_stats(self) -> Dict:
+        """Counters and the currently open partitions, for monitoring."""
+        with self._lock:
+            return dict(self.stats, open=list(self._open), pinned=dict(self._pins),
+                        memory_footprint=self._footprint,
+                        memory_budget=self.memory_budget, users=len(self._users))
+
+    def close(self) -> None:
+        """Close every open partition."""
+        with self._lock:
+            while self._open:
+                _, db = self._open.popitem(last=False)
+                db.close()
+            self._footprints.clear()
+            self._footprint = 0
@@ -0,0 +1,193 @@
+import re
+import queue
+import logging
+import datetime
+import threading
+from typing import Callable, ContextManager, Dict, Iterable, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger('jaws')
+
+# Gemini averages about four characters of English text per token; close enough for budgeting
+CHARS_PER_TOKEN = 4
+
+WORD = re.compile(r"[a-z0-9']+")
+
+# Words that say nothing about what a memory point or query is about
+STOPWORDS = frozenset((
+    "the", "and", "for", "are", "but", "not", "you", "your", "yours", "all", "any", "can", "had", "has",
+    "have", "her", "his", "him", "she", "they", "them", "their", "was", "were", "will", "would", "could",
+    "should", "with", "this", "that", "these", "those", "what", "when", "where", "which", "who", "why",
+    "how", "about", "from", "into", "just", "like", "more", "some", "than", "then", "there", "here",
+    "out", "our", "get", "got", "did", "does", "doing", "been", "being", "its", "it's", "i'm", "i've",
+    "don't", "tell", "please", "jaws", "also", "very", "too", "one", "now", "let", "let's", "want",
+))
+
+# User preference holding the rolling summary of today's older turns:
+# {"date": "YYYY-MM-DD", "through": timestamp of the last turn folded in, "text": summary}
+SUMMARY_PREFERENCE = "conversation_summary"
+
+# Replies longer than this are cut when a turn is shown to the model again
+TURN_MAX_CHARS = 600
+
+
+def estimate_tokens(text: str) -> int:
+    """Approximate number of tokens the model will count for a text."""
+    return -(-len(text) // CHARS_PER_TOKEN)
+
+
+def terms(text: str) -> frozenset:
+    """The topical words of a text: lowercased, without short words and stopwords."""
+    return frozenset(word for word in WORD.findall(text.lower()) if len(word) > 2 and word not in STOPWORDS)
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Cut a text to about `max_tokens` tokens, at a word boundary."""
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    if len(text) <= max_chars:
+        return text
+    if max_chars <= 1:
+        return ""
+    cut = text[:max_chars - 1]
+    space = cut.rfind(" ")
+    return (cut[:space] if space > max_chars // 2 else cut).rstrip() + "…"
+
+
+def format_turn(conversation: Dict) -> str:
+    """A stored conversation as the User/JAWS exchange shown to the model."""
+    response = conversation["response"]
+    if len(response) > TURN_MAX_CHARS:
+        response = truncate_to_tokens(response, TURN_MAX_CHARS // CHARS_PER_TOKEN)
+    return f"User: {conversation['query']}\nJAWS: {response}"
+
+
+def rank_memory(points: Sequence[Tuple[str, frozenset]], query: str) -> List[str]:
+    """Memory points (text, terms) ordered by relevance to a query.
+
+    Points sharing more topical words with the query come first; ties go to
+    the newest point, since memory is kept oldest first.
+    """
+    query_terms = terms(query)
+    order = sorted(range(len(points)), key=lambda i: (len(points[i][1] & query_terms), i), reverse=True)
+    return [points[i][0] for i in order]
+
+
+def relevant_memory(points: Sequence[Tuple[str, frozenset]], chosen: Iterable[str], query: str) -> List[str]:
+    """The chosen memory points that share a topical word with the query, in order.
+
+    Only these count as used: a point that merely fit in the prompt says
+    nothing about whether it is worth keeping.
+    """
+    query_terms = terms(query)
+    point_terms = dict(points)
+    return [point for point in chosen if point_terms.get(point, frozenset()) & query_terms]
+
+
+def take_within(lines: Iterable[str], max_tokens: int, contiguous: bool = False) -> Tuple[List[str], int]:
+    """The lines, in order, that fit in `max_tokens` (one newline each), and the tokens they use.
+
+    Lines that do not fit are skipped, or end the selection if `contiguous`.
+    """
+    taken, used = [], 0
+    for line in lines:
+        cost = estimate_tokens(line + "\n")
+        if used + cost > max_tokens:
+            if contiguous:
+                break
+            continue
+        taken.append(line)
+        used += cost
+    return taken, used
+
+
+def current_summary(stored: Optional[Dict], date: str) -> Dict:
+    """The stored rolling summary if it is for `date`, else an empty one."""
+    if stored and stored.get("date") == date:
+        return stored
+    return {"date": date, "through": "", "text": ""}
+
+
+class RollingSummarizer:
+    """Folds a user's older turns of the day into a rolling summary, on one background thread.
+
+    The newest `keep_recent` turns stay verbatim; once at least `min_batch`
+    earlier turns are not yet summarized, they are merged into the summary
+    stored under SUMMARY_PREFERENCE with one `summarize(prompt)` model call,
+    so folding costs a fraction of a model call per reply. Requests for a
+    user who is already waiting are merged, and a fold picks up everything
+    outstanding, so a slow model delays the summary but never a reply.
+    """
+
+    def __init__(self, summarize: Callable[[str], str], open_db: Callable[[str], ContextManager],
+                 keep_recent: int = 2, min_batch: int = 2, max_words: int = 120):
+        self._summarize = summarize
+        self._open_db = open_db
+        self.keep_recent = keep_recent
+        self.min_batch = max(1, min_batch)
+        self.max_words = max_words
+        self._queue = queue.Queue()
+        self._waiting = set()
+        self._lock = threading.Lock()
+        self._thread = None
+        self.stats = {"requested": 0, "folds": 0, "turns_folded": 0, "errors": 0}
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._run, name="conversation-summarizer", daemon=True)
+        self._thread.start()
+
+    def request(self, user_id: str) -> None:
+        """Schedule a fold of the user's unsummarized turns (e.g. after a conversation was added)."""
+        with self._lock:
+            self.stats["requested"] += 1
+            if user_id in self._waiting:
+                return
+            self._waiting.add(user_id)
+        self._queue.put(user_id)
+
+    def fold(self, user_id: str, force: bool = False) -> int:
+        """Fold the user's outstanding turns into today's summary if `min_batch` are waiting (or `force`).
+
+        Returns the number folded.
+        """
+        with self._open_db(user_id) as db:
+            today = datetime.date.today()
+            summary = current_summary(db.get_user_preference(SUMMARY_PREFERENCE), today.isoformat())
+            turns = db.get_conversations_for_date(today)
+            older = turns[:-self.keep_recent] if self.keep_recent else turns
+            new_turns = [turn for turn in older if turn["timestamp"] > summary["through"]]
+        if not new_turns or (len(new_turns) < self.min_batch and not force):
+            return 0
+
+        # The partition is not held while the model works
+        prompt = (
+            f"Update the running summary of today's conversation between the user and their "
+            f"assistant JAWS with the new exchanges below. Keep names, dates, times, numbers, "
+            f"decisions and open requests; leave out small talk. Reply with the summary only, "
+            f"in at most {self.max_words} words.\n\n"
+            f"Current summary:\n{summary['text'] or '(none yet)'}\n\n"
+            f"New exchanges:\n" + "\n\n".join(format_turn(turn) for turn in new_turns)
+        )
+        text = self._summarize(prompt).strip()
+        with self._open_db(user_id) as db:
+            db.set_user_preference(SUMMARY_PREFERENCE, {
+                "date": today.isoformat(), "through": new_turns[-1]["timestamp"], "text": text})
+        with self._lock:
+            self.stats["folds"] += 1
+            self.stats["turns_folded"] += len(new_turns)
+        return len(new_turns)
+
+    def summarizer_stats(self) -> Dict:
+        """Counters and the number of users waiting for a fold, for monitoring."""
+        with self._lock:
+            return dict(self.stats, waiting=len(self._waiting))
+
+    def _run(self) -> None:
+        while True:
+            user_id = self._queue.get()
+            with self._lock:
+                self._waiting.discard(user_id)
+            try:
+                self.fold(user_id)
+            except Exception as e:
+                with self._lock:
+                    self.stats["errors"] += 1
+                logger.error(f"Error summarizing conversation for {user_id}: {str(e)}")
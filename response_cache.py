@@ -0,0 +1,142 @@
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import Executor, Future
+from typing import Callable, Dict, List
+
+logger = logging.getLogger('jaws')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    created REAL NOT NULL,
+    response TEXT NOT NULL
+);
+"""
+
+
+class ResponseCache:
+    """Model responses keyed by a fingerprint of the exact prompt, kept in memory and in a SQLite file.
+
+    A response is fresh for `ttl` seconds. After that it is still served, up
+    to `max_stale` seconds past its TTL, while one background refresh on
+    `executor` replaces it. Concurrent misses for the same prompt share one
+    model call. Beyond `max_entries` the least recently used responses go.
+    Entries survive restarts; they are reloaded oldest first, so until they
+    are used again the eviction order follows their age.
+    """
+
+    def __init__(self, path: str, executor: Executor, ttl: float = 3600, max_stale: float = 7 * 24 * 3600,
+                 max_entries: int = 1000):
+        self.path = path
+        self.ttl = ttl
+        self.max_stale = max_stale
+        self.max_entries = max_entries
+        self._executor = executor
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> (created, response), least recently used first
+        self._inflight = {}  # key -> Future of the model call regenerating it
+        self.stats = {"hits": 0, "stale_hits": 0, "misses": 0, "stored": 0, "evictions": 0, "errors": 0}
+
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        with self._conn:
+            self._conn.executescript(SCHEMA)
+            self._conn.execute("DELETE FROM responses WHERE created < ?", (time.time() - ttl - max_stale,))
+        for key, created, response in self._conn.execute("SELECT key, created, response FROM responses ORDER BY created"):
+            self._entries[key] = (created, response)
+        with self._lock:
+            self._delete(self._evict())
+
+    @staticmethod
+    def key(namespace: str, prompt: str) -> str:
+        return hashlib.sha256(f"{namespace}\0{prompt}".encode("utf-8")).hexdigest()
+
+    def get(self, namespace: str, prompt: str, generate: Callable[[str], str],
+            cacheable: Callable[[str], bool] = bool) -> str:
+        """The response to `prompt`, cached or from `generate(prompt)`.
+
+        Only responses for which `cacheable(response)` holds are stored (by
+        default, non-empty ones), so an unusable answer is not served again.
+        """
+        key = self.key(namespace, prompt)
+        age = None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                age = time.time() - entry[0]
+            if age is not None and age <= self.ttl + self.max_stale:
+                self._entries.move_to_end(key)
+                if age <= self.ttl:
+                    self.stats["hits"] += 1
+                else:
+                    self.stats["stale_hits"] += 1
+                    self._refresh(key, prompt, generate, cacheable)
+                return entry[1]
+            self.stats["misses"] += 1
+            future = self._refresh(key, prompt, generate, cacheable)
+        return future.result()
+
+    def cache_stats(self) -> Dict:
+        """Counters and the current size, for monitoring."""
+        with self._lock:
+            return dict(self.stats, entries=len(self._entries), refreshing=len(self._inflight),
+                        max_entries=self.max_entries, ttl=self.ttl, max_stale=self.max_stale)
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def _refresh(self, key: str, prompt: str, generate: Callable[[str], str],
+                 cacheable: Callable[[str], bool]) -> Future:
+        """Start regenerating a response unless that is already under way. Must hold the lock."""
+        future = self._inflight.get(key)
+        if future is None:
+            future = self._executor.submit(self._generate, key, prompt, generate, cacheable)
+            self._inflight[key] = future
+        return future
+
+    def _generate(self, key: str, prompt: str, generate: Callable[[str], str],
+                  cacheable: Callable[[str], bool]) -> str:
+        try:
+            response = generate(prompt)
+            if cacheable(response):
+                self._store(key, response)
+            return response
+        except Exception as e:
+            with self._lock:
+                self.stats["errors"] += 1
+            logger.error(f"Error generating response {key[:12]}: {str(e)}")
+            raise
+        finally:
+            # Only after storing, so a request in between does not start another call
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def _store(self, key: str, response: str) -> None:
+        created = time.time()
+        with self._lock:
+            self._entries[key] = (created, response)
+            self._entries.move_to_end(key)
+            self.stats["stored"] += 1
+            with self._conn:
+                self._conn.execute("INSERT OR REPLACE INTO responses (key, created, response) VALUES (?, ?, ?)",
+                                   (key, created, response))
+            self._delete(self._evict())
+
+    def _evict(self) -> List[str]:
+        """Forget least recently used responses beyond max_entries. Must hold the lock; returns their keys."""
+        evicted = []
+        while len(self._entries) > self.max_entries:
+            evicted.append(self._entries.popitem(last=False)[0])
+        self.stats["evictions"] += len(evicted)
+        return evicted
+
+    def _delete(self, keys: List[str]) -> None:
+        if keys:
+            with self._conn:
+                self._conn.executemany("DELETE FROM responses WHERE key = ?", [(key,) for key in keys])
@@ -1,16 +1,18 @@
+import io
 import os
-import uuid
+import re
 import time
+import uuid
 import requests
-import asyncio
 import datetime
 import json
-import threading
 import logging
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from logging.handlers import RotatingFileHandler
-from flask import Flask, request, jsonify, render_template, send_from_directory
+from flask import Flask, request, jsonify, render_template, send_from_directory, g, Response, stream_with_context
 from flask_socketio import SocketIO, emit
-import edge_tts
 import speech_recognition as sr
 import numpy as np
 from io import BytesIO
@@ -18,7 +20,15 @@ import wave
 import google.generativeai as genai
 from pyngrok import ngrok
 from pyngrok.conf import PyngrokConfig
-from database import Database
+from werkzeug.local import LocalProxy
+from partitioned_database import PartitionedDatabase, DEFAULT_USER_ID
+from data_transfer import FORMATS, import_records
+from database import TRANSFER_COLLECTIONS, decode_cursor
+from speech import AudioJanitor, SpeechCache, SpeechLoop, SpeechPipeline
+from response_cache import ResponseCache
+from prompt_context import (SUMMARY_PREFERENCE, RollingSummarizer, current_summary, estimate_tokens,
+                            format_turn, rank_memory, relevant_memory, take_within, terms,
+                            truncate_to_tokens)
 from weather import WeatherService
 
 # Configure logging
@@ -40,8 +50,38 @@ logger.addHandler(console_handler)
 app = Flask(__name__)
 socketio = SocketIO(app, cors_allowed_origins="*", async_mode='threading', ping_timeout=60)
 
-# Initialize database
-db = Database()
+# Initialize per-user databases (DB_BACKEND selects 'json' or 'sqlite' storage). The
+# default user keeps the single-user data file used before partitioning.
+db_backend = os.environ.get('DB_BACKEND', 'json')
+databases = PartitionedDatabase(
+    data_dir=os.environ.get('DB_DATA_DIR', 'users'),
+    backend=db_backend,
+    max_open=int(os.environ.get('DB_MAX_OPEN_USERS', 64)),
+    memory_budget_mb=int(os.environ.get('DB_MEMORY_BUDGET_MB', 256)),
+    auth_cache_ttl=int(os.environ.get('AUTH_CACHE_SECONDS', 300)),
+    default_user_file='user_data.db' if db_backend == 'sqlite' else 'user_data.json',
+    # SQLite keeps old rows out of memory already; the JSON store moves them to archive segments
+    **({} if db_backend == 'sqlite' else {
+        'archive_after_days': int(os.environ.get('DB_ARCHIVE_AFTER_DAYS', 90)),
+        'snapshot_codec': os.environ.get('DB_SNAPSHOT_CODEC') or None
+    })
+)
+
+def current_user_db():
+    """The authenticated user's database, pinned until the request ends."""
+    if 'db' not in g:
+        if 'user_id' not in g:
+            raise RuntimeError('No authenticated user for this request')
+        g.db = databases.acquire(g.user_id)
+    return g.db
+
+# Routes use `db` as before; it resolves to the current user's partition
+db = LocalProxy(current_user_db)
+
+@app.teardown_appcontext
+def release_user_db(exc):
+    if g.pop('db', None) is not None:
+        databases.release(g.user_id)
 
 # Initialize weather service
 weather_service = WeatherService()
@@ -55,18 +95,176 @@ from config import config
 genai.configure(api_key=config.gemini_api_key)
 model = genai.GenerativeModel('gemini-1.5-flash-latest')
 
+# Largest number of records accepted by one batch write request
+MAX_BATCH_ITEMS = int(os.environ.get('MAX_BATCH_ITEMS', 500))
+
+# Page sizes of list endpoints called with from/to/cursor/limit
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+
 # Ensure the audio directory exists
 AUDIO_DIR = os.path.join("static", "audio")
 os.makedirs(AUDIO_DIR, exist_ok=True)
 
+# Synthesized speech reused for repeated text, evicted least recently used beyond TTS_CACHE_MB
+tts_cache = SpeechCache(os.path.join(AUDIO_DIR, "cache"), int(os.environ.get('TTS_CACHE_MB', 64)) * 1024 * 1024)
+
+# Longer replies are rarely repeated, so they get a temporary file instead of a cache entry
+TTS_CACHE_MAX_CHARS = int(os.environ.get('TTS_CACHE_MAX_CHARS', 200))
+
+# Temporary audio files expire after AUDIO_TTL_SECONDS and stay under AUDIO_MAX_MB in total
+# (the cache keeps to its own TTS_CACHE_MB)
+audio_janitor = AudioJanitor(AUDIO_DIR, ttl=int(os.environ.get('AUDIO_TTL_SECONDS', 300)),
+                             max_bytes=int(os.environ.get('AUDIO_MAX_MB', 256)) * 1024 * 1024)
+audio_janitor.start()
+
+# All speech synthesis runs on one event loop thread, TTS_CONCURRENCY at a time
+tts_loop = SpeechLoop(max_concurrent=int(os.environ.get('TTS_CONCURRENCY', 4)),
+                      timeout=int(os.environ.get('TTS_TIMEOUT_SECONDS', 30)))
+
+# Cache lookups and in-order delivery for pipelined speech; the synthesis itself waits on tts_loop
+tts_executor = ThreadPoolExecutor(max_workers=int(os.environ.get('TTS_CONCURRENCY', 4)),
+                                  thread_name_prefix='tts')
+
+# The per-request part of the /ask prompt stays within PROMPT_TOKEN_BUDGET (estimated) tokens,
+# however long the history gets. Recent turns and the rolling summary may take up to these
+# shares of it; long-term memory points fill the rest.
+PROMPT_TOKEN_BUDGET = int(os.environ.get('PROMPT_TOKEN_BUDGET', 1500))
+RECENT_TURNS_SHARE = 0.4
+SUMMARY_SHARE = 0.15
+
+# Today's turns older than the newest PROMPT_RECENT_TURNS are folded into a rolling summary in the
+# background, PROMPT_SUMMARY_BATCH (default PROMPT_RECENT_TURNS) at a time so replies don't each cost a fold
+PROMPT_RECENT_TURNS = int(os.environ.get('PROMPT_RECENT_TURNS', 2))
+summarizer = RollingSummarizer(lambda prompt: model.generate_content(prompt).text, databases.partition,
+                               keep_recent=PROMPT_RECENT_TURNS,
+                               min_batch=int(os.environ.get('PROMPT_SUMMARY_BATCH', PROMPT_RECENT_TURNS)))
+summarizer.start()
+
+# Responses of the model-backed dashboard endpoints, reused while their prompt (and so the user's data)
+# is unchanged: fresh for LLM_CACHE_TTL_SECONDS, then served stale while a background call refreshes them
+llm_executor = ThreadPoolExecutor(max_workers=int(os.environ.get('LLM_CACHE_WORKERS', 2)), thread_name_prefix='llm')
+response_cache = ResponseCache(os.environ.get('LLM_CACHE_FILE', 'llm_cache.db'), llm_executor,
+                               ttl=int(os.environ.get('LLM_CACHE_TTL_SECONDS', 3600)),
+                               max_stale=int(os.environ.get('LLM_CACHE_MAX_STALE_SECONDS', 7 * 24 * 3600)),
+                               max_entries=int(os.environ.get('LLM_CACHE_MAX_ENTRIES', 1000)))
+
+# Suggestions and recommendations are only usable when the model answered with a JSON array
+JSON_ARRAY_PATTERN = re.compile(r'\[\s*\{.*\}\s*\]', re.DOTALL)
+
 # Initialize speech recognizer
 recognizer = sr.Recognizer()
 recognizer.energy_threshold = 300  # Lower threshold for better sensitivity
 recognizer.dynamic_energy_threshold = False  # Disable dynamic adjustment for faster processing
 
 # --- Helper Functions ---
-def check_auth(pw):
-    return config.verify_password(pw)
+def request_user_id():
+    """User named by the request (query string, form or JSON body), or the default user."""
+    body = request.get_json(silent=True) if request.is_json else None
+    return (request.args.get('user') or request.form.get('user')
+            or (body or {}).get('user') or DEFAULT_USER_ID)
+
+def check_auth(pw, user_id=None):
+    """Authenticate the requesting user (or `user_id`) and remember who they are for `db`."""
+    user_id = user_id or request_user_id()
+    if user_id == DEFAULT_USER_ID:
+        authorized = config.verify_password(pw)
+    else:
+        authorized = databases.verify_user(user_id, pw)
+    if authorized:
+        g.user_id = user_id
+    return authorized
+
+def page_args(parse_cursor=decode_cursor):
+    """The from/to/cursor/limit query parameters of a list request, or None if none were given.
+
+    Raises ValueError with the reason if one is malformed.
+    """
+    args = request.args
+    if not any(key in args for key in ('from', 'to', 'cursor', 'limit')):
+        return None
+    try:
+        start = args.get('from') or None
+        end = args.get('to') or None
+        for value in (start, end):
+            if value:
+                datetime.date.fromisoformat(value)
+        cursor = args.get('cursor') or None
+        if cursor:
+            parse_cursor(cursor)
+        limit = int(args.get('limit', DEFAULT_PAGE_SIZE))
+    except ValueError:
+        raise ValueError('Invalid paging parameters. Use from/to as YYYY-MM-DD, '
+                         'cursor as returned by the previous page and an integer limit')
+    if not 1 <= limit <= MAX_PAGE_SIZE:
+        raise ValueError(f'Limit must be between 1 and {MAX_PAGE_SIZE}')
+    return {'start': start, 'end': end, 'cursor': cursor, 'limit': limit}
+
+def parse_workout(item):
+    """Validate and convert one workout from a request body. Raises ValueError with the reason."""
+    if not isinstance(item, dict):
+        raise ValueError('Each item must be an object')
+    if not all([item.get('exercise'), item.get('reps'), item.get('weight')]):
+        raise ValueError('Missing required fields')
+    try:
+        return {'exercise': item['exercise'], 'reps': int(item['reps']), 'weight': float(item['weight']),
+                'date': item.get('date')}
+    except (TypeError, ValueError):
+        raise ValueError('Invalid data types. Reps must be an integer, weight must be a number')
+
+def parse_food_log(item):
+    """Validate and convert one food log from a request body. Raises ValueError with the reason."""
+    if not isinstance(item, dict):
+        raise ValueError('Each item must be an object')
+    if not item.get('food_name'):
+        raise ValueError('Food name is required')
+    try:
+        return {'food_name': item['food_name'], 'calories': int(item.get('calories', 0)),
+                'protein': float(item.get('protein', 0)), 'carbs': float(item.get('carbs', 0)),
+                'fats': float(item.get('fats', 0))}
+    except (TypeError, ValueError):
+        raise ValueError('Invalid data types. Nutritional values must be numbers')
+
+def parse_weight(item):
+    """Validate and convert one weight entry from a request body. Raises ValueError with the reason."""
+    if not isinstance(item, dict):
+        raise ValueError('Each item must be an object')
+    try:
+        return {'weight': float(item.get('weight')), 'date': item.get('date')}
+    except (TypeError, ValueError):
+        raise ValueError('Invalid data type. Weight must be a number')
+
+def batch_write(items, parse, write):
+    """Validate every item, then store them all with one write. Returns a (response, status) pair.
+
+    Nothing is stored unless every item is valid; the per-item results say
+    which ones failed and why.
+    """
+    if not isinstance(items, list) or not items:
+        return jsonify({'error': 'Expected a non-empty list of items'}), 400
+    if len(items) > MAX_BATCH_ITEMS:
+        return jsonify({'error': f'Too many items; the limit is {MAX_BATCH_ITEMS} per request'}), 400
+
+    results, valid = [], []
+    for index, item in enumerate(items):
+        try:
+            valid.append(parse(item))
+            results.append({'index': index, 'success': True})
+        except ValueError as e:
+            results.append({'index': index, 'success': False, 'error': str(e)})
+    if len(valid) < len(items):
+        return jsonify({'success': False, 'error': 'Some items are invalid; nothing was saved', 'results': results}), 400
+
+    for result, record in zip(results, write(valid)):
+        result['record'] = record
+    return jsonify({'success': True, 'count': len(results), 'results': results}), 200
+
+def generate_text(prompt):
+    return model.generate_content(prompt).text.strip()
+
+def cached_model_text(endpoint, prompt, cacheable=bool):
+    """The model's answer to a dashboard prompt, from response_cache when the same prompt was answered before."""
+    return response_cache.get(f"{endpoint}:{model.model_name}", prompt, generate_text, cacheable)
 
 def clean_response_text(text):
     """Remove markdown formatting from response text."""
@@ -96,12 +294,6 @@ def get_current_time_context():
         "is_night": now.hour >= 22 or now.hour < 5
     }
 
-async def text_to_speech(text):
-    audio_filename = os.path.join(AUDIO_DIR, f"audio_{uuid.uuid4().hex}.mp3")
-    communicate = edge_tts.Communicate(text, config.tts_voice)
-    await communicate.save(audio_filename)
-    return audio_filename
-
 def process_audio_data(audio_data, sample_rate=16000):
     try:
         if isinstance(audio_data, BytesIO):
@@ -189,11 +381,9 @@ def get_ai_suggestions():
         
         prompt += "\nProvide 3 suggestions in a JSON array format with 'title' and 'description' fields."
         
-        response = model.generate_content(prompt)
-        response_text = response.text.strip()
+        response_text = cached_model_text('suggestions', prompt, cacheable=JSON_ARRAY_PATTERN.search)
         
-        import re
-        json_match = re.search(r'\[\s*\{.*\}\s*\]', response_text, re.DOTALL)
+        json_match = JSON_ARRAY_PATTERN.search(response_text)
         
         suggestions = []
         if json_match:
@@ -270,6 +460,294 @@ def upload_audio():
         response.data = jsonify({'error': 'Server error processing audio'}).data
         return response, 500
 
+# Commands the model writes into its responses, each on a line of its own, carried out once
+# the response is complete
+SCHEDULE_COMMAND = re.compile(r'^[ \t]*schedule/([^/\n]+)/([^/\n]+)/([^/\n]+)/([^\n]+)', re.MULTILINE)
+NOTIFY_COMMAND = re.compile(r'^[ \t]*notify/([^/\n]+)/([^\n]+)', re.MULTILINE)
+RESPONSE_COMMAND_PREFIXES = ('schedule/', 'notify/')
+# List, quote and emphasis markers the model may put before a command; clean_response_text removes them
+COMMAND_LEAD = re.compile(r'^[ \t>*_`#-]*')
+
+def is_response_command(line):
+    """Whether a line is a command once cleaned, i.e. as apply_response_commands sees it."""
+    text = clean_response_text(line)
+    return any(pattern.match(text) for pattern in (SCHEDULE_COMMAND, NOTIFY_COMMAND))
+
+def strip_streamed_commands(deltas):
+    """Yield the text of a streamed response with schedule/ and notify/ command lines left out.
+
+    Only a line that starts like a command, after any list or emphasis
+    markers, is held back until it is complete. It is dropped if it is a
+    command (see is_response_command), just as apply_response_commands
+    removes it from the final text, and sent otherwise. All other text
+    passes straight through.
+    """
+    line = ''  # held start of the current line
+    passing = False  # the current line is known not to be a command
+    for delta in deltas:
+        visible = []
+        for piece in re.split(r'(\n)', delta):
+            if piece == '\n':
+                if passing or not is_response_command(line):
+                    visible.append(line)
+                visible.append(piece)
+                line, passing = '', False
+            elif passing:
+                visible.append(piece)
+            else:
+                line += piece
+                start = COMMAND_LEAD.sub('', line)
+                if not any(start.startswith(prefix) or prefix.startswith(start) for prefix in RESPONSE_COMMAND_PREFIXES):
+                    visible.append(line)
+                    line, passing = '', True
+        text = ''.join(visible)
+        if text:
+            yield text
+    if line and (passing or not is_response_command(line)):
+        yield line
+
+# Everything in the /ask prompt that is the same for every request, sent once as the model's system instruction
+JAWS_SYSTEM_INSTRUCTION = (
+    "You are J.A.W.S. (Just A Wicked System), a sophisticated, articulate, and highly capable AI assistant. "
+    "Your tone is calm, respectful, and efficient, with a touch of subtle humor. You have an encyclopedic knowledge of technology, science, "
+    "and general information. Your responses are precise, clear, and designed to help with any task. "
+    "Address the user by their name (given with each request) occasionally to personalize the interaction, otherwise as sir. "
+    "You are called JAWS. Always respond in a courteous and engaging manner sometimes making jokes. "
+    "IMPORTANT: DO NOT use any markdown formatting in your responses. Never use asterisks (*), underscores (_), or other special characters for emphasis or formatting. "
+    "\n\n"
+    "Special Instructions:\n"
+    "1. SCHEDULING: You MUST handle scheduling in this EXACT format:\n"
+    "   - When user mentions any scheduling intent (meetings, appointments, events, reminders)\n"
+    "   - ALWAYS extract these components: name, date, time, description\n"
+    "   - REQUIRED FORMAT: schedule/[name]/[date]/[time]/[description], on a line of its own\n"
+    "   - Time MUST be in 24-hour format (e.g., 14:30 not 2:30 PM)\n"
+    "   - Examples:\n"
+    "     schedule/Team Meeting/tomorrow/14:30/Weekly project update\n"
+    "     schedule/Dentist/2024-03-15/09:00/Regular checkup\n"
+    "   - If any component is missing, ASK the user for it\n\n"
+    " - NO MATTER WHAT UNLESS ABSOLUTELY NECCESARY YOU DO NOT ASK FOR INFORMATION NOT REQUIRED YOU ASSUME OR FIGURE OUT YOURSELF\n"
+    
+    "2. NOTIFICATIONS: You MUST handle notifications in this EXACT format:\n"
+    "   - When setting reminders or notifications\n"
+    "   - REQUIRED FORMAT: notify/[time in 24-hour]/[message], on a line of its own\n"
+    "   - Time MUST be in 24-hour format (HH:MM)\n"
+    "   - Examples:\n"
+    "     notify/14:00/Prepare for team meeting\n"
+    "     notify/08:45/Take morning medication\n"
+    "   - ALWAYS suggest setting a notification for scheduled events\n"
+    "   - Default to 30 minutes before events unless specified otherwise\n\n"
+    
+    "3. PROACTIVE ASSISTANCE:\n"
+    "   - ALWAYS suggest relevant notifications for scheduled items\n"
+    "   - For meetings: suggest prep time notifications\n"
+    "   - For appointments: suggest travel time notifications\n"
+    "   - For tasks: suggest deadline reminders\n"
+    "   - Ask about setting recurring events when appropriate\n\n"
+    
+    "4. TIME AWARENESS:\n"
+    "   - sometimes reference current time in responses IF APPROPRIATE NOT EVERY SECOND eg after it is a new day from last conversation\n"
+    "   - Use 24-hour format for ALL time references\n"
+    "   - Consider time of day when suggesting notification times\n"
+    "   - Account for SCHOOL hours when scheduling\n\n"
+)
+
+FITNESS_KEYWORDS = ('workout', 'exercise', 'fitness', 'gym', 'training')
+APPOINTMENT_KEYWORDS = ('appointment', 'meeting', 'schedule', 'event', 'reminder')
+TIME_PATTERN = re.compile(r'\b(?:at|on|for)\s+(?:\d{1,2}(?::\d{2})?\s*(?:am|pm|AM|PM)|\d{1,2}(?::\d{2})?)\b', re.IGNORECASE)
+DATE_PATTERN = re.compile(r'\b(?:today|tomorrow|next\s+\w+|\d{1,2}(?:st|nd|rd|th)?\s+(?:jan(?:uary)?|feb(?:ruary)?|mar(?:ch)?|apr(?:il)?|may|jun(?:e)?|jul(?:y)?|aug(?:ust)?|sep(?:tember)?|oct(?:ober)?|nov(?:ember)?|dec(?:ember)?))\b', re.IGNORECASE)
+
+# Model for /ask and the streaming 'ask' event; other endpoints keep the plain model
+ask_model = genai.GenerativeModel('gemini-1.5-flash-latest', system_instruction=JAWS_SYSTEM_INSTRUCTION)
+
+# Prompt builds and sizes, for /ai/prompt-stats
+prompt_stats = {'builds': 0, 'total_ms': 0.0, 'max_ms': 0.0, 'total_chars': 0, 'last_chars': 0,
+                'total_tokens': 0, 'last_tokens': 0, 'trimmed': 0}
+prompt_stats_lock = threading.Lock()
+
+@functools.lru_cache(maxsize=1)
+def time_section(minute):
+    """Time context for the prompt. Cached per minute, the finest detail it shows."""
+    time_context = get_current_time_context()
+    return (
+        f"Current Time Context:\n"
+        f"Current time: {time_context['time']}\n"
+        f"Current day: {time_context['day']}\n"
+        f"Current date: {time_context['date']}\n"
+        f"Time of day: {' Morning' if time_context['is_morning'] else ' Afternoon' if time_context['is_afternoon'] else ' Evening' if time_context['is_evening'] else ' Night'}\n"
+    )
+
+def recent_turns(today):
+    """Today's turns as (timestamp, text shown to the model), oldest first."""
+    return [(c['timestamp'], format_turn(c)) for c in db.get_conversations_for_date(today)]
+
+def memory_points():
+    """Long-term memory as (point, topical words), oldest first, ready for ranking."""
+    return [(point, terms(point)) for point in db.get_long_term_memory()]
+
+def workouts_section():
+    recent_workouts = db.get_recent_workouts(5)
+    if not recent_workouts:
+        return ""
+    return "\nRecent workout history:\n" + "".join(
+        f"- {workout['exercise']}: {workout['reps']} reps at {workout['weight']} kg on {workout['date']}\n"
+        for workout in recent_workouts)
+
+def build_jaws_prompt(query):
+    """The per-request part of the /ask prompt (the rest is JAWS_SYSTEM_INSTRUCTION), ending with the query,
+    and the long-term memory points in it that bear on the query, to pass to add_conversation.
+
+    The prompt stays within PROMPT_TOKEN_BUDGET. The user's name, the time,
+    an appointment note and the query always go in. The budget left is then
+    spent, in this order, on today's turns not yet summarized (newest first),
+    the rolling summary of older turns, recent workouts for fitness questions
+    and long-term memory points, most relevant to the query first. The data
+    behind each section is cached in the user's database and rebuilt only
+    when it changes.
+    """
+    started = time.perf_counter()
+    now = datetime.datetime.now()
+    today = now.date()
+    query_lower = query.lower()
+    
+    header = db.cached(("prompt", "user"), (), lambda: f"The user's name is {db.get_user_name()}.\n\n") + \
+        time_section(now.strftime("%Y-%m-%d %H:%M"))
+    note = ""
+    has_appointment = any(keyword in query_lower for keyword in APPOINTMENT_KEYWORDS)
+    if has_appointment and (TIME_PATTERN.search(query) or DATE_PATTERN.search(query)):
+        note = "\nNote: The user mentioned an appointment. Please suggest adding it to their schedule and ask for any missing details (date/time).\n"
+    remaining = PROMPT_TOKEN_BUDGET - estimate_tokens(header) - estimate_tokens(note) - estimate_tokens(query)
+    trimmed = False
+    
+    # Turns the summary already covers are left out; until a fold catches up, they stay verbatim
+    summary = current_summary(db.get_user_preference(SUMMARY_PREFERENCE), today.isoformat())
+    turns = db.cached(("prompt", "turns", today.isoformat()), ("conversations",), lambda: recent_turns(today))
+    unsummarized = [text for timestamp, text in reversed(turns) if timestamp > summary['through']]
+    turns_section = ""
+    if unsummarized:
+        heading = "\n\nRecent conversation context:\n"
+        limit = min(remaining, int(PROMPT_TOKEN_BUDGET * RECENT_TURNS_SHARE)) - estimate_tokens(heading + "\n")
+        lines, used = take_within(unsummarized, limit, contiguous=True)
+        trimmed |= len(lines) < len(unsummarized)
+        if lines:
+            turns_section = heading + "\n".join(reversed(lines)) + "\n\n"
+            remaining -= estimate_tokens(turns_section)
+    
+    summary_section = ""
+    if summary['text']:
+        heading = "\n\nSummary of earlier conversation today:\n"
+        limit = min(remaining, int(PROMPT_TOKEN_BUDGET * SUMMARY_SHARE)) - estimate_tokens(heading + "\n\n")
+        text = truncate_to_tokens(summary['text'], limit)
+        trimmed |= text != summary['text']
+        if text:
+            summary_section = heading + text + "\n\n"
+            remaining -= estimate_tokens(summary_section)
+    
+    workouts = ""
+    if any(word in query_lower for word in FITNESS_KEYWORDS):
+        workouts = db.cached(("prompt", "workouts"), ("workouts",), workouts_section)
+        if estimate_tokens(workouts) > remaining:
+            workouts, trimmed = "", True
+        remaining -= estimate_tokens(workouts)
+    
+    points = db.cached(("prompt", "memory"), ("long_term_memory",), memory_points)
+    heading = "\n\nLong-term memory key points:\n"
+    lines, _ = take_within(rank_memory(points, query), remaining - estimate_tokens(heading + "\n"))
+    trimmed |= len(lines) < len(points)
+    referenced = relevant_memory(points, lines, query)
+    memory = heading + ("\n".join(lines) if lines else "No significant memory points.") + "\n\n"
+    
+    prompt = "".join((header, summary_section, turns_section, memory, workouts, note, query))
+    tokens = estimate_tokens(prompt)
+    
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    with prompt_stats_lock:
+        prompt_stats['builds'] += 1
+        prompt_stats['total_ms'] += elapsed_ms
+        prompt_stats['max_ms'] = max(prompt_stats['max_ms'], elapsed_ms)
+        prompt_stats['total_chars'] += len(prompt)
+        prompt_stats['last_chars'] = len(prompt)
+        prompt_stats['total_tokens'] += tokens
+        prompt_stats['last_tokens'] = tokens
+        prompt_stats['trimmed'] += trimmed
+    logger.info(f"Prompt built in {elapsed_ms:.2f}ms: {len(prompt)} chars, ~{tokens}/{PROMPT_TOKEN_BUDGET} tokens"
+                f"{' (trimmed)' if trimmed else ''} (+{len(JAWS_SYSTEM_INSTRUCTION)} chars of system instruction)")
+    return prompt, referenced
+
+def apply_response_commands(response_text):
+    """Carry out schedule/ and notify/ commands in a model response.
+
+    Returns the text without the commands and the confirmations to append to it.
+    """
+    confirmations = []
+    # Check for scheduling and notification tags in the response
+    for schedule_match in SCHEDULE_COMMAND.finditer(response_text):
+        name = schedule_match.group(1)
+        date = schedule_match.group(2)
+        time = schedule_match.group(3)
+        description = schedule_match.group(4)
+        
+        # Convert relative dates to absolute dates
+        if date.lower() == 'today':
+            date = datetime.date.today().isoformat()
+        elif date.lower() == 'tomorrow':
+            date = (datetime.date.today() + datetime.timedelta(days=1)).isoformat()
+        elif date.lower().startswith('next '):
+            weekdays = {'monday': 0, 'tuesday': 1, 'wednesday': 2, 'thursday': 3, 'friday': 4, 'saturday': 5, 'sunday': 6}
+            target_day = weekdays.get(date.lower().replace('next ', ''))
+            if target_day is not None:
+                today = datetime.date.today()
+                days_ahead = target_day - today.weekday()
+                if days_ahead <= 0:
+                    days_ahead += 7
+                date = (today + datetime.timedelta(days=days_ahead)).isoformat()
+        
+        # Add the schedule item
+        schedule_item = db.add_schedule_item(name, date, time, description)
+        confirmations.append(f"\n\nI've added this to your schedule: {name} on {date} at {time}")
+    
+    for notify_match in NOTIFY_COMMAND.finditer(response_text):
+        notify_time = notify_match.group(1)
+        notify_message = notify_match.group(2)
+        
+        # Convert notify_time to datetime
+        try:
+            notify_time_obj = datetime.datetime.strptime(notify_time, '%H:%M').time()
+            notify_date = datetime.date.today()
+            notify_datetime = datetime.datetime.combine(notify_date, notify_time_obj)
+            
+            # If the time has already passed today, schedule for tomorrow
+            if notify_datetime < datetime.datetime.now():
+                notify_date = notify_date + datetime.timedelta(days=1)
+                notify_datetime = datetime.datetime.combine(notify_date, notify_time_obj)
+            
+            # Add notification to schedule
+            notification_title = "Notification"
+            db.add_schedule_item(notification_title, notify_date.isoformat(), notify_time, notify_message)
+            
+            confirmations.append(f"\n\nI'll notify you at {notify_time}: {notify_message}")
+        except ValueError:
+            app.logger.error(f'Invalid notification time format: {notify_time}')
+            confirmations.append(f"\n\nI couldn't set up the notification due to an invalid time format.")
+    
+    # Command lines are left out even if they failed, as they were while streaming
+    response_text = NOTIFY_COMMAND.sub('', SCHEDULE_COMMAND.sub('', response_text))
+    return response_text, confirmations
+
+def speak(response_text):
+    """Synthesize a response and return its audio URL.
+
+    Short texts go through the speech cache. Longer ones get a temporary
+    file that the audio janitor deletes once it expires.
+    """
+    if len(response_text) <= TTS_CACHE_MAX_CHARS:
+        audio_file_path = tts_cache.get_path(response_text, config.tts_voice, tts_loop.synthesize)
+    else:
+        audio_file_path = os.path.join(AUDIO_DIR, f"audio_{uuid.uuid4().hex}.mp3")
+        with open(audio_file_path, 'wb') as f:
+            f.write(tts_loop.synthesize(response_text, config.tts_voice))
+        audio_janitor.expire_later(audio_file_path)
+    return "/" + audio_file_path.replace("\\", "/")
+
 @app.route('/ask', methods=['POST', 'OPTIONS'])
 def ask():
     if request.method == 'OPTIONS':
@@ -295,168 +773,21 @@ def ask():
     if not query:
         return jsonify({'error': 'No query provided'}), 400
 
-    today = datetime.date.today()
-    today_conversations = db.get_conversations_for_date(today)
-    recent_context = "\n".join([f"User: {c['query']}\nJAWS: {c['response']}" for c in today_conversations[-5:]])
-    
-    time_context = get_current_time_context()
-    
-    long_term_memory = db.get_long_term_memory()
-    memory_context = "\n".join(long_term_memory) if long_term_memory else "No significant memory points."
-    
-    jaws_prompt = (
-        f"You are J.A.W.S. (Just A Wicked System), a sophisticated, articulate, and highly capable AI assistant. "
-        f"Your tone is calm, respectful, and efficient, with a touch of subtle humor. You have an encyclopedic knowledge of technology, science, "
-        f"and general information. Your responses are precise, clear, and designed to help with any task. "
-        f"The user's name is {db.get_user_name()}, and you should address them by name occasionally to personalize the interaction otherwise by sir. "
-        f"You are called JAWS. Always respond in a courteous and engaging manner sometimes making jokes. "
-        f"IMPORTANT: DO NOT use any markdown formatting in your responses. Never use asterisks (*), underscores (_), or other special characters for emphasis or formatting. "
-        
-        f"\n\nCurrent Time Context:\n"
-        f"Current time: {time_context['time']}\n"
-        f"Current day: {time_context['day']}\n"
-        f"Current date: {time_context['date']}\n"
-        f"Time of day: {' Morning' if time_context['is_morning'] else ' Afternoon' if time_context['is_afternoon'] else ' Evening' if time_context['is_evening'] else ' Night'}\n"
-        
-        f"\n\nRecent conversation context:\n{recent_context}\n\n"
-        
-        f"\n\nLong-term memory key points:\n{memory_context}\n\n"
-        
-        f"Special Instructions:\n"
-        f"1. SCHEDULING: You MUST handle scheduling in this EXACT format:\n"
-        f"   - When user mentions any scheduling intent (meetings, appointments, events, reminders)\n"
-        f"   - ALWAYS extract these components: name, date, time, description\n"
-        f"   - REQUIRED FORMAT: schedule/[name]/[date]/[time]/[description]\n"
-        f"   - Time MUST be in 24-hour format (e.g., 14:30 not 2:30 PM)\n"
-        f"   - Examples:\n"
-        f"     schedule/Team Meeting/tomorrow/14:30/Weekly project update\n"
-        f"     schedule/Dentist/2024-03-15/09:00/Regular checkup\n"
-        f"   - If any component is missing, ASK the user for it\n\n"
-        f" - NO MATTER WHAT UNLESS ABSOLUTELY NECCESARY YOU DO NOT ASK FOR INFORMATION NOT REQUIRED YOU ASSUME OR FIGURE OUT YOURSELF\n"
-        
-        f"2. NOTIFICATIONS: You MUST handle notifications in this EXACT format:\n"
-        f"   - When setting reminders or notifications\n"
-        f"   - REQUIRED FORMAT: notify/[time in 24-hour]/[message]\n"
-        f"   - Time MUST be in 24-hour format (HH:MM)\n"
-        f"   - Examples:\n"
-        f"     notify/14:00/Prepare for team meeting\n"
-        f"     notify/08:45/Take morning medication\n"
-        f"   - ALWAYS suggest setting a notification for scheduled events\n"
-        f"   - Default to 30 minutes before events unless specified otherwise\n\n"
-        
-        f"3. PROACTIVE ASSISTANCE:\n"
-        f"   - ALWAYS suggest relevant notifications for scheduled items\n"
-        f"   - For meetings: suggest prep time notifications\n"
-        f"   - For appointments: suggest travel time notifications\n"
-        f"   - For tasks: suggest deadline reminders\n"
-        f"   - Ask about setting recurring events when appropriate\n\n"
-        
-        f"4. TIME AWARENESS:\n"
-        f"   - sometimes reference current time in responses IF APPROPRIATE NOT EVERY SECOND eg after it is a new day from last conversation\n"
-        f"   - Use 24-hour format for ALL time references\n"
-        f"   - Consider time of day when suggesting notification times\n"
-        f"   - Account for SCHOOL hours when scheduling\n\n"
-    )
-    
-    if any(word in query.lower() for word in ['workout', 'exercise', 'fitness', 'gym', 'training']):
-        recent_workouts = db.get_recent_workouts(5)
-        if recent_workouts:
-            jaws_prompt += f"\nRecent workout history:\n"
-            for workout in recent_workouts:
-                jaws_prompt += f"- {workout['exercise']}: {workout['reps']} reps at {workout['weight']} kg on {workout['date']}\n"
-    
-    appointment_keywords = ['appointment', 'meeting', 'schedule', 'event', 'reminder']
-    time_pattern = r'\b(?:at|on|for)\s+(?:\d{1,2}(?::\d{2})?\s*(?:am|pm|AM|PM)|\d{1,2}(?::\d{2})?)\b'
-    date_pattern = r'\b(?:today|tomorrow|next\s+\w+|\d{1,2}(?:st|nd|rd|th)?\s+(?:jan(?:uary)?|feb(?:ruary)?|mar(?:ch)?|apr(?:il)?|may|jun(?:e)?|jul(?:y)?|aug(?:ust)?|sep(?:tember)?|oct(?:ober)?|nov(?:ember)?|dec(?:ember)?))\b'
-    
-    import re
-    has_appointment = any(keyword in query.lower() for keyword in appointment_keywords)
-    has_time = bool(re.search(time_pattern, query, re.IGNORECASE))
-    has_date = bool(re.search(date_pattern, query, re.IGNORECASE))
-    
-    if has_appointment and (has_time or has_date):
-        jaws_prompt += f"\nNote: The user mentioned an appointment. Please suggest adding it to their schedule and ask for any missing details (date/time).\n"
-    
     try:
-        full_prompt = jaws_prompt + query
+        full_prompt, referenced = build_jaws_prompt(query)
         
-        response = model.generate_content(full_prompt)
+        response = ask_model.generate_content(full_prompt)
         response_text = response.text.strip()
         
         response_text = clean_response_text(response_text)
+        response_text, confirmations = apply_response_commands(response_text)
+        response_text += ''.join(confirmations)
         
-        # Check for scheduling and notification tags in the response
-        schedule_match = re.search(r'schedule/([^/]+)/([^/]+)/([^/]+)/([^\n]+)', response_text)
-        notify_match = re.search(r'notify/([^/]+)/([^\n]+)', response_text)
+        # Points that keep being used outlive the ones that are only ever re-extracted
+        db.add_conversation(query, response_text, referenced)
+        summarizer.request(g.user_id)
         
-        if schedule_match:
-            name = schedule_match.group(1)
-            date = schedule_match.group(2)
-            time = schedule_match.group(3)
-            description = schedule_match.group(4)
-            
-            # Convert relative dates to absolute dates
-            if date.lower() == 'today':
-                date = datetime.date.today().isoformat()
-            elif date.lower() == 'tomorrow':
-                date = (datetime.date.today() + datetime.timedelta(days=1)).isoformat()
-            elif date.lower().startswith('next '):
-                weekdays = {'monday': 0, 'tuesday': 1, 'wednesday': 2, 'thursday': 3, 'friday': 4, 'saturday': 5, 'sunday': 6}
-                target_day = weekdays.get(date.lower().replace('next ', ''))
-                if target_day is not None:
-                    today = datetime.date.today()
-                    days_ahead = target_day - today.weekday()
-                    if days_ahead <= 0:
-                        days_ahead += 7
-                    date = (today + datetime.timedelta(days=days_ahead)).isoformat()
-            
-            # Add the schedule item
-            schedule_item = db.add_schedule_item(name, date, time, description)
-            response_text = response_text.replace(schedule_match.group(0), '')
-            response_text += f"\n\nI've added this to your schedule: {name} on {date} at {time}"
-        
-        if notify_match:
-            notify_time = notify_match.group(1)
-            notify_message = notify_match.group(2)
-            
-            # Convert notify_time to datetime
-            try:
-                notify_time_obj = datetime.datetime.strptime(notify_time, '%H:%M').time()
-                notify_date = datetime.date.today()
-                notify_datetime = datetime.datetime.combine(notify_date, notify_time_obj)
-                
-                # If the time has already passed today, schedule for tomorrow
-                if notify_datetime < datetime.datetime.now():
-                    notify_date = notify_date + datetime.timedelta(days=1)
-                    notify_datetime = datetime.datetime.combine(notify_date, notify_time_obj)
-                
-                # Add notification to schedule
-                notification_title = "Notification"
-                db.add_schedule_item(notification_title, notify_date.isoformat(), notify_time, notify_message)
-                
-                response_text = response_text.replace(notify_match.group(0), '')
-                response_text += f"\n\nI'll notify you at {notify_time}: {notify_message}"
-            except ValueError:
-                app.logger.error(f'Invalid notification time format: {notify_time}')
-                response_text += f"\n\nI couldn't set up the notification due to an invalid time format."
-        
-        db.add_conversation(query, response_text)
-        
-        audio_file_path = asyncio.run(text_to_speech(response_text))
-        
-        audio_url = "/" + audio_file_path.replace("\\", "/")
-        
-        def cleanup_audio():
-            time.sleep(300)
-            try:
-                if os.path.exists(audio_file_path):
-                    os.remove(audio_file_path)
-            except Exception as e:
-                app.logger.error(f'Error cleaning up audio file: {str(e)}')
-        
-        cleanup_thread = threading.Thread(target=cleanup_audio)
-        cleanup_thread.daemon = True
-        cleanup_thread.start()
+        audio_url = speak(response_text)
         
         return jsonify({
             'response': response_text,
@@ -468,6 +799,73 @@ def ask():
             'error': f'An error occurred: {str(e)}'
         }), 500
 
+@socketio.on('ask')
+def ask_streaming(data):
+    """Streaming variant of /ask over Socket.IO.
+
+    Emits 'ask_delta' events with the response text as the model generates
+    it, then 'ask_done' with the final text once commands are carried out and
+    the conversation is saved, then 'ask_audio' when the speech is ready.
+    Failures are reported with 'ask_error'. Every event echoes the client's
+    request_id, if one was sent.
+
+    With tts='stream', speech is pipelined instead: each sentence is
+    synthesized as soon as it is complete and sent as an 'ask_audio_chunk'
+    (index plus MP3 bytes, in order), followed by 'ask_audio_end'.
+    """
+    data = data or {}
+    request_id = data.get('request_id')
+    if not check_auth(data.get('password'), data.get('user')):
+        emit('ask_error', {'request_id': request_id, 'error': 'Unauthorized'})
+        return
+    
+    query = data.get('query', '')
+    if not query:
+        emit('ask_error', {'request_id': request_id, 'error': 'No query provided'})
+        return
+    
+    pipeline = None
+    if data.get('tts') == 'stream':
+        sid = request.sid
+        pipeline = SpeechPipeline(
+            lambda index, audio: socketio.emit('ask_audio_chunk', {
+                'request_id': request_id, 'index': index, 'audio': audio}, to=sid),
+            config.tts_voice, tts_executor, cache=tts_cache, synthesize=tts_loop.synthesize)
+    
+    try:
+        full_prompt, referenced = build_jaws_prompt(query)
+        
+        chunks = []
+        def generated_text():
+            for chunk in ask_model.generate_content(full_prompt, stream=True):
+                chunks.append(chunk.text)
+                yield chunk.text
+        
+        for delta in strip_streamed_commands(generated_text()):
+            text = clean_response_text(delta)
+            emit('ask_delta', {'request_id': request_id, 'text': text})
+            if pipeline:
+                pipeline.feed(text)
+        
+        # Commands are only complete once the whole response is in
+        response_text = clean_response_text(''.join(chunks).strip())
+        response_text, confirmations = apply_response_commands(response_text)
+        response_text += ''.join(confirmations)
+        db.add_conversation(query, response_text, referenced)
+        summarizer.request(g.user_id)
+        emit('ask_done', {'request_id': request_id, 'response': response_text})
+        
+        if pipeline:
+            pipeline.feed(''.join(confirmations))
+            emit('ask_audio_end', {'request_id': request_id, 'chunks': pipeline.close()})
+        else:
+            emit('ask_audio', {'request_id': request_id, 'audio_file': speak(response_text)})
+    except Exception as e:
+        if pipeline:
+            pipeline.close(cancel=True)
+        app.logger.error(f'Error streaming response: {str(e)}')
+        emit('ask_error', {'request_id': request_id, 'error': f'An error occurred: {str(e)}'})
+
 @app.route('/schedule', methods=['POST'])
 def add_schedule():
     data = request.json
@@ -501,9 +899,21 @@ def get_schedule(date):
     if not check_auth(password):
         return jsonify({'error': 'Unauthorized'}), 403
     
+    try:
+        paging = page_args()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
     try:
         datetime.datetime.strptime(date, '%Y-%m-%d')
         
+        if paging:
+            page = db.get_schedule_page(date, date, paging['cursor'], paging['limit'])
+            return jsonify({
+                'date': date,
+                'schedule': page['items'],
+                'next_cursor': page['next_cursor']
+            })
         schedule = db.get_schedule_for_date(date)
         return jsonify({
             'date': date,
@@ -542,6 +952,17 @@ def add_workout():
     except Exception as e:
         return jsonify({'error': f'Error adding workout: {str(e)}'}), 500
 
+@app.route('/fitness/workout/batch', methods=['POST'])
+def add_workouts():
+    data = request.json
+    if not data or not check_auth(data.get('password')):
+        return jsonify({'error': 'Unauthorized'}), 403
+    
+    try:
+        return batch_write(data.get('workouts'), parse_workout, db.add_workouts)
+    except Exception as e:
+        return jsonify({'error': f'Error adding workouts: {str(e)}'}), 500
+
 @app.route('/fitness/progress/<exercise>', methods=['GET'])
 def get_fitness_progress(exercise):
     password = request.args.get('password')
@@ -635,16 +1056,74 @@ def log_weight():
     except Exception as e:
         return jsonify({'error': f'Error logging weight: {str(e)}'}), 500
 
+@app.route('/nutrition/log/batch', methods=['POST'])
+def log_food_intakes():
+    data = request.json
+    if not data or not check_auth(data.get('password')):
+        return jsonify({'error': 'Unauthorized'}), 403
+    
+    try:
+        return batch_write(data.get('logs'), parse_food_log, db.log_food_intakes)
+    except Exception as e:
+        return jsonify({'error': f'Error logging food intake: {str(e)}'}), 500
+
+@app.route('/nutrition/weight/batch', methods=['POST'])
+def log_weights():
+    data = request.json
+    if not data or not check_auth(data.get('password')):
+        return jsonify({'error': 'Unauthorized'}), 403
+    
+    try:
+        return batch_write(data.get('logs'), parse_weight, db.log_weights)
+    except Exception as e:
+        return jsonify({'error': f'Error logging weights: {str(e)}'}), 500
+
 @app.route('/nutrition/summary', methods=['GET'])
 def get_nutrition_summary():
     password = request.args.get('password')
     if not check_auth(password):
         return jsonify({'error': 'Unauthorized'}), 403
     
+    try:
+        paging = page_args(parse_cursor=int)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
     try:
         date = request.args.get('date')
-        summary = db.get_nutrition_summary(date)
+        if paging:
+            summary = db.get_nutrition_summary(date, paging['cursor'], paging['limit'])
+        else:
+            summary = db.get_nutrition_summary(date)
+        return jsonify(summary)
+    except Exception as e:
+        return jsonify({'error': f'Error getting nutrition summary: {str(e)}'}), 500
+
+@app.route('/nutrition/summary/range', methods=['GET'])
+def get_nutrition_range_summary():
+    password = request.args.get('password')
+    if not check_auth(password):
+        return jsonify({'error': 'Unauthorized'}), 403
+    
+    try:
+        # Either an explicit from/to range or a week/month period ending today
+        period = request.args.get('period')
+        if period:
+            days = {'week': 7, 'month': 30}.get(period)
+            if days is None:
+                return jsonify({'error': 'Invalid period. Use week or month'}), 400
+            end_date = datetime.date.today()
+            start_date = end_date - datetime.timedelta(days=days - 1)
+            summary = db.get_nutrition_range_summary(start_date.isoformat(), end_date.isoformat())
+        else:
+            start = request.args.get('from')
+            end = request.args.get('to')
+            if not start or not end:
+                return jsonify({'error': 'Provide from and to dates or a period'}), 400
+            summary = db.get_nutrition_range_summary(start, end)
         return jsonify(summary)
+    except ValueError:
+        return jsonify({'error': 'Invalid date range. Use YYYY-MM-DD and from <= to'}), 400
     except Exception as e:
         return jsonify({'error': f'Error getting nutrition summary: {str(e)}'}), 500
 
@@ -655,6 +1134,17 @@ def get_weight_history():
         return jsonify({'error': 'Unauthorized'}), 403
     
     try:
+        paging = page_args()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    try:
+        if paging:
+            page = db.get_weight_page(paging['start'], paging['end'], paging['cursor'], paging['limit'])
+            return jsonify({
+                'history': page['items'],
+                'next_cursor': page['next_cursor']
+            })
         days = int(request.args.get('days', 30))
         history = db.get_weight_history(days)
         return jsonify({
@@ -671,9 +1161,23 @@ def get_upcoming_schedule():
     if not check_auth(password):
         return jsonify({'error': 'Unauthorized'}), 403
     
+    try:
+        paging = page_args()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
     try:
         days = int(request.args.get('days', 7))
-        schedule = db.get_upcoming_schedule(days)
+        next_cursor = None
+        if paging:
+            # The days window applies unless an explicit from/to range is given
+            today = datetime.date.today()
+            start = paging['start'] or today.isoformat()
+            end = paging['end'] or (today + datetime.timedelta(days=max(days, 1) - 1)).isoformat()
+            page = db.get_schedule_page(start, end, paging['cursor'], paging['limit'])
+            schedule, next_cursor = page['items'], page['next_cursor']
+        else:
+            schedule = db.get_upcoming_schedule(days)
         
         # Add notification status for each item
         now = datetime.datetime.now()
@@ -688,9 +1192,10 @@ def get_upcoming_schedule():
                 'fifteen_min': time_until.total_seconds() <= 900  # 15 minutes
             }
         
-        return jsonify({
-            'schedule': schedule
-        })
+        response = {'schedule': schedule}
+        if paging:
+            response['next_cursor'] = next_cursor
+        return jsonify(response)
     except ValueError:
         return jsonify({'error': 'Invalid days parameter'}), 400
     except Exception as e:
@@ -737,11 +1242,9 @@ def get_movie_recommendations():
         
         prompt = f"Suggest 5 movies in the following genres: {genres_text}. Return the results as a JSON array with each movie having 'title', 'genre', and 'description' fields. Keep descriptions brief (under 100 characters)."
         
-        response = model.generate_content(prompt)
-        response_text = response.text.strip()
+        response_text = cached_model_text('movies', prompt, cacheable=JSON_ARRAY_PATTERN.search)
         
-        import re
-        json_match = re.search(r'\[\s*\{.*\}\s*\]', response_text, re.DOTALL)
+        json_match = JSON_ARRAY_PATTERN.search(response_text)
         
         recommendations = []
         if json_match:
@@ -838,10 +1341,7 @@ def get_fitness_advice():
         for workout in workouts:
             prompt += f"- {workout['exercise']}: {workout['reps']} reps at {workout['weight']} kg on {workout['date']}\n"
         
-        response = model.generate_content(prompt)
-        response_text = response.text.strip()
-        
-        import re
+        response_text = cached_model_text('fitness_advice', prompt)
         
         advice = response_text
         recommendations = [
@@ -864,6 +1364,103 @@ def get_fitness_advice():
     except Exception as e:
         return jsonify({'error': f'Error getting fitness advice: {str(e)}'}), 500
 
+@app.route('/db/cache-stats', methods=['GET'])
+def get_cache_stats():
+    password = request.args.get('password')
+    if not check_auth(password):
+        return jsonify({'error': 'Unauthorized'}), 403
+    
+    return jsonify(db.cache_stats())
+
+@app.route('/ai/prompt-stats', methods=['GET'])
+def get_prompt_stats():
+    if not config.verify_password(request.args.get('password')):
+        return jsonify({'error': 'Unauthorized'}), 403
+    
+    with prompt_stats_lock:
+        stats = dict(prompt_stats)
+    builds = stats['builds']
+    stats['average_ms'] = stats['total_ms'] / builds if builds else 0.0
+    stats['average_chars'] = stats['total_chars'] / builds if builds else 0.0
+    stats['average_tokens'] = stats['total_tokens'] / builds if builds else 0.0
+    stats['token_budget'] = PROMPT_TOKEN_BUDGET
+    stats['system_instruction_chars'] = len(JAWS_SYSTEM_INSTRUCTION)
+    stats['summarizer'] = summarizer.summarizer_stats()
+    return jsonify(stats)
+
+@app.route('/tts/cache-stats', methods=['GET'])
+def get_tts_cache_stats():
+    if not config.verify_password(request.args.get('password')):
+        return jsonify({'error': 'Unauthorized'}), 403
+    
+    return jsonify(dict(tts_cache.cache_stats(), janitor=audio_janitor.janitor_stats()))
+
+@app.route('/ai/response-cache-stats', methods=['GET'])
+def get_response_cache_stats():
+    if not config.verify_password(request.args.get('password')):
+        return jsonify({'error': 'Unauthorized'}), 403
+    
+    return jsonify(response_cache.cache_stats())
+
+@app.route('/export/<collection>', methods=['GET'])
+def export_collection(collection):
+    password = request.args.get('password')
+    if not check_auth(password):
+        return jsonify({'error': 'Unauthorized'}), 403
+    
+    data_format = request.args.get('format', 'ndjson')
+    if collection not in TRANSFER_COLLECTIONS or data_format not in FORMATS:
+        return jsonify({'error': f'Unknown collection or format. Collections: {sorted(TRANSFER_COLLECTIONS)}, '
+                                 f'formats: {sorted(FORMATS)}'}), 400
+    
+    exporter, _, content_type = FORMATS[data_format]
+    # Streamed batch by batch; the user's partition stays pinned until the stream ends
+    return Response(stream_with_context(exporter(db, collection)), mimetype=content_type, headers={
+        'Content-Disposition': f'attachment; filename={collection}.{data_format}'
+    })
+
+@app.route('/import/<collection>', methods=['POST'])
+def import_collection(collection):
+    password = request.args.get('password')
+    # Not request_user_id(): reading the form would consume the body as urlencoded data
+    if not check_auth(password, request.args.get('user') or DEFAULT_USER_ID):
+        return jsonify({'error': 'Unauthorized'}), 403
+    
+    data_format = request.args.get('format', 'ndjson')
+    if collection not in TRANSFER_COLLECTIONS or data_format not in FORMATS:
+        return jsonify({'error': f'Unknown collection or format. Collections: {sorted(TRANSFER_COLLECTIONS)}, '
+                                 f'formats: {sorted(FORMATS)}'}), 400
+    
+    _, reader, _ = FORMATS[data_format]
+    # The request body is read line by line and applied in batches, never held whole
+    lines = io.TextIOWrapper(request.stream, encoding='utf-8', newline='')
+    try:
+        count = import_records(db, collection, reader(lines, collection))
+        return jsonify({'success': True, 'imported': count})
+    except ValueError as e:
+        return jsonify({'error': f'Import stopped: {str(e)}'}), 400
+    except Exception as e:
+        return jsonify({'error': f'Error importing {collection}: {str(e)}'}), 500
+
+@app.route('/db/partitions', methods=['GET'])
+def get_partition_stats():
+    if not config.verify_password(request.args.get('password')):
+        return jsonify({'error': 'Unauthorized'}), 403
+    
+    return jsonify(databases.partition_stats())
+
+@app.route('/users', methods=['POST'])
+def add_user():
+    data = request.json
+    if not data or not config.verify_password(data.get('password')):
+        return jsonify({'error': 'Unauthorized'}), 403
+    
+    try:
+        databases.add_user(data.get('new_user', ''), data.get('new_password', ''))
+        return jsonify({'success': True, 'user': data['new_user']})
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
 @app.route('/delete-audio', methods=['POST'])
 def delete_audio():
     data = request.json
@@ -886,12 +1483,15 @@ def delete_audio():
     if not file_path.startswith(audio_dir):
         return jsonify({'error': 'Invalid audio file path'}), 400
     
+    # Cached speech is shared between requests; the cache's quota decides when it goes
+    if tts_cache.owns(file_path):
+        return jsonify({'success': True, 'message': 'Cached audio is kept for reuse'})
+    if os.path.dirname(file_path) != audio_dir:
+        return jsonify({'error': 'Invalid audio file path'}), 400
+    
     try:
-        if os.path.exists(file_path) and os.path.isfile(file_path):
-            os.remove(file_path)
-            # Verify file was actually deleted
-            if os.path.exists(file_path):
-                raise Exception('Failed to delete file')
+        # Through the janitor, so the file's pending expiry is dropped with it
+        if audio_janitor.discard(os.path.join(AUDIO_DIR, os.path.basename(file_path))):
             return jsonify({'success': True, 'message': 'Audio file deleted successfully'})
         else:
             return jsonify({'error': 'Audio file not found'}), 404
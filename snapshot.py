@@ -0,0 +1,113 @@
+import os
+import json
+import struct
+import zlib
+from typing import Callable, Dict, Optional
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+# Framed snapshot layout: magic, format version, codec name (NUL padded),
+# CRC-32 of the payload and payload length, followed by the payload itself.
+# Files without the magic are the original plain JSON snapshots.
+MAGIC = b"JAWSSNAP"
+FORMAT_VERSION = 1
+HEADER = struct.Struct(">8sB8sIQ")
+
+# name -> (dumps to bytes, loads from bytes)
+CODECS: Dict[str, tuple] = {}
+
+
+class SnapshotError(Exception):
+    """A framed snapshot that cannot be trusted: truncated, corrupted or written by a newer version."""
+
+
+def register_codec(name: str, dumps: Callable[[Dict], bytes], loads: Callable[[bytes], Dict]) -> None:
+    """Make a serializer available as a snapshot codec."""
+    if len(name.encode()) > 8:
+        raise ValueError(f"Codec names are limited to 8 bytes: {name!r}")
+    CODECS[name] = (dumps, loads)
+
+
+register_codec("json",
+               lambda data: json.dumps(data, separators=(',', ':'), ensure_ascii=False).encode("utf-8"),
+               lambda payload: json.loads(payload.decode("utf-8")))
+
+if orjson is not None:
+    register_codec("orjson", orjson.dumps, orjson.loads)
+
+if msgpack is not None:
+    register_codec("msgpack", lambda data: msgpack.packb(data, use_bin_type=True),
+                   lambda payload: msgpack.unpackb(payload, raw=False, strict_map_key=False))
+
+
+def encode_snapshot(data: Dict, codec: str = "json") -> bytes:
+    """Serialize data into a framed snapshot."""
+    if codec not in CODECS:
+        raise ValueError(f"Unknown or unavailable snapshot codec: {codec!r} (available: {sorted(CODECS)})")
+    payload = CODECS[codec][0](data)
+    header = HEADER.pack(MAGIC, FORMAT_VERSION, codec.encode(), zlib.crc32(payload), len(payload))
+    return header + payload
+
+
+def read_header(raw: bytes) -> Optional[Dict]:
+    """The header fields of a framed snapshot, or None for a plain JSON one."""
+    if not raw.startswith(MAGIC):
+        return None
+    if len(raw) < HEADER.size:
+        raise SnapshotError("Snapshot header is truncated")
+    _, version, codec, checksum, length = HEADER.unpack_from(raw)
+    return {"version": version, "codec": codec.rstrip(b"\0").decode(), "checksum": checksum, "length": length}
+
+
+def decode_snapshot(raw: bytes) -> Dict:
+    """Parse a snapshot written by encode_snapshot, or a plain JSON one."""
+    header = read_header(raw)
+    if header is None:
+        return json.loads(raw.decode("utf-8"))
+
+    if header["version"] > FORMAT_VERSION:
+        raise SnapshotError(f"Snapshot format version {header['version']} is newer than this code supports")
+    if header["codec"] not in CODECS:
+        raise SnapshotError(f"Snapshot codec {header['codec']!r} is not available; install it to load this file")
+    payload = raw[HEADER.size:]
+    if len(payload) != header["length"] or zlib.crc32(payload) != header["checksum"]:
+        raise SnapshotError("Snapshot checksum mismatch (torn or corrupted write)")
+    return CODECS[header["codec"]][1](payload)
+
+
+def convert_snapshot(path: str, codec: Optional[str]) -> None:
+    """Rewrite a snapshot file in place with another codec (None for plain, indented JSON)."""
+    with open(path, 'rb') as f:
+        data = decode_snapshot(f.read())
+    raw = json.dumps(data, indent=2).encode("utf-8") if codec is None else encode_snapshot(data, codec)
+    tmp_file = path + ".tmp"
+    with open(tmp_file, 'wb') as f:
+        f.write(raw)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_file, path)
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Inspect or convert a Database snapshot file.")
+    parser.add_argument("snapshot_file", nargs="?", default="user_data.json")
+    parser.add_argument("--codec", help=f"convert to this codec ({', '.join(sorted(CODECS))}, or 'plain' for indented JSON)")
+    args = parser.parse_args()
+
+    if args.codec:
+        convert_snapshot(args.snapshot_file, None if args.codec == "plain" else args.codec)
+        print(f"Converted {args.snapshot_file} to {args.codec}")
+    else:
+        with open(args.snapshot_file, 'rb') as f:
+            header = read_header(f.read(HEADER.size))
+        print(header or "plain JSON snapshot")
@@ -0,0 +1,391 @@
+import os
+import re
+import queue
+import asyncio
+import heapq
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Executor, TimeoutError as FutureTimeoutError
+from typing import Callable, Dict, List, Optional
+import edge_tts
+
+logger = logging.getLogger('jaws')
+
+# A sentence ends at terminal punctuation followed by whitespace, or at a line break. Unlike
+# database.SENTENCE_BOUNDARY, the end of the text so far is not a boundary: more may still arrive.
+STREAMED_SENTENCE_BOUNDARY = re.compile(r"[.!?]+\s+|\n+")
+
+# edge-tts output format, part of the cache key since the same text and voice could be rendered differently
+OUTPUT_FORMAT = "audio-24khz-48kbitrate-mono-mp3"
+
+CACHE_FILE_PATTERN = re.compile(r"^tts_([0-9a-f]{64})\.mp3$")
+
+# Text worth sending to the synthesizer (edge-tts returns no audio for bare punctuation)
+SPEAKABLE = re.compile(r"\w")
+
+
+class SentenceSplitter:
+    """Cuts text that arrives in pieces into sentences as soon as each one is complete."""
+
+    def __init__(self):
+        self._pending = ""
+
+    def feed(self, text: str) -> List[str]:
+        """Add text and return the sentences it completed."""
+        self._pending += text
+        sentences = []
+        start = 0
+        for boundary in STREAMED_SENTENCE_BOUNDARY.finditer(self._pending):
+            sentences.append(self._pending[start:boundary.end()].strip())
+            start = boundary.end()
+        self._pending = self._pending[start:]
+        return [sentence for sentence in sentences if SPEAKABLE.search(sentence)]
+
+    def flush(self) -> List[str]:
+        """The last, unterminated sentence, if any."""
+        sentence, self._pending = self._pending.strip(), ""
+        return [sentence] if SPEAKABLE.search(sentence) else []
+
+
+async def synthesize(text: str, voice: str) -> bytes:
+    """MP3 audio of `text`, kept in memory instead of being saved to a file."""
+    audio = bytearray()
+    async for chunk in edge_tts.Communicate(text, voice).stream():
+        if chunk["type"] == "audio":
+            audio.extend(chunk["data"])
+    return bytes(audio)
+
+
+def synthesize_blocking(text: str, voice: str) -> bytes:
+    """synthesize() for worker threads, on an event loop of their own."""
+    return asyncio.run(synthesize(text, voice))
+
+
+class SpeechLoop:
+    """One long-lived event loop, in a dedicated thread, that runs all speech synthesis.
+
+    Callers on other threads block in `synthesize` while the work runs on
+    the loop, instead of building and tearing down a loop per reply. At most
+    `max_concurrent` syntheses run at once; the rest wait their turn on the
+    loop. A synthesis that takes longer than `timeout` seconds is cancelled.
+    """
+
+    def __init__(self, max_concurrent: int = 4, timeout: float = 30):
+        self.max_concurrent = max_concurrent
+        self.timeout = timeout
+        self._semaphore = None  # Created on the loop's thread, where it is used
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="tts-loop", daemon=True)
+        self._thread.start()
+
+    def synthesize(self, text: str, voice: str) -> bytes:
+        """MP3 audio of `text`. Raises TimeoutError if it takes longer than the timeout."""
+        future = asyncio.run_coroutine_threadsafe(self._limited(text, voice), self._loop)
+        try:
+            return future.result(self.timeout)
+        except FutureTimeoutError:
+            future.cancel()
+            raise TimeoutError(f"Speech synthesis took longer than {self.timeout}s")
+
+    async def _limited(self, text: str, voice: str) -> bytes:
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrent)
+        async with self._semaphore:
+            return await synthesize(text, voice)
+
+    def close(self) -> None:
+        """Stop the loop and its thread."""
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+
+
+class SpeechCache:
+    """Synthesized speech stored on disk under the hash of (text, voice, output format).
+
+    Repeated text (greetings, the fixed confirmation lines) is served from
+    the file instead of calling edge-tts again. Files are evicted least
+    recently used first once they take more than `max_bytes`; the order
+    survives restarts through the files' modification times.
+    """
+
+    def __init__(self, directory: str, max_bytes: int, output_format: str = OUTPUT_FORMAT):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.output_format = output_format
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> file size, least recently used first
+        self._bytes = 0
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+        existing = []
+        for entry in os.scandir(directory):
+            if CACHE_FILE_PATTERN.match(entry.name):
+                existing.append(entry)
+            elif entry.name.endswith(".tmp"):
+                os.remove(entry.path)  # Left by a write interrupted by a crash
+        for entry in sorted(existing, key=lambda entry: entry.stat().st_mtime):
+            size = entry.stat().st_size
+            self._entries[CACHE_FILE_PATTERN.match(entry.name).group(1)] = size
+            self._bytes += size
+        with self._lock:
+            self._evict()
+
+    def key(self, text: str, voice: str) -> str:
+        return hashlib.sha256("\0".join((text, voice, self.output_format)).encode("utf-8")).hexdigest()
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.directory, f"tts_{key}.mp3")
+
+    def get_path(self, text: str, voice: str, synthesize: Callable[[str, str], bytes]) -> str:
+        """Path of the audio for `text`, synthesizing and storing it on a miss."""
+        key = self.key(text, voice)
+        if self._lookup(key):
+            return self.path(key)
+        self._store(key, synthesize(text, voice))
+        return self.path(key)
+
+    def get_audio(self, text: str, voice: str, synthesize: Callable[[str, str], bytes]) -> bytes:
+        """The audio for `text`, synthesizing and storing it on a miss."""
+        key = self.key(text, voice)
+        if self._lookup(key):
+            try:
+                with open(self.path(key), 'rb') as f:
+                    return f.read()
+            except OSError:
+                pass  # Evicted or removed since the lookup
+        audio = synthesize(text, voice)
+        self._store(key, audio)
+        return audio
+
+    def _lookup(self, key: str) -> bool:
+        with self._lock:
+            if key in self._entries and os.path.exists(self.path(key)):
+                self._entries.move_to_end(key)
+                self.stats["hits"] += 1
+                try:
+                    os.utime(self.path(key))
+                except OSError:
+                    pass
+                return True
+            if key in self._entries:
+                # Removed from disk behind our back
+                self._bytes -= self._entries.pop(key)
+            self.stats["misses"] += 1
+            return False
+
+    def _store(self, key: str, audio: bytes) -> None:
+        # Written under a temporary name so the file is never served half-written
+        tmp_file = f"{self.path(key)}.{threading.get_ident()}.tmp"
+        with open(tmp_file, 'wb') as f:
+            f.write(audio)
+        os.replace(tmp_file, self.path(key))
+        with self._lock:
+            self._bytes += len(audio) - self._entries.pop(key, 0)
+            self._entries[key] = len(audio)
+            self._evict()
+
+    def _evict(self) -> None:
+        """Remove least recently used files until within the quota. Must hold the lock.
+
+        The newest entry is kept even if it alone exceeds the quota, since
+        its caller is about to use it.
+        """
+        while self._bytes > self.max_bytes and len(self._entries) > 1:
+            key, size = self._entries.popitem(last=False)
+            self._bytes -= size
+            self.stats["evictions"] += 1
+            try:
+                os.remove(self.path(key))
+            except OSError:
+                pass
+
+    def cache_stats(self) -> Dict:
+        """Hit/miss counters and current size, for monitoring."""
+        with self._lock:
+            stats = dict(self.stats, entries=len(self._entries), bytes=self._bytes, max_bytes=self.max_bytes)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        return stats
+
+    def owns(self, path: str) -> bool:
+        """Whether a file lives in the cache directory (and so is managed by the cache)."""
+        return os.path.dirname(os.path.abspath(path)) == os.path.abspath(self.directory)
+
+
+class AudioJanitor:
+    """Deletes temporary audio files when they expire, from one background thread.
+
+    Deadlines live in a min-heap, so the thread sleeps until the next one is
+    due no matter how many files are pending. Files already in the directory
+    when the janitor starts belong to an earlier process and are removed
+    then. If the tracked files would exceed `max_bytes`, the older files
+    closest to expiry go first; the file being added is always kept.
+    """
+
+    def __init__(self, directory: str, ttl: float = 300, max_bytes: int = 256 * 1024 * 1024):
+        self.directory = directory
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._condition = threading.Condition()
+        self._files = {}  # path -> (deadline, size)
+        self._heap = []  # (deadline, path); stale once the path is gone from _files or has a newer deadline
+        self._bytes = 0
+        self._thread = None
+        self.stats = {"expired": 0, "evicted": 0, "discarded": 0, "orphans": 0}
+
+    def start(self) -> None:
+        """Sweep orphaned files and start the background thread."""
+        os.makedirs(self.directory, exist_ok=True)
+        for entry in os.scandir(self.directory):
+            if entry.is_file() and entry.path not in self._files:
+                self._remove(entry.path)
+                self.stats["orphans"] += 1
+        self._thread = threading.Thread(target=self._run, name="audio-janitor", daemon=True)
+        self._thread.start()
+
+    def expire_later(self, path: str, ttl: float = None) -> None:
+        """Delete a file once `ttl` seconds (default: the janitor's) have passed."""
+        size = os.path.getsize(path)
+        deadline = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._condition:
+            entry = self._files.pop(path, None)
+            if entry is not None:
+                self._bytes -= entry[1]  # Its heap entry is now stale
+            # Make room among the other files before registering this one, so it is never the one evicted
+            while self._bytes + size > self.max_bytes and self._pop_due(None):
+                self.stats["evicted"] += 1
+            self._files[path] = (deadline, size)
+            self._bytes += size
+            heapq.heappush(self._heap, (deadline, path))
+            self._condition.notify()
+
+    def discard(self, path: str) -> bool:
+        """Delete a file now (e.g. once the client has played it). Returns whether it existed."""
+        with self._condition:
+            entry = self._files.pop(path, None)
+            if entry is not None:
+                self._bytes -= entry[1]
+        if not self._remove(path):
+            return False
+        self.stats["discarded"] += 1
+        return True
+
+    def janitor_stats(self) -> Dict:
+        """Counters and the files currently waiting to expire, for monitoring."""
+        with self._condition:
+            return dict(self.stats, pending=len(self._files), bytes=self._bytes, max_bytes=self.max_bytes)
+
+    def _pop_due(self, now: Optional[float]) -> bool:
+        """Forget and delete the file with the earliest deadline, if it is due by `now` (None: regardless).
+
+        Must hold the lock. Returns whether a file was removed.
+        """
+        while self._heap:
+            deadline, path = self._heap[0]
+            if self._files.get(path, (None,))[0] != deadline:
+                heapq.heappop(self._heap)  # Stale: discarded or given a later deadline
+                continue
+            if now is not None and deadline > now:
+                return False
+            heapq.heappop(self._heap)
+            self._bytes -= self._files.pop(path)[1]
+            self._remove(path)
+            return True
+        return False
+
+    def _run(self) -> None:
+        with self._condition:
+            while True:
+                while self._pop_due(time.monotonic()):
+                    self.stats["expired"] += 1
+                # Sleep until the next deadline, or until a new file is added
+                self._condition.wait(self._heap[0][0] - time.monotonic() if self._heap else None)
+
+    @staticmethod
+    def _remove(path: str) -> bool:
+        try:
+            os.remove(path)
+            return True
+        except FileNotFoundError:
+            return False
+        except OSError as e:
+            logger.error(f"Error removing audio file {path}: {str(e)}")
+            return False
+
+
+class SpeechPipeline:
+    """Speaks a response sentence by sentence while it is still being generated.
+
+    Complete sentences are synthesized on `executor`, whose worker count
+    bounds how many run at once (across all pipelines sharing it). Audio is
+    handed to `send(index, audio)` strictly in sentence order from a
+    background thread, so the first sentence can play while later ones are
+    still being synthesized. A sentence that fails to synthesize is sent as
+    None so the client can skip it. With a `cache`, repeated sentences are
+    served from it. `synthesize` does the actual work (e.g. SpeechLoop.synthesize).
+    """
+
+    def __init__(self, send: Callable[[int, Optional[bytes]], None], voice: str, executor: Executor,
+                 cache: Optional[SpeechCache] = None,
+                 synthesize: Callable[[str, str], bytes] = synthesize_blocking):
+        self._send = send
+        self._voice = voice
+        self._executor = executor
+        self._cache = cache
+        self._synthesize = synthesize
+        self._splitter = SentenceSplitter()
+        self._futures = queue.Queue()
+        self._cancelled = False
+        self.sentences = 0
+        self._sender = threading.Thread(target=self._send_in_order, daemon=True)
+        self._sender.start()
+
+    def feed(self, text: str) -> None:
+        """Add response text; every sentence it completes starts synthesizing."""
+        for sentence in self._splitter.feed(text):
+            self._submit(sentence)
+
+    def close(self, cancel: bool = False) -> int:
+        """Finish the last sentence (or drop everything not yet sent) and wait until all audio is sent.
+
+        Returns the number of sentences synthesized.
+        """
+        if cancel:
+            self._cancelled = True
+        else:
+            for sentence in self._splitter.flush():
+                self._submit(sentence)
+        self._futures.put(None)
+        self._sender.join()
+        return self.sentences
+
+    def _submit(self, sentence: str) -> None:
+        if self._cache:
+            future = self._executor.submit(self._cache.get_audio, sentence, self._voice, self._synthesize)
+        else:
+            future = self._executor.submit(self._synthesize, sentence, self._voice)
+        self._futures.put(future)
+        self.sentences += 1
+
+    def _send_in_order(self) -> None:
+        index = 0
+        while True:
+            future = self._futures.get()
+            if future is None:
+                return
+            if self._cancelled:
+                future.cancel()
+                continue
+            try:
+                audio = future.result()
+            except Exception as e:
+                logger.error(f"Error synthesizing sentence {index}: {str(e)}")
+                audio = None
+            if not self._cancelled:
+                self._send(index, audio)
+            index += 1
@@ -0,0 +1,800 @@
+import os
+import copy
+import json
+import sqlite3
+import datetime
+import threading
+from typing import Dict, List, Any, Iterable, Optional
+from database import (Database, FSYNC_POLICIES, MEMORY_KEYWORDS, NUTRIENTS, TRANSFER_COLLECTIONS, ReadWriteLock,
+                      _memoized, check_page_limit, compile_keyword_matcher, decode_cursor, encode_cursor, memory_hash)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS kv (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS conversations (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    timestamp TEXT NOT NULL,
+    date TEXT NOT NULL,
+    query TEXT NOT NULL,
+    response TEXT NOT NULL,
+    key_points TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_conversations_date ON conversations (date);
+CREATE INDEX IF NOT EXISTS idx_conversations_timestamp ON conversations (timestamp);
+CREATE TABLE IF NOT EXISTS memory_entries (
+    hash TEXT PRIMARY KEY,
+    point TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    added TEXT NOT NULL,
+    last_referenced TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_memory_entries_eviction ON memory_entries (count, last_referenced);
+CREATE TABLE IF NOT EXISTS schedule (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    title TEXT NOT NULL,
+    date TEXT NOT NULL,
+    time TEXT NOT NULL,
+    description TEXT NOT NULL,
+    completed INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_schedule_date ON schedule (date);
+CREATE TABLE IF NOT EXISTS workouts (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    date TEXT NOT NULL,
+    exercise TEXT NOT NULL,
+    exercise_key TEXT NOT NULL,
+    reps INTEGER NOT NULL,
+    weight REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_workouts_exercise ON workouts (exercise_key, date);
+CREATE INDEX IF NOT EXISTS idx_workouts_date ON workouts (date);
+CREATE TABLE IF NOT EXISTS nutrition_logs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    timestamp TEXT NOT NULL,
+    food_name TEXT NOT NULL,
+    calories INTEGER NOT NULL,
+    protein REAL NOT NULL,
+    carbs REAL NOT NULL,
+    fats REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_nutrition_logs_timestamp ON nutrition_logs (timestamp);
+CREATE TABLE IF NOT EXISTS nutrition_daily_totals (
+    date TEXT PRIMARY KEY,
+    calories INTEGER NOT NULL,
+    protein REAL NOT NULL,
+    carbs REAL NOT NULL,
+    fats REAL NOT NULL,
+    count INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS nutrition_history (
+    date TEXT PRIMARY KEY,
+    data TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS weight_logs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    date TEXT NOT NULL,
+    weight REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_weight_logs_date ON weight_logs (date);
+CREATE TABLE IF NOT EXISTS movie_preferences (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    timestamp TEXT NOT NULL,
+    genre TEXT NOT NULL,
+    title TEXT,
+    rating INTEGER
+);
+CREATE INDEX IF NOT EXISTS idx_movie_preferences_genre ON movie_preferences (genre);
+"""
+
+DEFAULT_USER = {
+    "name": "Rowan",  # Default name as per requirements
+    "preferences": {}
+}
+
+DEFAULT_NUTRITION_GOALS = {
+    "calories": 0,
+    "protein": 0,
+    "carbs": 0,
+    "fats": 0,
+    "goal_type": ""
+}
+
+
+def _prefix_range(prefix: str) -> tuple:
+    """Bounds (inclusive, exclusive) of the strings starting with `prefix`."""
+    return prefix, prefix + "\uffff"
+
+
+class SQLiteDatabase(Database):
+    """Database backed by indexed SQLite tables instead of a single in-memory JSON document.
+
+    Exposes the same methods and return shapes as Database, so callers can
+    switch backends without changes.
+    """
+
+    # How the Database fsync policies map onto SQLite's own durability levels
+    SYNCHRONOUS_LEVELS = {"always": "FULL", "batched": "NORMAL", "os": "OFF"}
+
+    def __init__(self, db_file="user_data.db", cache_timeout=300, fsync="batched", cache_size=128,
+                 memory_capacity=500, conversation_retention_hours=24, conversation_max_recent=5,
+                 memory_keywords=MEMORY_KEYWORDS):
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f"fsync must be one of {FSYNC_POLICIES}, got {fsync!r}")
+        self.db_file = db_file
+        self.fsync = fsync
+        self.memory_capacity = memory_capacity
+        self._keyword_pattern = compile_keyword_matcher(memory_keywords)
+        self.conversation_retention = datetime.timedelta(hours=conversation_retention_hours)
+        self.conversation_max_recent = conversation_max_recent
+        self._init_cache(cache_timeout, cache_size)
+
+        # Flask-SocketIO runs handlers on several threads; one connection
+        # guarded by a lock keeps SQLite's single-writer model simple. The
+        # read/write lock is only used by methods inherited from Database.
+        self._conn_lock = threading.RLock()
+        self._lock = ReadWriteLock()
+        self._conn = sqlite3.connect(db_file, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(f"PRAGMA synchronous={self.SYNCHRONOUS_LEVELS[fsync]}")
+        with self._conn:
+            self._conn.executescript(SCHEMA)
+        self._upgrade_long_term_memory()
+
+        # Aggregates are missing for databases created before they existed
+        if self._query("SELECT 1 FROM nutrition_logs WHERE substr(timestamp, 1, 10) NOT IN "
+                       "(SELECT date FROM nutrition_daily_totals) LIMIT 1"):
+            self._rebuild_daily_totals()
+
+    def _upgrade_long_term_memory(self) -> None:
+        """Move points from the old unhashed long_term_memory table into memory_entries."""
+        if not self._query("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'long_term_memory'"):
+            return
+        with self._conn_lock, self._conn:
+            points = [row["point"] for row in self._conn.execute("SELECT point FROM long_term_memory ORDER BY id")]
+            self._remember(points)
+            self._conn.execute("DROP TABLE long_term_memory")
+
+    def _rebuild_daily_totals(self) -> None:
+        """Recompute the per-day nutrition aggregates from the logs and the archived history."""
+        with self._conn_lock, self._conn:
+            self._conn.execute("DELETE FROM nutrition_daily_totals")
+            for row in self._conn.execute("SELECT date, data FROM nutrition_history").fetchall():
+                entry = json.loads(row["data"])
+                summary = entry["summary"]
+                self._conn.execute(
+                    "INSERT INTO nutrition_daily_totals (date, calories, protein, carbs, fats, count) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (row["date"], summary["total_calories"], summary["total_protein"], summary["total_carbs"],
+                     summary["total_fats"], len(entry["logs"])))
+            self._conn.execute(
+                "INSERT OR REPLACE INTO nutrition_daily_totals (date, calories, protein, carbs, fats, count) "
+                "SELECT substr(timestamp, 1, 10), SUM(calories), SUM(protein), SUM(carbs), SUM(fats), COUNT(*) "
+                "FROM nutrition_logs GROUP BY substr(timestamp, 1, 10)")
+
+    def _query(self, sql: str, params: tuple = ()) -> List[sqlite3.Row]:
+        with self._conn_lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    def _get_kv(self, key: str, default: Any) -> Any:
+        rows = self._query("SELECT value FROM kv WHERE key = ?", (key,))
+        # A copy, so a caller updating it in place cannot change the shared default
+        return json.loads(rows[0]["value"]) if rows else copy.deepcopy(default)
+
+    def _set_kv(self, key: str, value: Any) -> None:
+        with self._conn_lock, self._conn:
+            self._conn.execute("INSERT OR REPLACE INTO kv (key, value) VALUES (?, ?)",
+                               (key, json.dumps(value)))
+
+    def _save_data(self) -> None:
+        """Every mutation commits its own transaction; there is no snapshot to write."""
+
+    def flush(self) -> None:
+        """Nothing is buffered: SQLite commits each mutation as it happens."""
+
+    def checkpoint(self) -> None:
+        """Fold the SQLite write-ahead log back into the main database file."""
+        with self._conn_lock:
+            self._conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+    def archive_cold_data(self, before: Optional[datetime.date] = None) -> Dict[str, int]:
+        """Nothing to archive: old rows stay in the database file and are only read when queried."""
+        return {}
+
+    def memory_footprint(self) -> int:
+        """Rows stay in the database file, so only the result cache is held in memory."""
+        return 0
+
+    def close(self) -> None:
+        """Close the underlying SQLite connection."""
+        with self._conn_lock:
+            self._conn.close()
+
+    # --- Row conversion ---
+
+    @staticmethod
+    def _conversation_from_row(row: sqlite3.Row) -> Dict:
+        return {
+            "timestamp": row["timestamp"],
+            "query": row["query"],
+            "response": row["response"],
+            "key_points": json.loads(row["key_points"])
+        }
+
+    @staticmethod
+    def _schedule_from_row(row: sqlite3.Row) -> Dict:
+        return {
+            "id": row["id"],
+            "title": row["title"],
+            "date": row["date"],
+            "time": row["time"],
+            "description": row["description"],
+            "completed": bool(row["completed"])
+        }
+
+    @staticmethod
+    def _workout_from_row(row: sqlite3.Row) -> Dict:
+        return {
+            "id": row["id"],
+            "date": row["date"],
+            "exercise": row["exercise"],
+            "reps": row["reps"],
+            "weight": row["weight"]
+        }
+
+    @staticmethod
+    def _food_log_from_row(row: sqlite3.Row) -> Dict:
+        return {
+            "id": row["id"],
+            "timestamp": row["timestamp"],
+            "food_name": row["food_name"],
+            "calories": row["calories"],
+            "protein": row["protein"],
+            "carbs": row["carbs"],
+            "fats": row["fats"]
+        }
+
+    @staticmethod
+    def _weight_log_from_row(row: sqlite3.Row) -> Dict:
+        return {"id": row["id"], "date": row["date"], "weight": row["weight"]}
+
+    # --- Conversations ---
+
+    def add_conversation(self, query: str, response: str, referenced: Iterable[str] = ()) -> None:
+        """Add a conversation entry to the history, counting the memory points it drew on as used."""
+        timestamp = datetime.datetime.now().isoformat()
+        key_points = self._extract_key_points(query, response)
+        with self._conn_lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO conversations (timestamp, date, query, response, key_points) VALUES (?, ?, ?, ?, ?)",
+                (timestamp, timestamp[:10], query, response, json.dumps(key_points)))
+
+            # Keep only the most recent conversations within the retention window
+            self._prune_conversations()
+            self._conn.executemany(
+                "UPDATE memory_entries SET count = count + 1, last_referenced = ? WHERE hash = ?",
+                [(timestamp, memory_hash(point)) for point in referenced])
+        self._invalidate("conversations", "long_term_memory")
+
+    def _prune_conversations(self) -> None:
+        """Prune conversations to keep only the most recent ones within the retention window.
+
+        Must be called with the lock held inside a transaction. Both deletes
+        are index range scans, so the cost follows the number of rows removed.
+        """
+        cutoff = (datetime.datetime.now() - self.conversation_retention).isoformat()
+
+        # Preserve key points from conversations that fell out of the retention window
+        expired = self._conn.execute(
+            "SELECT key_points FROM conversations WHERE timestamp <= ? ORDER BY id", (cutoff,)).fetchall()
+        self._remember([point for row in expired for point in json.loads(row["key_points"])])
+
+        self._conn.execute("DELETE FROM conversations WHERE timestamp <= ?", (cutoff,))
+        self._conn.execute(
+            "DELETE FROM conversations WHERE id <= (SELECT id FROM conversations ORDER BY id DESC LIMIT 1 OFFSET ?)",
+            (self.conversation_max_recent,))
+
+    def _remember(self, points: List[str]) -> None:
+        """Add key points to long-term memory, or bump the count of ones already known.
+
+        Must be called with the lock held inside a transaction.
+        """
+        if not points:
+            return
+        now = datetime.datetime.now().isoformat()
+        self._conn.executemany(
+            "INSERT INTO memory_entries (hash, point, count, added, last_referenced) VALUES (?, ?, 1, ?, ?) "
+            "ON CONFLICT (hash) DO UPDATE SET count = count + 1, last_referenced = excluded.last_referenced",
+            [(memory_hash(point), point, now, now) for point in points])
+        self._evict_long_term_memory()
+
+    def _evict_long_term_memory(self) -> None:
+        """Drop the least referenced, then least recently referenced, points beyond capacity."""
+        overflow = self._conn.execute("SELECT COUNT(*) FROM memory_entries").fetchone()[0] - self.memory_capacity
+        if overflow > 0:
+            self._conn.execute(
+                "DELETE FROM memory_entries WHERE hash IN "
+                "(SELECT hash FROM memory_entries ORDER BY count, last_referenced LIMIT ?)", (overflow,))
+
+    def get_recent_conversations(self, limit: int = 5) -> List[Dict]:
+        """Get the most recent conversations (default: last 5)."""
+        rows = self._query("SELECT * FROM (SELECT * FROM conversations ORDER BY id DESC LIMIT ?) ORDER BY id",
+                           (limit,))
+        return [self._conversation_from_row(row) for row in rows]
+
+    def get_long_term_memory(self) -> List[str]:
+        """Get the preserved key points from long-term memory, oldest first."""
+        return [row["point"] for row in self._query("SELECT point FROM memory_entries ORDER BY added, rowid")]
+
+    def get_conversations_for_date(self, date: datetime.date) -> List[Dict]:
+        """Get conversations for a specific date."""
+        date_str = date.isoformat().split('T')[0]  # Get just the date part
+        rows = self._query("SELECT * FROM conversations WHERE date = ? ORDER BY id", (date_str,))
+        return [self._conversation_from_row(row) for row in rows]
+
+    # --- Schedule ---
+
+    def add_schedule_item(self, title: str, date: str, time: str, description: str = "") -> Dict:
+        """Add a scheduled item to the calendar."""
+        with self._conn_lock, self._conn:
+            cursor = self._conn.execute(
+                "INSERT INTO schedule (title, date, time, description, completed) VALUES (?, ?, ?, ?, 0)",
+                (title, date, time, description))
+        return {
+            "id": cursor.lastrowid,
+            "title": title,
+            "date": date,
+            "time": time,
+            "description": description,
+            "completed": False
+        }
+
+    def _date_page(self, table: str, from_row, start: str, end: str, cursor: str, limit: int) -> Dict:
+        """Records dated within [start, end] after the cursor, in (date, id) order, via the date index."""
+        check_page_limit(limit)
+        clauses, params = [], []
+        if start:
+            clauses.append("date >= ?")
+            params.append(start)
+        if end:
+            clauses.append("date <= ?")
+            params.append(end)
+        if cursor:
+            clauses.append("(date, id) > (?, ?)")
+            params.extend(decode_cursor(cursor))
+        sql = f"SELECT * FROM {table}"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY date, id"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit + 1)  # one extra row tells whether there is another page
+        rows = self._query(sql, tuple(params))
+        next_cursor = None
+        if limit is not None and len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor(rows[-1]["date"], rows[-1]["id"])
+        return {"items": [from_row(row) for row in rows], "next_cursor": next_cursor}
+
+    def get_schedule_for_date(self, date: str) -> List[Dict]:
+        """Get all scheduled items for a specific date."""
+        rows = self._query("SELECT * FROM schedule WHERE date = ? ORDER BY id", (date,))
+        return [self._schedule_from_row(row) for row in rows]
+
+    def get_upcoming_schedule(self, days: int = 7) -> List[Dict]:
+        """Get upcoming scheduled items for the next X days."""
+        today = datetime.date.today()
+        upcoming_dates = [(today + datetime.timedelta(days=i)).isoformat() for i in range(days)]
+        if not upcoming_dates:
+            return []
+        placeholders = ", ".join("?" * len(upcoming_dates))
+        rows = self._query(f"SELECT * FROM schedule WHERE date IN ({placeholders}) ORDER BY id",
+                           tuple(upcoming_dates))
+        return [self._schedule_from_row(row) for row in rows]
+
+    def get_schedule_page(self, start: str = None, end: str = None, cursor: str = None, limit: int = None) -> Dict:
+        """Get scheduled items dated from `start` to `end` (inclusive), one page at a time."""
+        return self._date_page("schedule", self._schedule_from_row, start, end, cursor, limit)
+
+    def mark_schedule_completed(self, schedule_id: int, completed: bool = True) -> bool:
+        """Mark a scheduled item as completed or not completed."""
+        with self._conn_lock, self._conn:
+            cursor = self._conn.execute("UPDATE schedule SET completed = ? WHERE id = ?",
+                                        (int(completed), schedule_id))
+        return cursor.rowcount > 0
+
+    def delete_schedule_item(self, item_id: int) -> bool:
+        """Delete a schedule item by its ID."""
+        with self._conn_lock, self._conn:
+            cursor = self._conn.execute("DELETE FROM schedule WHERE id = ?", (item_id,))
+        return cursor.rowcount > 0
+
+    # --- Workouts ---
+
+    def add_workout(self, exercise: str, reps: int, weight: float, date: str = None) -> Dict:
+        """Add a workout entry to fitness tracking."""
+        if date is None:
+            date = datetime.date.today().isoformat()
+
+        with self._conn_lock, self._conn:
+            cursor = self._conn.execute(
+                "INSERT INTO workouts (date, exercise, exercise_key, reps, weight) VALUES (?, ?, ?, ?, ?)",
+                (date, exercise, exercise.lower(), reps, weight))
+        self._invalidate("workouts")
+        return {
+            "id": cursor.lastrowid,
+            "date": date,
+            "exercise": exercise,
+            "reps": reps,
+            "weight": weight
+        }
+
+    def delete_workout(self, workout_id: int) -> bool:
+        """Delete a workout by its ID."""
+        with self._conn_lock, self._conn:
+            cursor = self._conn.execute("DELETE FROM workouts WHERE id = ?", (workout_id,))
+        self._invalidate("workouts")
+        return cursor.rowcount > 0
+
+    def get_exercise_progress(self, exercise: str) -> List[Dict]:
+        """Get progress history for a specific exercise, oldest first."""
+        rows = self._query("SELECT * FROM workouts WHERE exercise_key = ? ORDER BY date, id", (exercise.lower(),))
+        return [self._workout_from_row(row) for row in rows]
+
+    @_memoized("workouts")
+    def get_recent_workouts(self, limit: int = 10) -> List[Dict]:
+        """Get the most recent workouts."""
+        rows = self._query("SELECT * FROM workouts ORDER BY date DESC, id LIMIT ?", (limit,))
+        return [self._workout_from_row(row) for row in rows]
+
+    # --- Movies ---
+
+    def add_movie_preference(self, genre: str, title: str = None, rating: int = None) -> None:
+        """Add a movie preference to help with recommendations."""
+        if not (rating and 1 <= rating <= 10):
+            rating = None
+        with self._conn_lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO movie_preferences (timestamp, genre, title, rating) VALUES (?, ?, ?, ?)",
+                (datetime.datetime.now().isoformat(), genre, title or None, rating))
+        self._invalidate("movie_preferences")
+
+    @_memoized("movie_preferences")
+    def get_movie_preferences(self) -> List[str]:
+        """Get list of preferred movie genres based on history."""
+        rows = self._query(
+            "SELECT genre FROM movie_preferences GROUP BY genre ORDER BY COUNT(*) DESC, MIN(id)")
+        return [row["genre"] for row in rows]
+
+    # --- User ---
+
+    def get_user_name(self) -> str:
+        """Get the user's name."""
+        return self._get_kv("user", DEFAULT_USER)["name"]
+
+    def set_user_preference(self, key: str, value: Any) -> None:
+        """Set a user preference."""
+        with self._conn_lock:
+            user = self._get_kv("user", DEFAULT_USER)
+            user["preferences"][key] = value
+            self._set_kv("user", user)
+
+    def get_user_preference(self, key: str, default: Any = None) -> Any:
+        """Get a user preference."""
+        return self._get_kv("user", DEFAULT_USER)["preferences"].get(key, default)
+
+    # --- Nutrition ---
+
+    def set_nutrition_goals(self, calories: int, protein: int, carbs: int, fats: int, goal_type: str) -> Dict:
+        """Set nutrition goals for the user."""
+        nutrition_goals = {
+            "calories": calories,
+            "protein": protein,
+            "carbs": carbs,
+            "fats": fats,
+            "goal_type": goal_type  # 'cut', 'bulk', or 'maintain'
+        }
+        self._set_kv("nutrition_goals", nutrition_goals)
+        return nutrition_goals
+
+    def log_food_intake(self, food_name: str, calories: int, protein: float = 0, carbs: float = 0, fats: float = 0) -> Dict:
+        """Log food intake with nutritional information."""
+        timestamp = datetime.datetime.now().isoformat()
+        with self._conn_lock, self._conn:
+            cursor = self._conn.execute(
+                "INSERT INTO nutrition_logs (timestamp, food_name, calories, protein, carbs, fats) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (timestamp, food_name, calories, protein, carbs, fats))
+            self._conn.execute(
+                "INSERT INTO nutrition_daily_totals (date, calories, protein, carbs, fats, count) "
+                "VALUES (?, ?, ?, ?, ?, 1) ON CONFLICT (date) DO UPDATE SET "
+                "calories = calories + excluded.calories, protein = protein + excluded.protein, "
+                "carbs = carbs + excluded.carbs, fats = fats + excluded.fats, count = count + 1",
+                (timestamp[:10], calories, protein, carbs, fats))
+        return {
+            "id": cursor.lastrowid,
+            "timestamp": timestamp,
+            "food_name": food_name,
+            "calories": calories,
+            "protein": protein,
+            "carbs": carbs,
+            "fats": fats
+        }
+
+    def log_weight(self, weight: float, date: str = None) -> Dict:
+        """Log user's weight measurement."""
+        if date is None:
+            date = datetime.date.today().isoformat()
+
+        with self._conn_lock, self._conn:
+            cursor = self._conn.execute("INSERT INTO weight_logs (date, weight) VALUES (?, ?)", (date, weight))
+        return {
+            "id": cursor.lastrowid,
+            "date": date,
+            "weight": weight
+        }
+
+    def get_nutrition_summary(self, date: str = None, cursor: str = None, limit: int = None) -> Dict:
+        """Get nutrition summary for a specific date (logs paged as in Database.get_nutrition_summary)."""
+        check_page_limit(limit)
+        if date is None:
+            date = datetime.date.today().isoformat()
+
+        # Logs and totals are read together, so a concurrent write cannot land between them
+        with self._conn_lock:
+            # Timestamp prefix match expressed as an index range scan
+            sql = "SELECT * FROM nutrition_logs WHERE timestamp >= ? AND timestamp < ? AND id > ? ORDER BY id"
+            params = _prefix_range(date) + (int(cursor) if cursor else 0,)
+            if limit is not None:
+                sql += " LIMIT ?"
+                params += (limit + 1,)
+            rows = self._query(sql, params)
+            next_cursor = None
+            if limit is not None and len(rows) > limit:
+                rows = rows[:limit]
+                next_cursor = str(rows[-1]["id"])
+            daily_logs = [self._food_log_from_row(row) for row in rows]
+
+            # Totals come from the running aggregates, not from re-summing the logs
+            totals = self._query(
+                "SELECT COALESCE(SUM(calories), 0) AS calories, COALESCE(SUM(protein), 0) AS protein, "
+                "COALESCE(SUM(carbs), 0) AS carbs, COALESCE(SUM(fats), 0) AS fats "
+                "FROM nutrition_daily_totals WHERE date >= ? AND date < ?", _prefix_range(date[:10]))[0]
+        total_calories = totals["calories"]
+        total_protein = totals["protein"]
+        total_carbs = totals["carbs"]
+        total_fats = totals["fats"]
+
+        goals = self._get_kv("nutrition_goals", DEFAULT_NUTRITION_GOALS)
+
+        return {
+            "date": date,
+            "total_calories": total_calories,
+            "total_protein": total_protein,
+            "total_carbs": total_carbs,
+            "total_fats": total_fats,
+            "remaining_calories": goals["calories"] - total_calories if goals["calories"] > 0 else 0,
+            "remaining_protein": goals["protein"] - total_protein if goals["protein"] > 0 else 0,
+            "goal_type": goals["goal_type"],
+            "logs": daily_logs,
+            "next_cursor": next_cursor
+        }
+
+    def _daily_totals_between(self, start_date: datetime.date, end_date: datetime.date) -> List[tuple]:
+        """(day, totals) pairs for logged days in the inclusive range, oldest first."""
+        rows = self._query("SELECT * FROM nutrition_daily_totals WHERE date BETWEEN ? AND ? ORDER BY date",
+                           (start_date.isoformat(), end_date.isoformat()))
+        return [(row["date"], {field: row[field] for field in NUTRIENTS + ("count",)}) for row in rows]
+
+    def get_nutrition_history(self, date: str) -> Dict:
+        """Get the archived logs and summary of a day that was closed by reset_daily_nutrition."""
+        rows = self._query("SELECT data FROM nutrition_history WHERE date = ?", (date,))
+        return json.loads(rows[0]["data"]) if rows else None
+
+    def get_weight_history(self, days: int = 30) -> List[Dict]:
+        """Get weight history for the specified number of days."""
+        if days > 0:
+            rows = self._query(
+                "SELECT * FROM (SELECT * FROM weight_logs ORDER BY date DESC, id DESC LIMIT ?) ORDER BY date, id",
+                (days,))
+        else:
+            rows = self._query("SELECT * FROM weight_logs ORDER BY date, id")
+        return [self._weight_log_from_row(row) for row in rows]
+
+    def get_weight_page(self, start: str = None, end: str = None, cursor: str = None, limit: int = None) -> Dict:
+        """Get weight logs dated from `start` to `end` (inclusive), one page at a time."""
+        return self._date_page("weight_logs", self._weight_log_from_row, start, end, cursor, limit)
+
+    def reset_daily_nutrition(self) -> None:
+        """Reset daily nutrition logs and archive them."""
+        today = datetime.date.today()
+        yesterday = (today - datetime.timedelta(days=1)).isoformat()
+
+        with self._conn_lock, self._conn:
+            summary = self.get_nutrition_summary(yesterday)
+            if summary["logs"]:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO nutrition_history (date, data) VALUES (?, ?)",
+                    (yesterday, json.dumps({"logs": summary["logs"], "summary": summary})))
+
+            # Clear current logs that are older than today
+            self._conn.execute("DELETE FROM nutrition_logs WHERE NOT (timestamp >= ? AND timestamp < ?)",
+                               _prefix_range(today.isoformat()))
+
+    # --- Export / import ---
+
+    # collection -> (table, columns written on import)
+    TRANSFER_TABLES = {
+        "schedule": ("schedule", ("title", "date", "time", "description", "completed")),
+        "workouts": ("workouts", ("date", "exercise", "exercise_key", "reps", "weight")),
+        "nutrition_logs": ("nutrition_logs", ("timestamp", "food_name", "calories", "protein", "carbs", "fats")),
+        "weight_logs": ("weight_logs", ("date", "weight")),
+        "conversations": ("conversations", ("timestamp", "date", "query", "response", "key_points")),
+    }
+
+    def _record_from_row(self, collection: str, row: sqlite3.Row) -> Dict:
+        if collection == "schedule":
+            return self._schedule_from_row(row)
+        if collection == "workouts":
+            return self._workout_from_row(row)
+        if collection == "nutrition_logs":
+            return self._food_log_from_row(row)
+        if collection == "weight_logs":
+            return self._weight_log_from_row(row)
+        return self._conversation_from_row(row)
+
+    def iter_records(self, collection: str, batch_size: int = 500):
+        """Yield copies of a collection's records in batches, paging through the primary key."""
+        if collection not in TRANSFER_COLLECTIONS:
+            raise ValueError(f"Unknown collection: {collection}")
+        table, _ = self.TRANSFER_TABLES[collection]
+        last_id = 0
+        while True:
+            rows = self._query(f"SELECT * FROM {table} WHERE id > ? ORDER BY id LIMIT ?", (last_id, batch_size))
+            if not rows:
+                return
+            last_id = rows[-1]["id"]
+            yield [self._record_from_row(collection, row) for row in rows]
+
+    def _add_records(self, collection: str, records: List[Dict]) -> List[Dict]:
+        """Insert already validated records in a single transaction and return them with their IDs."""
+        if not records:
+            return []
+
+        # Columns derived from the record rather than stored as-is
+        rows = []
+        for record in records:
+            row = dict(record)
+            if collection == "workouts":
+                row["exercise_key"] = record["exercise"].lower()
+            elif collection == "conversations":
+                row["date"] = record["timestamp"][:10]
+                row["key_points"] = json.dumps(record["key_points"])
+            elif collection == "schedule":
+                row["completed"] = int(record["completed"])
+            rows.append(row)
+
+        table, columns = self.TRANSFER_TABLES[collection]
+        statement = f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})"
+        stored = []
+        with self._conn_lock, self._conn:
+            for record, row in zip(records, rows):
+                cursor = self._conn.execute(statement, tuple(row[column] for column in columns))
+                stored.append(record if collection == "conversations" else dict(id=cursor.lastrowid, **record))
+            if collection == "nutrition_logs":
+                self._conn.executemany(
+                    "INSERT INTO nutrition_daily_totals (date, calories, protein, carbs, fats, count) "
+                    "VALUES (?, ?, ?, ?, ?, 1) ON CONFLICT (date) DO UPDATE SET "
+                    "calories = calories + excluded.calories, protein = protein + excluded.protein, "
+                    "carbs = carbs + excluded.carbs, fats = fats + excluded.fats, count = count + 1",
+                    [(r["timestamp"][:10], r["calories"], r["protein"], r["carbs"], r["fats"]) for r in records])
+            elif collection == "conversations":
+                self._prune_conversations()
+        if collection == "workouts":
+            self._invalidate("workouts")
+        elif collection == "conversations":
+            self._invalidate("conversations", "long_term_memory")
+        return stored
+
+
+def migrate_json_to_sqlite(json_file: str = "user_data.json", sqlite_file: str = "user_data.db") -> Dict[str, int]:
+    """One-shot copy of a JSON Database file (and any pending journal) into a new SQLite database.
+
+    Record IDs are preserved and archived records are copied along with the
+    live ones. The JSON files are only read, never rewritten. Returns the
+    number of rows copied per table.
+    """
+    if not os.path.exists(json_file):
+        raise FileNotFoundError(f"No JSON database to migrate: {json_file}")
+    if os.path.exists(sqlite_file):
+        raise FileExistsError(f"Refusing to overwrite existing database: {sqlite_file}")
+
+    source = Database(json_file, read_only=True)
+    data = source.data
+    fitness = data.get("fitness", {})
+    nutrition = fitness.get("nutrition", {})
+
+    target = SQLiteDatabase(sqlite_file)
+    conn = target._conn
+    counts = {}
+    with conn:
+        conn.execute("INSERT INTO kv (key, value) VALUES ('user', ?)", (json.dumps(data.get("user", DEFAULT_USER)),))
+        conn.execute("INSERT INTO kv (key, value) VALUES ('nutrition_goals', ?)",
+                     (json.dumps(nutrition.get("goals", DEFAULT_NUTRITION_GOALS)),))
+
+        conversations = data.get("conversations", [])
+        conn.executemany(
+            "INSERT INTO conversations (timestamp, date, query, response, key_points) VALUES (?, ?, ?, ?, ?)",
+            [(c["timestamp"], c["timestamp"][:10], c["query"], c["response"], json.dumps(c.get("key_points", [])))
+             for c in conversations])
+        counts["conversations"] = len(conversations)
+
+        memory = data.get("long_term_memory", {}).get("entries", {})
+        conn.executemany(
+            "INSERT INTO memory_entries (hash, point, count, added, last_referenced) VALUES (?, ?, ?, ?, ?)",
+            [(key, e["text"], e["count"], e["added"], e["last_referenced"]) for key, e in memory.items()])
+        counts["long_term_memory"] = len(memory)
+
+        schedule = data.get("schedule", [])
+        conn.executemany(
+            "INSERT INTO schedule (id, title, date, time, description, completed) VALUES (?, ?, ?, ?, ?, ?)",
+            [(s["id"], s["title"], s["date"], s["time"], s.get("description", ""), int(s.get("completed", False)))
+             for s in schedule])
+        counts["schedule"] = len(schedule)
+
+        workouts = list(source._archived("workouts")) + fitness.get("workouts", [])
+        conn.executemany(
+            "INSERT INTO workouts (id, date, exercise, exercise_key, reps, weight) VALUES (?, ?, ?, ?, ?, ?)",
+            [(w["id"], w["date"], w["exercise"], w["exercise"].lower(), w["reps"], w["weight"]) for w in workouts])
+        counts["workouts"] = len(workouts)
+
+        logs = list(source._archived("food_logs")) + nutrition.get("logs", [])
+        conn.executemany(
+            "INSERT INTO nutrition_logs (id, timestamp, food_name, calories, protein, carbs, fats) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            [(l["id"], l["timestamp"], l["food_name"], l["calories"],
+              l.get("protein", 0), l.get("carbs", 0), l.get("fats", 0)) for l in logs])
+        counts["nutrition_logs"] = len(logs)
+
+        history = dict(source._archived("nutrition_history"), **fitness.get("nutrition_history", {}))
+        conn.executemany("INSERT INTO nutrition_history (date, data) VALUES (?, ?)",
+                         [(date, json.dumps(entry)) for date, entry in history.items()])
+        counts["nutrition_history"] = len(history)
+
+        weight_logs = nutrition.get("weight_logs", [])
+        conn.executemany("INSERT INTO weight_logs (id, date, weight) VALUES (?, ?, ?)",
+                         [(w["id"], w["date"], w["weight"]) for w in weight_logs])
+        counts["weight_logs"] = len(weight_logs)
+
+        preferences = data.get("movie_preferences", [])
+        conn.executemany(
+            "INSERT INTO movie_preferences (timestamp, genre, title, rating) VALUES (?, ?, ?, ?)",
+            [(p["timestamp"], p["genre"], p.get("title"), p.get("rating")) for p in preferences])
+        counts["movie_preferences"] = len(preferences)
+
+        # Carry the ID sequences over so IDs of deleted or archived records are not handed out again
+        sequence_tables = {"schedule": "schedule", "workouts": "workouts", "food_logs": "nutrition_logs",
+                           "weight_logs": "weight_logs"}
+        for name, value in data.get("sequences", {}).items():
+            table = sequence_tables[name]
+            conn.execute("DELETE FROM sqlite_sequence WHERE name = ?", (table,))
+            conn.execute("INSERT INTO sqlite_sequence (name, seq) SELECT ?, MAX(?, IFNULL(MAX(id), 0)) FROM " + table,
+                         (table, value))
+
+    target._rebuild_daily_totals()
+    target.close()
+    return counts
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Migrate a JSON user data file into a SQLite database.")
+    parser.add_argument("json_file", nargs="?", default="user_data.json")
+    parser.add_argument("sqlite_file", nargs="?", default="user_data.db")
+    args = parser.parse_args()
+
+    for table, count in migrate_json_to_sqlite(args.json_file, args.sqlite_file).items():
+        print(f"{table}: {count} rows")
@@ -0,0 +1,96 @@
+"""Mixed read/write stress test for the Database locking (many threads, then a reload check)."""
+import threading
+
+import pytest
+
+from database import Database
+from sqlite_database import SQLiteDatabase
+
+WRITERS = 8
+READERS = 8
+WRITES_PER_WRITER = 100
+
+MODES = {
+    "plain": dict(),
+    "journal": dict(journal=True),
+    "write_behind": dict(write_behind=True, flush_interval_ms=5),
+    "journal_write_behind": dict(journal=True, write_behind=True, flush_interval_ms=5, checkpoint_interval=50),
+}
+
+
+def hammer(db):
+    """Run writer and reader threads against `db`. Returns the IDs handed out and any errors."""
+    errors, ids = [], []
+    ids_lock = threading.Lock()
+
+    def writer(n):
+        try:
+            for i in range(WRITES_PER_WRITER):
+                workout = db.add_workout(f"ex{i % 3}", i, float(n))
+                db.log_food_intake("oats", 10)
+                if i % 10 == 0:
+                    db.add_schedule_item("check-in", "2030-01-01", "10:00")
+                if i % 7 == 0:
+                    db.add_conversation("remember this event please", "ok")
+                with ids_lock:
+                    ids.append(workout["id"])
+        except Exception as e:
+            errors.append(repr(e))
+
+    def reader():
+        try:
+            for _ in range(WRITES_PER_WRITER * 2):
+                for exercise in ("ex0", "ex1", "ex2"):
+                    progress = db.get_exercise_progress(exercise)
+                    assert [w["date"] for w in progress] == sorted(w["date"] for w in progress)
+                    assert all(w["exercise"] == exercise for w in progress)
+                summary = db.get_nutrition_summary()
+                assert summary["total_calories"] == 10 * len(summary["logs"])
+                db.get_recent_workouts()
+                db.calculate_fitness_progress("ex1")
+                db.get_schedule_for_date("2030-01-01")
+        except Exception as e:
+            errors.append(repr(e))
+
+    threads = ([threading.Thread(target=writer, args=(n,)) for n in range(WRITERS)] +
+               [threading.Thread(target=reader) for _ in range(READERS)])
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return ids, errors
+
+
+@pytest.mark.parametrize("mode", sorted(MODES))
+def test_json_mixed_reads_and_writes(tmp_path, mode):
+    db_file = str(tmp_path / "user_data.json")
+    db = Database(db_file, **MODES[mode])
+    ids, errors = hammer(db)
+    with db._lock.read():
+        indexed = sum(len(workouts) for workouts in db._workouts_by_exercise.values())
+        assert indexed == len(db.data["fitness"]["workouts"])
+    db.close()
+
+    assert not errors, errors[:3]
+    assert len(set(ids)) == len(ids) == WRITERS * WRITES_PER_WRITER
+
+    reloaded = Database(db_file, journal=MODES[mode].get("journal", False))
+    assert len(reloaded.data["fitness"]["workouts"]) == WRITERS * WRITES_PER_WRITER
+    assert len(reloaded.data["fitness"]["nutrition"]["logs"]) == WRITERS * WRITES_PER_WRITER
+    assert len(reloaded.get_schedule_for_date("2030-01-01")) == WRITERS * WRITES_PER_WRITER // 10
+    reloaded.close()
+
+
+def test_sqlite_mixed_reads_and_writes(tmp_path):
+    db_file = str(tmp_path / "user_data.db")
+    db = SQLiteDatabase(db_file)
+    ids, errors = hammer(db)
+    db.close()
+
+    assert not errors, errors[:3]
+    assert len(set(ids)) == len(ids) == WRITERS * WRITES_PER_WRITER
+
+    reloaded = SQLiteDatabase(db_file)
+    assert len(reloaded.get_recent_workouts(10 ** 6)) == WRITERS * WRITES_PER_WRITER
+    assert len(reloaded.get_nutrition_summary()["logs"]) == WRITERS * WRITES_PER_WRITER
+    reloaded.close()
@@ -0,0 +1,147 @@
+"""On-disk formats of the JSON Database: journal replay, archive segments, framed snapshots, paging, transfer."""
+import datetime
+import json
+import os
+
+import pytest
+
+from data_transfer import export_ndjson, import_records, read_ndjson
+from database import Database
+from snapshot import SnapshotError
+
+
+def old_workouts(count, start=datetime.date(2020, 1, 1)):
+    """Workouts one per day from `start`, e.g. to be archived."""
+    return [{"date": (start + datetime.timedelta(days=i)).isoformat(), "exercise": f"ex{i % 2}", "reps": i,
+             "weight": 10.0} for i in range(count)]
+
+
+def test_journal_replay_restores_mutations_not_in_the_snapshot(tmp_path):
+    db_file = str(tmp_path / "user_data.json")
+    db = Database(db_file, journal=True)
+    for reps in range(5):
+        db.add_workout("squat", reps, 50.0)
+    db.add_schedule_item("dentist", "2030-01-01", "10:00")
+    db.delete_workout(2)
+    db.close()
+    assert os.path.getsize(db_file + ".journal") > 0
+
+    reloaded = Database(db_file, journal=True)
+    assert sorted(w["reps"] for w in reloaded.get_recent_workouts(10)) == [0, 2, 3, 4]
+    assert [item["title"] for item in reloaded.get_schedule_for_date("2030-01-01")] == ["dentist"]
+    assert reloaded.add_workout("squat", 9, 50.0)["id"] == 6
+    reloaded.close()
+
+    # A non-journaled instance folds the journal into the snapshot and removes it
+    folded = Database(db_file)
+    assert not os.path.exists(db_file + ".journal")
+    assert sorted(w["reps"] for w in folded.get_recent_workouts(10)) == [0, 2, 3, 4, 9]
+
+
+def test_journal_replay_drops_a_torn_tail(tmp_path):
+    db_file = str(tmp_path / "user_data.json")
+    db = Database(db_file, journal=True)
+    db.add_workout("squat", 1, 50.0)
+    db.close()
+    intact = os.path.getsize(db_file + ".journal")
+    with open(db_file + ".journal", "ab") as f:
+        f.write(b'{"op":"append","path":["fitness","workouts"],"val')
+
+    reloaded = Database(db_file, journal=True)
+    assert len(reloaded.get_recent_workouts(10)) == 1
+    assert os.path.getsize(db_file + ".journal") == intact
+    reloaded.add_workout("squat", 2, 50.0)
+    reloaded.close()
+    assert len(Database(db_file, journal=True).get_recent_workouts(10)) == 2
+
+
+def test_checkpoint_is_not_replayed_twice(tmp_path):
+    db_file = str(tmp_path / "user_data.json")
+    db = Database(db_file, journal=True, checkpoint_interval=3)
+    for reps in range(10):
+        db.add_workout("squat", reps, 50.0)
+    db.checkpoint()
+    db.add_workout("squat", 10, 50.0)
+    db.close()
+    assert len(Database(db_file, journal=True).get_recent_workouts(100)) == 11
+
+
+@pytest.mark.parametrize("journal", [False, True])
+def test_archive_delete_and_reload(tmp_path, journal):
+    db_file = str(tmp_path / "user_data.json")
+    db = Database(db_file, journal=journal)
+    import_records(db, "workouts", old_workouts(60))
+    db.add_workout("ex0", 100, 20.0)
+    moved = db.archive_cold_data(datetime.date(2020, 2, 15))
+    assert moved == {"workouts": 45}
+    assert len(db.data["fitness"]["workouts"]) == 16
+    assert len(os.listdir(db.archive_dir)) == 2  # January and February
+
+    assert len(db.get_recent_workouts(100)) == 61
+    assert [w["reps"] for w in db.get_recent_workouts(3)] == [100, 59, 58]
+    assert db.delete_workout(5)
+    assert not db.delete_workout(5)
+    db.close()
+
+    reloaded = Database(db_file, journal=journal)
+    workouts = reloaded.get_recent_workouts(100)
+    assert len(workouts) == 60
+    assert 5 not in {w["id"] for w in workouts}
+    assert [w["reps"] for w in reloaded.get_exercise_progress("ex0")][:3] == [0, 2, 6]
+    assert len(reloaded.data["fitness"]["workouts"]) == 16
+    reloaded.close()
+
+
+def test_framed_snapshot_corruption_is_detected(tmp_path):
+    db_file = str(tmp_path / "user_data.json")
+    db = Database(db_file, snapshot_codec="json")
+    db.add_workout("squat", 5, 50.0)
+    db.close()
+    with open(db_file, "rb") as f:
+        raw = f.read()
+    assert Database(db_file).get_recent_workouts(1)[0]["reps"] == 5
+
+    flipped = bytearray(raw)
+    flipped[-10] ^= 0xFF
+    with open(db_file, "wb") as f:
+        f.write(bytes(flipped))
+    with pytest.raises(SnapshotError):
+        Database(db_file)
+
+    with open(db_file, "wb") as f:
+        f.write(raw[:len(raw) // 2])
+    with pytest.raises(SnapshotError):
+        Database(db_file)
+
+
+def test_schedule_cursor_walks_every_item_once(tmp_path):
+    db = Database(str(tmp_path / "user_data.json"))
+    for day in range(10):
+        for n in range(3):
+            db.add_schedule_item(f"item {day}-{n}", f"2030-01-{day + 1:02d}", "09:00")
+
+    seen, cursor = [], None
+    while True:
+        page = db.get_schedule_page(start="2030-01-02", end="2030-01-09", cursor=cursor, limit=4)
+        seen.extend(item["title"] for item in page["items"])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+    assert seen == [f"item {day}-{n}" for day in range(1, 9) for n in range(3)]
+    with pytest.raises(ValueError):
+        db.get_schedule_page(limit=0)
+
+
+def test_export_import_round_trip(tmp_path):
+    source = Database(str(tmp_path / "source.json"))
+    import_records(source, "workouts", old_workouts(7))
+    exported = "".join(export_ndjson(source, "workouts", batch_size=3))
+
+    target = Database(str(tmp_path / "target.json"))
+    assert import_records(target, "workouts", read_ndjson(exported.splitlines()), batch_size=2) == 7
+    assert target.get_recent_workouts(10) == source.get_recent_workouts(10)
+
+    bad = [json.loads(line) for line in exported.splitlines()]
+    bad[4]["date"] = "yesterday"
+    with pytest.raises(ValueError, match="Batch 3"):
+        import_records(Database(str(tmp_path / "other.json")), "workouts", bad, batch_size=2)
@@ -0,0 +1,50 @@
+"""Prompt budgeting helpers and the rolling conversation summarizer."""
+import contextlib
+
+from database import Database
+from prompt_context import (SUMMARY_PREFERENCE, RollingSummarizer, estimate_tokens, rank_memory, relevant_memory,
+                            take_within, terms, truncate_to_tokens)
+
+
+def test_take_within_stays_in_budget():
+    lines = ["a" * 39, "b" * 80, "c" * 39]
+    assert take_within(lines, 25) == (["a" * 39, "c" * 39], 20)
+    assert take_within(lines, 25, contiguous=True) == (["a" * 39], 10)
+    assert estimate_tokens(truncate_to_tokens("word " * 100, 10)) <= 10
+
+
+def test_memory_ranking_and_relevance():
+    points = [(text, terms(text)) for text in (
+        "Remember the dentist appointment on Friday", "Important: passport renewal is due", "Remember milk")]
+    query = "When is my dentist appointment?"
+    ranked = rank_memory(points, query)
+    assert ranked[0] == "Remember the dentist appointment on Friday"
+    assert relevant_memory(points, ranked, query) == ["Remember the dentist appointment on Friday"]
+    assert relevant_memory(points, ranked, "tell me a joke") == []
+
+
+def test_summarizer_folds_only_once_a_batch_is_waiting(tmp_path):
+    db = Database(str(tmp_path / "user_data.json"), conversation_max_recent=20)
+
+    @contextlib.contextmanager
+    def open_db(user_id):
+        yield db
+
+    prompts = []
+    summarizer = RollingSummarizer(lambda prompt: prompts.append(prompt) or f"summary {len(prompts)}", open_db,
+                                   keep_recent=2, min_batch=2)
+    folded = []
+    for n in range(8):
+        db.add_conversation(f"question {n}", f"answer {n}")
+        folded.append(summarizer.fold("user"))
+
+    # Turns 0-5 are older than the two kept verbatim; they are folded two at a time
+    assert folded == [0, 0, 0, 2, 0, 2, 0, 2]
+    assert len(prompts) == 3
+    assert "question 4" in prompts[-1] and "question 3" not in prompts[-1]
+    assert db.get_user_preference(SUMMARY_PREFERENCE)["text"] == "summary 3"
+
+    db.add_conversation("question 8", "answer 8")
+    assert summarizer.fold("user") == 0
+    assert summarizer.fold("user", force=True) == 1
+    assert summarizer.summarizer_stats()["turns_folded"] == 7
@@ -0,0 +1,66 @@
+"""Eviction in the speech cache and the temporary audio janitor."""
+import os
+import time
+
+import pytest
+
+pytest.importorskip("edge_tts")
+
+from speech import AudioJanitor, SpeechCache  # noqa: E402
+
+
+def write(path, size):
+    with open(path, "wb") as f:
+        f.write(b"\0" * size)
+    return path
+
+
+def test_speech_cache_hits_and_evicts_least_recently_used(tmp_path):
+    calls = []
+
+    def synthesize(text, voice):
+        calls.append(text)
+        return text.encode() * 100
+
+    cache = SpeechCache(str(tmp_path), max_bytes=1000)
+    assert cache.get_audio("aaaa", "voice", synthesize) == b"aaaa" * 100
+    assert cache.get_audio("aaaa", "voice", synthesize) == b"aaaa" * 100
+    cache.get_audio("bbbb", "voice", synthesize)
+    cache.get_audio("aaaa", "voice", synthesize)  # now the most recently used
+    cache.get_audio("cccc", "voice", synthesize)
+
+    assert calls == ["aaaa", "bbbb", "cccc"]
+    assert not os.path.exists(cache.path(cache.key("bbbb", "voice")))
+    assert os.path.exists(cache.path(cache.key("aaaa", "voice")))
+    stats = cache.cache_stats()
+    assert (stats["hits"], stats["misses"], stats["evictions"]) == (2, 3, 1)
+
+    # The order and size survive a restart
+    reopened = SpeechCache(str(tmp_path), max_bytes=1000)
+    assert reopened.cache_stats()["bytes"] == 800
+
+
+def test_janitor_expires_files_and_never_evicts_the_newest(tmp_path):
+    janitor = AudioJanitor(str(tmp_path), ttl=60, max_bytes=250)
+    orphan = write(str(tmp_path / "orphan.mp3"), 10)
+    janitor.start()
+    assert not os.path.exists(orphan)
+
+    first = write(str(tmp_path / "first.mp3"), 100)
+    second = write(str(tmp_path / "second.mp3"), 100)
+    janitor.expire_later(first)
+    janitor.expire_later(second)
+    big = write(str(tmp_path / "big.mp3"), 300)
+    janitor.expire_later(big)
+    assert not os.path.exists(first) and not os.path.exists(second)
+    assert os.path.exists(big)
+    assert janitor.janitor_stats()["evicted"] == 2
+    assert janitor.discard(big)
+
+    short = write(str(tmp_path / "short.mp3"), 1)
+    janitor.expire_later(short, ttl=0.05)
+    deadline = time.monotonic() + 5
+    while os.path.exists(short) and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert not os.path.exists(short)
+    assert janitor.janitor_stats()["pending"] == 0
@@ -0,0 +1,34 @@
+"""Behaviour specific to the SQLite backend."""
+from database import Database
+from sqlite_database import DEFAULT_NUTRITION_GOALS, DEFAULT_USER, SQLiteDatabase, migrate_json_to_sqlite
+
+
+def test_fresh_databases_do_not_share_user_defaults(tmp_path):
+    first = SQLiteDatabase(str(tmp_path / "first.db"))
+    second = SQLiteDatabase(str(tmp_path / "second.db"))
+    first.set_user_preference("conversation_summary", {"text": "first user's day"})
+    first.set_nutrition_goals(2000, 150, 200, 70, "maintain")
+
+    assert second.get_user_preference("conversation_summary") is None
+    assert second.get_nutrition_summary()["goal_type"] == DEFAULT_NUTRITION_GOALS["goal_type"]
+    assert DEFAULT_USER["preferences"] == {}
+    assert first.get_user_preference("conversation_summary") == {"text": "first user's day"}
+    first.close()
+    second.close()
+
+
+def test_migration_leaves_the_json_files_untouched(tmp_path):
+    json_file = str(tmp_path / "user_data.json")
+    source = Database(json_file, journal=True)
+    for reps in range(5):
+        source.add_workout("squat", reps, 50.0)
+    source.close()
+    before = {path.name: path.read_bytes() for path in tmp_path.iterdir()}
+
+    counts = migrate_json_to_sqlite(json_file, str(tmp_path / "user_data.db"))
+
+    assert counts["workouts"] == 5
+    assert {path.name: path.read_bytes() for path in tmp_path.iterdir() if path.name in before} == before
+    target = SQLiteDatabase(str(tmp_path / "user_data.db"))
+    assert [workout["reps"] for workout in target.get_recent_workouts(10)] == [0, 1, 2, 3, 4]
+    target.close()